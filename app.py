@@ -1,8 +1,17 @@
+import os
+import sqlite3
 import streamlit as st
 from services.auth_service import login_user, register_user
 from services.database_service import get_user_profile, update_user_profile, create_db
-from models.llama_model import LlamaRoadmapManager
-from streamlit_ui import analytics, dashboard  # Correct imports added for dashboard and analytics
+from services.archive import schedule_archival
+from services.query_profiler import query_scope
+from services.roadmap_versions import schedule_compaction
+from models.llama_model import get_roadmap_manager, warm_up_model
+from models.telemetry import start_metrics_server
+from streamlit_ui import admin, analytics, dashboard  # Correct imports added for dashboard and analytics
+
+# Usernames allowed to see the Admin page, e.g. MAYOGA_ADMINS=alice,bob
+ADMINS = {name.strip() for name in os.environ.get('MAYOGA_ADMINS', '').split(',') if name.strip()}
 
 def login_or_register():
     if 'username' not in st.session_state:
@@ -60,10 +69,14 @@ def login_or_register():
                         current_stage_info = f"Job Title: {job_title}, Industry: {industry}, Years of Experience: {years_of_experience}"
                         field_info = industry
 
-                    register_user(username, password, role, current_stage_info, field_info, end_goal)
-                    st.success("Registration successful! Please log in.")
-                    st.session_state['username'] = username
-                    st.experimental_rerun()
+                    try:
+                        register_user(username, password, role, current_stage_info, field_info, end_goal)
+                    except sqlite3.IntegrityError:
+                        st.error("That username is already taken. Please choose another one.")
+                    else:
+                        st.success("Registration successful! Please log in.")
+                        st.session_state['username'] = username
+                        st.experimental_rerun()
 
     else:
         st.write(f"Welcome, {st.session_state['username']}!")
@@ -77,17 +90,26 @@ def main():
     if 'username' not in st.session_state or st.session_state['username'] is None:
         login_or_register()
     else:
-        roadmap_manager = LlamaRoadmapManager(st.session_state['username'])
+        roadmap_manager = get_roadmap_manager(st.session_state['username'])
+        if roadmap_manager is None:
+            # The account no longer exists
+            st.session_state['username'] = None
+            st.experimental_rerun()
 
         if st.session_state.get('selected_page') == 'Dashboard':
             dashboard.show_dashboard(roadmap_manager)  # Corrected dashboard function call
         elif st.session_state.get('selected_page') == 'Analytics':
             analytics.show_analytics(roadmap_manager)  # Corrected analytics function call
+        elif st.session_state.get('selected_page') == 'Admin' and st.session_state['username'] in ADMINS:
+            admin.show_admin()
 
 def create_sidebar():
     st.sidebar.title(f"Welcome, {st.session_state.get('username', 'Guest')}!")
 
-    st.sidebar.radio("Navigate", ['Dashboard', 'Analytics', 'Logout'], key='selected_page')
+    pages = ['Dashboard', 'Analytics', 'Logout']
+    if st.session_state.get('username') in ADMINS:
+        pages.insert(2, 'Admin')
+    st.sidebar.radio("Navigate", pages, key='selected_page')
 
     if st.sidebar.button("Logout"):
         st.session_state['username'] = None
@@ -95,4 +117,11 @@ def create_sidebar():
 
 if __name__ == "__main__":
     create_db()
-    main()
\ No newline at end of file
+    warm_up_model()
+    schedule_compaction()
+    schedule_archival()
+    if os.environ.get('MAYOGA_METRICS_PORT'):
+        start_metrics_server(int(os.environ['MAYOGA_METRICS_PORT']))
+    # Count this rerun's queries towards the page and user it served
+    with query_scope(st.session_state.get('username'), st.session_state.get('selected_page')):
+        main()
\ No newline at end of file
@@ -0,0 +1,109 @@
+"""Hot/cold archival: database size and hot query latency before and after.
+
+Seeds a fresh database with --users users, each with --attempts quiz
+attempts and --versions roadmap versions spread over the last --months
+months, then archives everything older than --days into compressed
+partitions and VACUUMs. Prints the archival report and checks that
+archived quiz attempts and roadmap versions still read back unchanged.
+
+    python -m benchmarks.bench_archive --users 2000 --attempts 24 --versions 12
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.fake_ollama import canned_quiz, canned_roadmap
+from services import archive, db_connection
+from services.database_service import create_db, save_user_roadmap
+from services.db_connection import db_cursor, transaction
+from services.roadmap_versions import get_roadmap_version
+
+
+def seed(users, attempts, versions, months, rng):
+    days = months * 30
+    with transaction() as cursor:
+        cursor.executemany(
+            "INSERT INTO users (username, password, role, role_specific_field, end_goal) VALUES (?, ?, ?, ?, ?)",
+            ((f"user{i}", "x", "Student", "CS", "Data Analyst") for i in range(users)),
+        )
+        for i in range(users):
+            quiz = canned_quiz(f"Milestone {i % 7}")
+            cursor.executemany('''
+            INSERT INTO quiz_results (username, quiz_data, result, score, feedback, phase, milestone, created_at)
+            VALUES (?, ?, ?, ?, NULL, 'Phase 1', ?, datetime('now', ?))
+            ''', [
+                (f"user{i}", json.dumps(quiz), json.dumps([rng.choice(['Option A', 'True', 'x']) for _ in range(10)]),
+                 rng.randint(0, 100), f"Milestone {a}", f"-{days * (attempts - a) // attempts} days")
+                for a in range(attempts)
+            ])
+
+    roadmap = canned_roadmap()
+    for start in range(0, users, 500):
+        with transaction() as cursor:
+            for i in range(start, min(start + 500, users)):
+                for v in range(versions):
+                    milestone = roadmap['roadmap']['phases'][v % 4]['milestones'][0]
+                    milestone['description'] = f"Revision {v} for user {i}"
+                    save_user_roadmap(f"user{i}", roadmap)
+            # Spread each user's versions over the months, oldest first
+            cursor.execute('''
+            UPDATE roadmaps SET created_at = datetime('now', '-' || ((? - version) * ? / ?) || ' days')
+            WHERE username IN (SELECT username FROM users WHERE id > ? AND id <= ?)
+            ''', (versions, days, versions, start, start + 500))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--attempts', type=int, default=24)
+    parser.add_argument('--versions', type=int, default=12)
+    parser.add_argument('--months', type=int, default=24)
+    parser.add_argument('--days', type=int, default=180)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_connection.set_db_path(os.path.join(tmp, 'users.db'))
+        create_db()
+        seed(args.users, args.attempts, args.versions, args.months, random.Random(0))
+        with db_cursor() as cursor:
+            cursor.execute("VACUUM")
+            cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        sample = f"user{args.users // 2}"
+        quiz_before = archive.get_quiz_results(sample)
+        roadmaps_before = [get_roadmap_version(sample, v) for v in range(1, args.versions + 1)]
+
+        started = time.perf_counter()
+        report = archive.archive_old_rows(args.days, vacuum=True)
+        seconds = time.perf_counter() - started
+
+        quiz_after = archive.get_quiz_results(sample)
+        started = time.perf_counter()
+        roadmaps_after = [get_roadmap_version(sample, v) for v in range(1, args.versions + 1)]
+        history_ms = (time.perf_counter() - started) * 1000
+        strip = lambda results: [{k: v for k, v in r.items() if k != 'archived'} for r in results]
+
+    print(f"users={args.users} attempts/user={args.attempts} versions/user={args.versions} "
+          f"months={args.months} archive after {args.days} days")
+    for table, moved in report['tables'].items():
+        print(f"{table:<14} {moved['rows']:>8} rows archived, {moved['payload_bytes'] / 2**20:>7.1f} MiB of payload, "
+              f"{len(moved['partitions'])} partitions")
+    print(f"users.db       {report['bytes_before'] / 2**20:>7.1f} MiB -> {report['bytes_after'] / 2**20:.1f} MiB; "
+          f"partitions {report['archive_bytes_written'] / 2**20:.1f} MiB; run took {seconds:.1f} s")
+    print(f"{'hot query':<22} {'before ms':>9} {'after ms':>9}")
+    for name, before in report['hot_query_ms_before'].items():
+        print(f"{name:<22} {before:>9.3f} {report['hot_query_ms_after'][name]:>9.3f}")
+    print(f"all {args.versions} roadmap versions of one user, through the archive: {history_ms:.1f} ms")
+
+    archived = sum(r['archived'] for r in quiz_after)
+    if strip(quiz_before) != strip(quiz_after) or roadmaps_before != roadmaps_after or not archived:
+        raise SystemExit("Archived rows did not read back unchanged")
+    print(f"read back {len(quiz_after)} quiz attempts ({archived} archived) and "
+          f"{len(roadmaps_after)} roadmap versions unchanged")
+
+
+if __name__ == '__main__':
+    main()
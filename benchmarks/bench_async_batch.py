@@ -0,0 +1,47 @@
+"""Throughput of batched roadmap generation through AsyncLlamaClient.
+
+Needs a reachable Ollama server (or the fake server from the load
+benchmark). The cache is bypassed and nothing is saved, so every request
+reaches the server.
+
+    python -m benchmarks.bench_async_batch --host http://localhost:11434 --concurrency 4
+"""
+import argparse
+
+from models.async_llama import AsyncLlamaClient, run_batch
+
+BATCH_SIZES = (1, 4, 16, 64)
+
+
+def profiles(n):
+    return [
+        {
+            'username': f"bench{i}",
+            'role': 'Student',
+            'current_stage': 'Undergraduate',
+            'field_of_study': f"Computer Science {i}",
+            'end_goal': 'Data Analyst',
+        }
+        for i in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default=None)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--timeout', type=float, default=300.0)
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(BATCH_SIZES))
+    args = parser.parse_args()
+
+    client = AsyncLlamaClient(concurrency=args.concurrency, timeout=args.timeout, host=args.host)
+    print(f"concurrency={args.concurrency}")
+    print(f"{'batch':>6} {'seconds':>9} {'req/sec':>9} {'failures':>9}")
+    for size in args.sizes:
+        batch = profiles(size)
+        _, report = run_batch(lambda: client.generate_roadmaps(batch, use_cache=False, save=False), size)
+        print(f"{size:>6} {report['seconds']:>9.2f} {report['requests_per_sec']:>9.2f} {report['failures']:>9}")
+
+
+if __name__ == '__main__':
+    main()
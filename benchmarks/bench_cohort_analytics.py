@@ -0,0 +1,99 @@
+"""Cohort analytics over a large quiz_results table.
+
+Seeds a fresh database with --users users, --quizzes quiz results and a few
+completed milestones per user, then times the first export of quiz_results and
+user_progress to the memory-mapped columns, a full recompute of the cohort tables, an
+incremental refresh after new writes, and a cached call.
+
+    python -m benchmarks.bench_cohort_analytics --quizzes 1000000 --users 20000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from services import db_connection
+from services.cohort_analytics import CohortAnalytics
+from services.database_service import create_db, save_quiz_results, track_user_progress
+from services.db_connection import transaction
+
+ROLES = ('Student', 'Professional')
+FIELDS = ('Computer Science', 'Biology', 'Finance', 'Design', 'Mechanical Engineering')
+GOALS = ('Data Analyst', 'AI Scientist', 'Product Manager', 'Researcher')
+PHASES = ('Phase 1: Beginner', 'Phase 2: Intermediate', 'Phase 3: Advanced', 'Phase 4: Final')
+
+
+def seed(users, quizzes, rng):
+    with transaction() as cursor:
+        cursor.executemany(
+            "INSERT INTO users (username, password, role, role_specific_field, end_goal) VALUES (?, 'x', ?, ?, ?)",
+            ((f"user{i}", rng.choice(ROLES), rng.choice(FIELDS), rng.choice(GOALS)) for i in range(users)),
+        )
+        cursor.executemany(
+            "INSERT INTO user_progress (username, phase, milestone, completed_at) "
+            "VALUES (?, ?, ?, datetime('now', ?))",
+            (
+                (f"user{i}", PHASES[m // 3], f"Milestone {m // 3 + 1}.{m % 3 + 1}", f"-{(12 - m) * 3 + rng.randint(0, 2)} days")
+                for i in range(users)
+                for m in range(rng.randint(0, 12))
+            ),
+        )
+        cursor.executemany(
+            "INSERT INTO quiz_results (username, quiz_data, result, score, phase, created_at) "
+            "VALUES (?, '{}', '{}', ?, ?, datetime('now', ?))",
+            (
+                (f"user{rng.randrange(users)}", rng.randint(0, 100), rng.choice(PHASES), f"-{rng.randint(0, 90)} days")
+                for _ in range(quizzes)
+            ),
+        )
+
+
+def timed(fn):
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--quizzes', type=int, default=1000000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_connection.set_db_path(os.path.join(tmp, 'users.db'))
+        create_db()
+        seed(args.users, args.quizzes, rng)
+
+        analytics = CohortAnalytics(os.path.join(tmp, 'analytics'))
+        export = timed(analytics.refresh)
+        analytics.mark_stale()
+        full = timed(analytics.summary)
+
+        for i in range(100):
+            save_quiz_results(f"user{i}", {}, {}, rng.randint(0, 100), None, phase=PHASES[0])
+        track_user_progress('user0', PHASES[3], 'Milestone 4.9')
+        incremental = timed(analytics.summary)
+        cached = timed(analytics.summary)
+
+        # A new process starts from the exported columns instead of SQLite
+        reopened = CohortAnalytics(os.path.join(tmp, 'analytics'))
+        cold_start = timed(reopened.summary)
+
+        results = analytics.summary()
+        db_connection.close_all()
+
+    print(f"users={args.users} quiz_results={args.quizzes}")
+    print(f"first export to columns        {export:8.3f}s")
+    print(f"recompute all cohort tables    {full:8.3f}s")
+    print(f"refresh after 101 new writes   {incremental:8.3f}s")
+    print(f"cached call                    {cached * 1000:8.3f}ms")
+    print(f"new process from export        {cold_start:8.3f}s")
+    print(results['score_distribution'][['phase', 'quizzes', 'mean', 'median']].to_string(index=False))
+    print(results['drop_off'].head(5).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Compare the pooled connection layer against the old per-call sqlite3.connect.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_db_pool --ops 5000 --threads 4
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from services import db_connection
+from services import database_service
+
+
+# The pre-pool access pattern: connect, query, close on every call
+def percall_get_profile(path, username):
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT username, role, role_specific_field, end_goal FROM users WHERE username = ?
+    ''', (username,))
+    row = cursor.fetchone()
+    conn.close()
+    return row
+
+
+def percall_track_progress(path, username, phase, milestone):
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT * FROM user_progress WHERE username = ? AND phase = ? AND milestone = ?
+    ''', (username, phase, milestone))
+    if not cursor.fetchone():
+        cursor.execute('''
+        INSERT INTO user_progress (username, phase, milestone)
+        VALUES (?, ?, ?)
+        ''', (username, phase, milestone))
+        conn.commit()
+    conn.close()
+
+
+def seed(users):
+    for i in range(users):
+        database_service.register_user(f"user{i}", "pw", "Student", "Computer Science", "Data Analyst")
+
+
+def run(label, fn, ops, threads):
+    per_thread = ops // threads
+
+    def worker(tid):
+        for i in range(per_thread):
+            fn(tid, i)
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    total = per_thread * threads
+    print(f"{label:<32} {total:>8} ops  {elapsed:8.3f}s  {total / elapsed:>10.0f} ops/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ops', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--users', type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'users.db')
+        db_connection.set_db_path(path)
+        database_service.create_db()
+        seed(args.users)
+
+        def user(i):
+            return f"user{i % args.users}"
+
+        print(f"threads={args.threads} users={args.users}")
+        run("read  per-call connect", lambda t, i: percall_get_profile(path, user(i)),
+            args.ops, args.threads)
+        run("read  pooled", lambda t, i: database_service.get_user_profile(user(i)),
+            args.ops, args.threads)
+        run("write per-call connect", lambda t, i: percall_track_progress(path, user(i), f"P{t}", f"a{i}"),
+            args.ops, args.threads)
+        run("write pooled", lambda t, i: database_service.track_user_progress(user(i), f"P{t}", f"b{i}"),
+            args.ops, args.threads)
+
+        db_connection.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""End-to-end load benchmark: simulated users against a fake Ollama server and a seeded database.
+
+Starts benchmarks.fake_ollama on a free port, seeds a fresh SQLite database
+with --seed-users existing users (roadmaps, quiz results, progress), then
+drives --users new users through register -> login -> roadmap -> quiz ->
+progress with --concurrency threads. Each stage runs as one wave across all
+users, so its ops/sec is not mixed with the others. Prints p50/p95/p99
+latency and ops/sec per stage, and exits non-zero if a --budget is exceeded.
+
+    python -m benchmarks.bench_load --users 200 --concurrency 8 --budget roadmap=500 --budget login=5
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_ollama import DEFAULT_LATENCY, DEFAULT_TOKENS_PER_SEC, canned_roadmap, start_fake_ollama
+
+STAGES = ('register', 'login', 'roadmap', 'quiz', 'progress')
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def seed(users):
+    from services.database_service import hash_password
+    from services.db_connection import transaction
+
+    roadmap = json.dumps(canned_roadmap())
+    with transaction() as cursor:
+        cursor.executemany(
+            "INSERT INTO users (username, password, role, current_stage, role_specific_field, end_goal) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            ((f"seed{i}", hash_password("x"), "Student", "Undergraduate", "CS", "Data Analyst") for i in range(users)),
+        )
+        cursor.executemany(
+            "INSERT INTO roadmaps (username, roadmap) VALUES (?, ?)",
+            ((f"seed{i}", roadmap) for i in range(users)),
+        )
+        cursor.executemany(
+            "INSERT INTO quiz_results (username, quiz_data, result, score, feedback) VALUES (?, '{}', '{}', ?, NULL)",
+            ((f"seed{i}", i % 100) for i in range(users)),
+        )
+        cursor.executemany(
+            "INSERT INTO user_progress (username, phase, milestone) VALUES (?, ?, ?)",
+            ((f"seed{i}", "Phase 1: Beginner", f"Milestone 1.{m}") for i in range(users) for m in range(1, 3)),
+        )
+
+
+class SimulatedUser:
+    def __init__(self, index, profiles, cache):
+        self.username = f"load{index}"
+        self.password = f"pw{index}"
+        self.field = f"Field {index % profiles if profiles else index}"
+        self.cache = cache
+        self.manager = None
+        self.roadmap = None
+
+    def register(self):
+        from services.auth_service import register_user
+        register_user(self.username, self.password, 'Student', 'Undergraduate', self.field, 'Data Analyst')
+
+    def login(self):
+        from services.auth_service import login_user
+        if not login_user(self.username, self.password):
+            raise RuntimeError(f"login failed for {self.username}")
+
+    def roadmap_stage(self):
+        from models.llama_model import LlamaRoadmapManager
+        self.manager = LlamaRoadmapManager(
+            self.username, 'Student', 'Undergraduate', self.field, 'Data Analyst', cache=self.cache,
+        )
+        # Consume the stream like the dashboard's roadmap job does
+        for event in self.manager.stream_roadmap():
+            if event['type'] == 'done':
+                self.roadmap = event['roadmap']
+
+    def quiz(self):
+        phase = self.roadmap['roadmap']['phases'][0]
+        quiz = self.manager.get_quiz(phase['name'], phase['milestones'][0]['name'])
+        if not quiz['quiz']:
+            raise RuntimeError(f"empty quiz for {self.username}")
+
+    def progress(self):
+        from services.database_service import get_user_progress, track_user_progress
+        phase = self.roadmap['roadmap']['phases'][0]
+        track_user_progress(self.username, phase['name'], phase['milestones'][0]['name'])
+        get_user_progress(self.username)
+
+
+def run_stage(name, users, concurrency):
+    method = {'roadmap': 'roadmap_stage'}.get(name, name)
+
+    def timed(user):
+        started = time.perf_counter()
+        try:
+            getattr(user, method)()
+            error = None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        return time.perf_counter() - started, error
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, users))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(seconds * 1000 for seconds, error in results if error is None)
+    errors = [error for _, error in results if error is not None]
+    return {
+        'stage': name,
+        'ops': len(latencies),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'ops_per_sec': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+    }
+
+
+def parse_budgets(values):
+    budgets = {}
+    for value in values:
+        stage, _, ms = value.partition('=')
+        if stage not in STAGES or not ms:
+            raise SystemExit(f"--budget expects <stage>=<p95 ms> with a stage in {', '.join(STAGES)}, got {value!r}")
+        budgets[stage] = float(ms)
+    return budgets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--seed-users', type=int, default=5000)
+    parser.add_argument('--profiles', type=int, default=0,
+                        help="distinct profiles shared by the users (0: one per user, so no cache hits)")
+    parser.add_argument('--latency', type=float, default=DEFAULT_LATENCY)
+    parser.add_argument('--tokens-per-sec', type=float, default=DEFAULT_TOKENS_PER_SEC)
+    parser.add_argument('--budget', action='append', default=[], metavar='STAGE=MS',
+                        help="fail if the stage's p95 latency exceeds MS milliseconds")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+    budgets = parse_budgets(args.budget)
+
+    server = start_fake_ollama(latency=args.latency, tokens_per_sec=args.tokens_per_sec)
+    # The ollama module reads OLLAMA_HOST when it is first imported, so the
+    # app modules are only imported from here on
+    os.environ['OLLAMA_HOST'] = server.url
+
+    from models.response_cache import ResponseCache
+    from models.telemetry import telemetry
+    from services import db_connection
+    from services.database_service import create_db
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_connection.set_db_path(os.path.join(tmp, 'users.db'))
+        create_db()
+        seed(args.seed_users)
+        cache = ResponseCache(os.path.join(tmp, 'llm_cache.db'))
+
+        users = [SimulatedUser(i, args.profiles, cache) for i in range(args.users)]
+        print(f"users={args.users} concurrency={args.concurrency} seed_users={args.seed_users} "
+              f"ollama latency={args.latency}s rate={args.tokens_per_sec} tok/s")
+        print(f"{'stage':<10} {'ops':>6} {'errors':>7} {'ops/sec':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+
+        results = []
+        for stage in STAGES:
+            # Users whose earlier stage failed cannot continue
+            active = [u for u in users if stage not in ('quiz', 'progress') or u.roadmap is not None]
+            result = run_stage(stage, active, args.concurrency)
+            results.append(result)
+            print(f"{stage:<10} {result['ops']:>6} {result['errors']:>7} {result['ops_per_sec']:>9.1f} "
+                  f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f}")
+            if result['first_error']:
+                print(f"  first error: {result['first_error']}")
+
+        print(f"fake ollama requests: {server.requests}, cache: {cache.stats()}")
+        print(f"llm calls: {[(row['kind'], row['calls'], row['cache_hits']) for row in telemetry.summary()]}")
+        db_connection.close_all()
+
+    server.shutdown()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'stages': results}, f, indent=2)
+
+    failed = [r for r in results if r['errors']]
+    for r in results:
+        if r['stage'] in budgets and r['p95_ms'] > budgets[r['stage']]:
+            print(f"BUDGET {r['stage']}: p95 {r['p95_ms']:.1f} ms > {budgets[r['stage']]:.1f} ms")
+            failed.append(r)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Prefill cost of the old per-user-first prompt layout vs the shared-prefix layout.
+
+Sends the same quiz requests for several profiles in both layouts to an
+Ollama server and reports the average prompt_eval_count and
+prompt_eval_duration. With the shared prefix, Ollama reuses the KV cache
+for everything before the task tail, so far fewer prompt tokens are
+evaluated per call.
+
+    python -m benchmarks.bench_prompt_prefill --host http://localhost:11434 --profiles 8
+"""
+import argparse
+
+from models.model_router import router_from_env
+from models.prompts import KEEP_ALIVE, quiz_prompt
+
+
+# The quiz prompt as it was laid out before models/prompts.py: profile first, template after
+def legacy_quiz_prompt(username, role, current_stage, field_of_study, end_goal, phase):
+    return f'''
+        Generate a 10-question quiz in JSON format for the phase: {phase} of the following user:
+        - Username: {username}
+        - Role: {role} (Student/Professional)
+        - Current Stage: {current_stage}
+        - Field of Study/Job Role: {field_of_study}
+        - End Goal: {end_goal}
+
+        Please include multiple-choice, true/false, and short-answer questions. Format the response strictly in this JSON structure:
+        {{
+            "quiz": [
+                {{
+                    "question": "What is ...?",
+                    "options": ["Option 1", "Option 2", "Option 3", "Option 4"],
+                    "answer": "Option 1"
+                }},
+                {{
+                    "question": "True or False: ...?",
+                    "answer": "True"
+                }},
+                {{
+                    "question": "Explain ... in a few sentences.",
+                    "answer": "..."
+                }}
+            ]
+        }}
+        '''
+
+
+def measure(router, prompts):
+    count = duration = 0
+    for prompt in prompts:
+        # Only the prefill matters here, so stop after one generated token
+        response = router.generate('quiz', prompt=prompt, keep_alive=KEEP_ALIVE, options={'num_predict': 1})
+        count += response.get('prompt_eval_count') or 0
+        duration += response.get('prompt_eval_duration') or 0
+    return count / len(prompts), duration / len(prompts) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default=None)
+    parser.add_argument('--profiles', type=int, default=8)
+    args = parser.parse_args()
+
+    router = router_from_env(args.host)
+    profiles = [
+        (f"user{i}", 'Student', 'Undergraduate', f"Field {i}", 'Data Analyst')
+        for i in range(args.profiles)
+    ]
+
+    legacy = [legacy_quiz_prompt(*p, 'Phase 1: Beginner') for p in profiles]
+    shared = [quiz_prompt(*p[1:], 'Phase 1: Beginner') for p in profiles]
+
+    print(f"{'layout':<14} {'prompt tokens':>14} {'prefill ms':>11}")
+    for label, prompts in (('per-user first', legacy), ('shared prefix', shared)):
+        tokens, ms = measure(router, prompts)
+        print(f"{label:<14} {tokens:>14.0f} {ms:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
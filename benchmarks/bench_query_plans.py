@@ -0,0 +1,99 @@
+"""Check that the hot per-user queries use the username indexes on a large database.
+
+Seeds a fresh database with --rows rows in each of roadmaps, quiz_results and
+user_progress, prints EXPLAIN QUERY PLAN and timings for the queries behind
+get_user_roadmap / get_user_progress / login, and exits non-zero if any of
+them falls back to a full table scan.
+
+    python -m benchmarks.bench_query_plans --rows 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from services import db_connection
+from services import database_service
+from services.db_connection import db_cursor, transaction
+
+QUERIES = {
+    'get_user_roadmap': (
+        "SELECT id FROM roadmaps WHERE username = ? ORDER BY created_at DESC, id DESC LIMIT 1",
+        'idx_roadmaps_username_created',
+    ),
+    'get_user_progress': (
+        "SELECT phase, milestone FROM user_progress WHERE username = ?",
+        'idx_user_progress_unique',
+    ),
+    'latest_quiz_results': (
+        "SELECT score FROM quiz_results WHERE username = ? ORDER BY created_at DESC LIMIT 5",
+        'idx_quiz_results_username_created',
+    ),
+    'login_user': (
+        "SELECT * FROM users WHERE username = ? AND password = ?",
+        'idx_users_username',
+    ),
+}
+
+
+def seed(rows, users):
+    with transaction() as cursor:
+        cursor.executemany(
+            "INSERT INTO users (username, password, role, role_specific_field, end_goal) VALUES (?, ?, ?, ?, ?)",
+            ((f"user{i}", "x", "Student", "CS", "Data Analyst") for i in range(users)),
+        )
+        cursor.executemany(
+            "INSERT INTO roadmaps (username, roadmap, created_at) VALUES (?, ?, datetime('now', ?))",
+            ((f"user{i % users}", '{"roadmap": {}}', f"-{i} seconds") for i in range(rows)),
+        )
+        cursor.executemany(
+            "INSERT INTO quiz_results (username, quiz_data, result, score, feedback, created_at) "
+            "VALUES (?, '{}', '{}', ?, NULL, datetime('now', ?))",
+            ((f"user{i % users}", i % 100, f"-{i} seconds") for i in range(rows)),
+        )
+        cursor.executemany(
+            "INSERT INTO user_progress (username, phase, milestone) VALUES (?, ?, ?)",
+            ((f"user{i % users}", f"Phase {i % 4 + 1}", f"Milestone {i}") for i in range(rows)),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        db_connection.set_db_path(os.path.join(tmp, 'users.db'))
+        database_service.create_db()
+        seed(args.rows, args.users)
+
+        with db_cursor() as cursor:
+            cursor.execute("ANALYZE")
+            for name, (sql, index) in QUERIES.items():
+                params = ('user7',) if sql.count('?') == 1 else ('user7', 'x')
+                cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+                plan = [row[3] for row in cursor.fetchall()]
+
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    cursor.execute(sql, params)
+                    cursor.fetchall()
+                per_query = (time.perf_counter() - start) / args.repeat * 1e6
+
+                uses_index = any(index in step for step in plan)
+                scans = any(step.startswith('SCAN') or 'TEMP B-TREE' in step for step in plan)
+                ok = uses_index and not scans
+                failed = failed or not ok
+                print(f"{'OK ' if ok else 'BAD'} {name:<22} {per_query:8.1f} us/query  {' | '.join(plan)}")
+
+        db_connection.close_all()
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Query profiler: overhead per rerun and what the summary reports.
+
+Seeds --users users, each with a roadmap and --attempts quiz attempts, then
+replays --reruns page reruns (profile, roadmap, progress and recent quiz
+scores of a random user, a quiz submission on every fifth) with profiling
+off and on, alternating passes. Prints the time per rerun both ways, the
+busiest statements by call site, queries per rerun and per user, and a
+full-scan report that crosses --slow-ms with its EXPLAIN QUERY PLAN.
+
+    python -m benchmarks.bench_query_profiler --users 2000 --reruns 2000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.fake_ollama import canned_quiz, canned_roadmap
+from services import archive, db_connection, query_profiler
+from services.database_service import (
+    create_db, get_user_profile, get_user_progress, get_user_roadmap, save_quiz_results, save_user_roadmap,
+)
+from services.db_connection import db_cursor, transaction
+from services.query_profiler import profiler, query_scope
+
+PAGES = ('Dashboard', 'Analytics')
+PASSES = 3
+
+
+def seed(users, attempts):
+    quiz = json.dumps(canned_quiz("Milestone 1"))
+    with transaction() as cursor:
+        cursor.executemany(
+            "INSERT INTO users (username, password, role, role_specific_field, end_goal) VALUES (?, ?, ?, ?, ?)",
+            ((f"user{i}", "x", "Student", "CS", "Data Analyst") for i in range(users)),
+        )
+        cursor.executemany(
+            "INSERT INTO quiz_results (username, quiz_data, result, score, phase, milestone) VALUES (?, ?, '[]', ?, ?, ?)",
+            ((f"user{i}", quiz, (i * 7 + a) % 100, "Phase 1", f"Milestone {a}")
+             for i in range(users) for a in range(attempts)),
+        )
+        roadmap = canned_roadmap()
+        for i in range(users):
+            save_user_roadmap(f"user{i}", roadmap)
+
+
+def rerun(rng, users, n):
+    username = f"user{rng.randrange(users)}"
+    page = PAGES[n % len(PAGES)]
+    with query_scope(username, page):
+        get_user_profile(username)
+        get_user_roadmap(username)
+        get_user_progress(username)
+        archive.get_quiz_results(username, limit=5)
+        if page == 'Analytics' and n % 5 == 1:
+            save_quiz_results(username, canned_quiz("Milestone 1"), ['Option A'], 80, None, "Phase 1", "Milestone 1")
+
+
+# A report scanning every quiz attempt, so it crosses the slow query threshold
+def weak_milestones():
+    with db_cursor() as cursor:
+        cursor.execute('''
+        SELECT milestone, AVG(score), COUNT(*) FROM quiz_results
+        WHERE quiz_data LIKE '%Option%'
+        GROUP BY milestone ORDER BY AVG(score) LIMIT 5
+        ''')
+        return cursor.fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--attempts', type=int, default=20)
+    parser.add_argument('--reruns', type=int, default=2000)
+    parser.add_argument('--slow-ms', type=float, default=20)
+    args = parser.parse_args()
+
+    profiler.slow_seconds = args.slow_ms / 1000
+    with tempfile.TemporaryDirectory() as tmp:
+        db_connection.set_db_path(os.path.join(tmp, 'users.db'))
+        query_profiler.SLOW_QUERY_LOG = os.path.join(tmp, 'slow_queries.log')
+        create_db()
+        seed(args.users, args.attempts)
+        profiler.reset()
+
+        seconds = {False: 0.0, True: 0.0}
+        for n in range(PASSES * 2):
+            enabled = bool(n % 2)
+            query_profiler.PROFILE_ENABLED = enabled
+            rng = random.Random(n // 2)
+            started = time.perf_counter()
+            for i in range(args.reruns):
+                rerun(rng, args.users, i)
+            seconds[enabled] += time.perf_counter() - started
+
+        weak_milestones()
+        summary = profiler.summary(limit=8)
+        db_connection.close_all()
+
+    off, on = (seconds[enabled] / (PASSES * args.reruns) * 1000 for enabled in (False, True))
+    print(f"users={args.users} attempts/user={args.attempts} reruns={args.reruns} x {PASSES} passes each way")
+    print(f"per rerun: profiling off {off:.3f} ms, on {on:.3f} ms ({(on - off) / off * 100:+.1f}%)")
+    print(f"recorded {summary['queries']} queries, {summary['total_ms']:.0f} ms; "
+          f"{summary['background_queries']} outside a rerun")
+
+    print(f"\n{'call site':<52} {'calls':>7} {'avg ms':>8} {'max ms':>8}  sql")
+    for row in summary['statements']:
+        print(f"{row['site']:<52} {row['calls']:>7} {row['avg_ms']:>8.3f} {row['max_ms']:>8.3f}  {row['sql'][:50]}")
+
+    print(f"\n{'page':<12} {'reruns':>7} {'avg queries':>12} {'max queries':>12} {'avg ms':>8}")
+    for row in summary['reruns']:
+        print(f"{row['page']:<12} {row['reruns']:>7} {row['avg_queries']:>12.1f} "
+              f"{row['max_queries']:>12} {row['avg_ms']:>8.3f}")
+    print("busiest users: " + ", ".join(f"{u['user']} ({u['queries']})" for u in summary['users'][:5]))
+
+    print(f"\nslow queries over {args.slow_ms:g} ms:")
+    for entry in summary['slow_queries']:
+        print(f"  {entry['ms']:.1f} ms at {entry['site']}\n    plan: {entry['plan']}")
+    if not any(entry['site'].endswith('.weak_milestones') for entry in summary['slow_queries']):
+        raise SystemExit("The full-scan report was not logged as a slow query")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Quiz grading: the local grading engine against grading every answer with the LLM.
+
+Starts a fake Ollama server and grades --submissions quiz submissions of
+mixed multiple-choice, true/false and short-answer questions, where the
+short answers are exact, reworded, misspelt or wrong. Reports time per
+submission and model generations (response cache hits excluded) for grading
+every answer with the model (one call per answer) and for the local engine,
+which only sends its low-confidence short answers to the model, in one call
+per submission.
+
+    python -m benchmarks.bench_quiz_grading --submissions 50
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.fake_ollama import start_fake_ollama
+
+SHORT = (
+    ("What does SQL stand for?", "Structured Query Language",
+     ("structured query language", "Structured Query Langauge", "a query language for databases",
+      "a programming language for spreadsheets")),
+    ("What is overfitting?", "When a model learns noise in the training data and fails to generalize to new data",
+     ("the model learns the noise of the training data and fails to generalize",
+      "a model that memorizes training data noise and does not generalize to new data",
+      "when the model is too simple", "a kind of cross validation")),
+    ("What is a primary key?", "A column that uniquely identifies each row in a table",
+     ("a column that uniquely identifies every row in a table", "unique identifier of each row in a table",
+      "a key used to encrypt the database", "the first column")),
+    ("What does gradient descent do?",
+     "It minimizes a loss by repeatedly updating parameters in the direction of the negative gradient",
+     ("minimizes the loss by updating the parameters along the negative gradient",
+      "repeatedly updates parameters to minimize the loss", "it sorts data", "")),
+)
+
+
+def submission(rng, n, size=10):
+    questions, answers = [], []
+    for i in range(size):
+        if i % 3 == 0:
+            options = ['Option A', 'Option B', 'Option C', 'Option D']
+            questions.append({'question': f"Quiz {n} question {i}: which option is correct?", 'options': options,
+                              'answer': 'Option A'})
+            answers.append(rng.choice(options))
+        elif i % 3 == 1:
+            questions.append({'question': f"True or False: quiz {n} statement {i}.", 'options': [], 'answer': 'True'})
+            answers.append(rng.choice(['True', 'False']))
+        else:
+            question, reference, candidates = rng.choice(SHORT)
+            questions.append({'question': question, 'options': [], 'answer': reference})
+            answers.append(rng.choice(candidates))
+    return questions, answers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--submissions', type=int, default=50)
+    args = parser.parse_args()
+
+    server = start_fake_ollama()
+    # The app modules read OLLAMA_HOST when they are first imported
+    os.environ['OLLAMA_HOST'] = server.url
+    from models.llama_model import LlamaRoadmapManager
+    from models.quiz_grading import grade_submission, question_type
+    from models.response_cache import ResponseCache
+    from models.telemetry import telemetry
+
+    def generations():
+        row = next((row for row in telemetry.summary() if row['kind'] == 'grading'), None)
+        return row['calls'] - row['cache_hits'] if row else 0
+
+    rng = random.Random(0)
+    submissions = [submission(rng, n) for n in range(args.submissions)]
+    answers_total = sum(len(questions) for questions, _ in submissions)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = LlamaRoadmapManager(
+            'bench', 'Student', 'Undergraduate', 'Computer Science', 'Data Analyst',
+            cache=ResponseCache(os.path.join(tmp, 'llm_cache.db')),
+        )
+
+        telemetry.reset()
+        started = time.perf_counter()
+        for questions, answers in submissions:
+            for question, answer in zip(questions, answers):
+                manager.grade_answers([{'question': question['question'], 'reference': question['answer'],
+                                        'answer': answer}])
+        llm_seconds = time.perf_counter() - started
+        llm_generations = generations()
+
+        calls = []
+        telemetry.reset()
+
+        def fallback(items):
+            calls.append(len(items))
+            return manager.grade_answers(items)
+
+        started = time.perf_counter()
+        grades = [grade_submission(questions, answers, fallback) for questions, answers in submissions]
+        local_seconds = time.perf_counter() - started
+        local_generations = generations()
+
+    short = sum(1 for questions, _ in submissions for q in questions if question_type(q) == 'short')
+    print(f"submissions={args.submissions} answers={answers_total} short answers={short}")
+    print(f"{'grader':<16} {'answers to llm':>14} {'generations':>11} {'ms/submission':>13}")
+    print(f"{'llm per answer':<16} {answers_total:>14} {llm_generations:>11} "
+          f"{llm_seconds / args.submissions * 1000:>13.1f}")
+    print(f"{'local engine':<16} {sum(calls):>14} {local_generations:>11} "
+          f"{local_seconds / args.submissions * 1000:>13.1f}")
+    print(f"short answers sent to the llm: {sum(g['llm_graded'] for g in grades) / short:.0%}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Resource catalog: deduplication, FTS5 search and reverse lookups on a large corpus.
+
+Saves --roadmaps roadmaps (one per user) whose milestones draw their
+resources from --distinct resources, each written in several ways (case,
+URL with or without www and trailing slash, "Title - description" or
+"Title (description)"). Reports the save rate, how many catalog entries the
+resource rows collapse into, and the latency of keyword search and "which
+milestones use this resource" through the catalog against scanning every
+roadmap's JSON.
+
+    python -m benchmarks.bench_resource_catalog --roadmaps 100000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from services import db_connection
+from services.database_service import create_db, save_user_roadmap
+from services.db_connection import db_cursor, transaction
+from services.resource_catalog import catalog_stats, parse_resource, resource_milestones, search_resources
+from services.roadmap_store import decode_roadmap
+
+TOPICS = ('Python', 'SQL', 'Statistics', 'Machine Learning', 'Deep Learning', 'Data Visualization',
+          'Linear Algebra', 'Cloud Computing', 'Product Strategy', 'Financial Modelling')
+KINDS = ('Course', 'Book', 'Tutorial', 'Handbook', 'Video Series')
+SAVE_BATCH = 1000
+
+
+def resource_pool(distinct):
+    pool = []
+    for i in range(distinct):
+        topic = TOPICS[i % len(TOPICS)]
+        kind = KINDS[i // len(TOPICS) % len(KINDS)]
+        title = f"{topic} {kind} {i}"
+        description = f"an introduction to {topic.lower()} for beginners"
+        url = f"https://www.learn{i % 97}.com/{topic.lower().replace(' ', '-')}/{i}" if i % 2 else None
+        pool.append((title, description, url))
+    return pool
+
+
+# One of the ways a roadmap may name the resource
+def worded(rng, title, description, url):
+    if url:
+        link = rng.choice((url, url + '/', url.replace('https://www.', 'https://'), url.replace('https://', '')))
+        return rng.choice((f"{title} - {link}", f"{link} - {title}: {description}"))
+    return rng.choice((f"{title} - {description}", f"{title.lower()} ({description})", title.upper()))
+
+
+def roadmap(rng, pool):
+    return {'roadmap': {'phases': [
+        {'name': f"Phase {p}: {name}", 'milestones': [
+            {
+                'name': f"Milestone {p}.{m}",
+                'description': "Study and practise.",
+                'timeline': f"{m + 1} weeks",
+                'resources': [worded(rng, *rng.choice(pool)) for _ in range(2)],
+            }
+            for m in range(1, 3)
+        ]}
+        for p, name in enumerate(('Beginner', 'Intermediate', 'Advanced'), start=1)
+    ]}}
+
+
+# Scan every roadmap document: (milestones, resource texts) matching the predicate
+def scan_roadmaps(predicate):
+    milestones = set()
+    with db_cursor() as cursor:
+        cursor.execute("SELECT username, roadmap FROM roadmaps")
+        for username, stored in cursor:
+            for phase in decode_roadmap(stored)['roadmap']['phases']:
+                for milestone in phase['milestones']:
+                    if any(predicate(r) for r in milestone['resources']):
+                        milestones.add((username, phase['name'], milestone['name']))
+    return milestones
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--roadmaps', type=int, default=100000)
+    parser.add_argument('--distinct', type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    pool = resource_pool(args.distinct)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_connection.set_db_path(os.path.join(tmp, 'users.db'))
+        create_db()
+
+        started = time.perf_counter()
+        for start in range(0, args.roadmaps, SAVE_BATCH):
+            # Batches of saves share a transaction, as bulk onboarding's do
+            with transaction():
+                for i in range(start, min(start + SAVE_BATCH, args.roadmaps)):
+                    save_user_roadmap(f"user{i}", roadmap(rng, pool))
+        save_seconds = time.perf_counter() - started
+
+        stats = catalog_stats()
+        print(f"roadmaps={args.roadmaps} resource rows={stats['references']} "
+              f"catalog entries={stats['entries']} (pool {args.distinct}) fts5={stats['full_text_search']}")
+        print(f"saved {args.roadmaps / save_seconds:.0f} roadmaps/sec")
+
+        title = pool[7][0]
+        print(f"{'query':<40} {'catalog ms':>10} {'scan ms':>10} {'results':>8}")
+        for query in ('machine learning handbook', 'statist', title.lower()):
+            words = query.split()
+            found, catalog_ms = timed(lambda: search_resources(query))
+            scanned, scan_ms = timed(lambda: scan_roadmaps(lambda r: all(w in r.lower() for w in words)))
+            print(f"{'search ' + repr(query):<40} {catalog_ms:>10.1f} {scan_ms:>10.1f} {len(found):>8}")
+
+        key = parse_resource(worded(rng, *pool[7]))['key']
+        with db_cursor() as cursor:
+            cursor.execute("SELECT id FROM resource_catalog WHERE key = ?", (key,))
+            catalog_id = cursor.fetchone()[0]
+        used, catalog_ms = timed(lambda: {row['milestone_id'] for row in resource_milestones(catalog_id)})
+        scanned, scan_ms = timed(lambda: scan_roadmaps(lambda r: parse_resource(r)['key'] == key))
+        print(f"{'milestones using ' + repr(title):<40} {catalog_ms:>10.1f} {scan_ms:>10.1f} {len(used):>8}")
+        if len(used) != len(scanned):
+            raise SystemExit(f"Reverse lookup found {len(used)} milestones, the scan {len(scanned)}")
+
+
+if __name__ == '__main__':
+    main()
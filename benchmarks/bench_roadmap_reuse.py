@@ -0,0 +1,118 @@
+"""Roadmap reuse for near-identical profiles through the semantic profile index.
+
+Starts a fake Ollama server and generates roadmaps for --users users whose
+profiles are --profiles base profiles worded in different ways (case,
+plurals, qualifiers). Runs once with only the exact response cache and once
+with the profile index, and reports generations, reuse rate and time per
+roadmap for both. First checks that adapting a reused roadmap to a new
+wording replaces whole words only and leaves resources as written.
+
+    python -m benchmarks.bench_roadmap_reuse --users 200 --profiles 10
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.fake_ollama import start_fake_ollama
+
+ROLES = ('Student', 'Professional')
+STAGES = ('Undergraduate', 'Postgraduate', 'PhD')
+FIELDS = ('Computer Science', 'Biology', 'Finance', 'Mechanical Engineering', 'Graphic Design')
+GOALS = ('Data Analyst', 'AI Scientist', 'Product Manager', 'Researcher', 'Quant Developer')
+WORDINGS = (
+    lambda s: s,
+    lambda s: s.lower(),
+    lambda s: f"{s} (BSc)",
+    lambda s: f"{s}s",
+    lambda s: s.upper(),
+)
+
+
+def profiles(users, distinct, rng):
+    bases = []
+    while len(bases) < distinct:
+        base = (rng.choice(ROLES), rng.choice(STAGES), rng.choice(FIELDS), rng.choice(GOALS))
+        if base not in bases:
+            bases.append(base)
+    return [
+        (role, stage, rng.choice(WORDINGS)(field), end_goal)
+        for role, stage, field, end_goal in (rng.choice(bases) for _ in range(users))
+    ]
+
+
+# Wordings that contain one another must not be rewritten inside words
+def check_adaptation():
+    from models.roadmap_index import adapt_roadmap
+    source = {'field_of_study': 'Math', 'end_goal': 'AI'}
+    profile = {'field_of_study': 'Mathematics', 'end_goal': 'Data Science'}
+    roadmap = {'roadmap': {'phases': [{'name': 'Math foundations', 'milestones': [{
+        'name': 'Mathematics basics for AI',
+        'description': 'Math, then AI tools from OpenAI.',
+        'resources': ['Mathematics for ML - https://mml-book.github.io/', 'Math for AI (Coursera)'],
+    }]}]}}
+    milestone = adapt_roadmap(roadmap, source, profile)['roadmap']['phases'][0]['milestones'][0]
+    expected = {
+        'name': 'Mathematics basics for Data Science',
+        'description': 'Mathematics, then Data Science tools from OpenAI.',
+        'resources': roadmap['roadmap']['phases'][0]['milestones'][0]['resources'],
+    }
+    if milestone != expected:
+        raise SystemExit(f"Adapted milestone {milestone} != {expected}")
+
+
+# Generate every user's roadmap; threshold None runs with the exact cache only
+def run(label, users, tmp, threshold):
+    from models import roadmap_index
+    from models.llama_model import LlamaRoadmapManager
+    from models.response_cache import ResponseCache
+    from models.telemetry import telemetry
+    from services import db_connection
+    from services.database_service import create_db
+
+    directory = os.path.join(tmp, label)
+    os.makedirs(directory)
+    db_connection.set_db_path(os.path.join(directory, 'users.db'))
+    create_db()
+    cache = ResponseCache(os.path.join(directory, 'llm_cache.db'))
+    roadmap_index.REUSE_ENABLED = threshold is not None
+    roadmap_index._index = index = roadmap_index.RoadmapIndex(directory, threshold or roadmap_index.REUSE_THRESHOLD)
+    telemetry.reset()
+
+    started = time.perf_counter()
+    for i, profile in enumerate(users):
+        LlamaRoadmapManager(f"user{i}", *profile, cache=cache).generate_and_save_roadmap()
+    elapsed = time.perf_counter() - started
+
+    db_connection.close_all()
+    roadmap = next(row for row in telemetry.summary() if row['kind'] == 'roadmap')
+    return elapsed, roadmap['calls'] - roadmap['cache_hits'], index.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--profiles', type=int, default=10)
+    parser.add_argument('--threshold', type=float, default=None)
+    args = parser.parse_args()
+
+    server = start_fake_ollama()
+    # The app modules read OLLAMA_HOST when they are first imported
+    os.environ['OLLAMA_HOST'] = server.url
+    from models.roadmap_index import REUSE_THRESHOLD
+    check_adaptation()
+
+    users = profiles(args.users, args.profiles, random.Random(0))
+    print(f"users={args.users} base profiles={args.profiles} distinct wordings={len(set(users))}")
+    print(f"{'run':<16} {'generations':>11} {'reused':>7} {'reuse rate':>10} {'ms/roadmap':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, threshold in (('exact cache', None), ('profile index', args.threshold or REUSE_THRESHOLD)):
+            elapsed, generations, stats = run(label.replace(' ', '_'), users, tmp, threshold)
+            print(f"{label:<16} {generations:>11} {stats['reused']:>7} {stats['reuse_rate']:>10.0%} "
+                  f"{elapsed / len(users) * 1000:>10.1f}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
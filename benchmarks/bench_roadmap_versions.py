@@ -0,0 +1,113 @@
+"""Storage saved by delta-encoded roadmap versions, and the cost of reading them.
+
+Seeds a fresh database with --users users who each regenerate their roadmap
+--regenerations times, every version changing a share of the milestones
+like a real regeneration. Reports the bytes the same versions take as full
+JSON rows, as delta-encoded rows, and after compact_roadmaps(--keep), plus
+the database file size and read/diff latency.
+
+    python -m benchmarks.bench_roadmap_versions --users 200 --regenerations 30 --keep 20
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.fake_ollama import canned_roadmap
+from services import db_connection
+from services.database_service import create_db, save_user_roadmap
+from services.db_connection import db_cursor
+from services.roadmap_versions import compact_roadmaps, diff_roadmap_versions, get_roadmap_version
+
+
+# The next version of a roadmap: each milestone is rewritten with probability churn
+def regenerate(rng, previous, churn):
+    roadmap = copy.deepcopy(previous)
+    for phase in roadmap['roadmap']['phases']:
+        for milestone in phase['milestones']:
+            if rng.random() < churn:
+                milestone['description'] = f"Rewritten description {rng.random():.6f}."
+                milestone['timeline'] = f"{rng.randint(1, 6)} weeks"
+                milestone['resources'] = [f"Resource {rng.randint(1, 999)}" for _ in range(rng.randint(1, 4))]
+    return roadmap
+
+
+def stored_bytes():
+    with db_cursor() as cursor:
+        cursor.execute("SELECT COALESCE(SUM(LENGTH(roadmap)), 0), COUNT(*) FROM roadmaps")
+        return cursor.fetchone()
+
+
+def file_size(path):
+    with db_cursor() as cursor:
+        # In WAL mode the vacuumed pages reach the main file at the checkpoint
+        cursor.execute("VACUUM")
+        cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return os.path.getsize(path)
+
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--regenerations', type=int, default=30)
+    parser.add_argument('--churn', type=float, default=0.3)
+    parser.add_argument('--keep', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'users.db')
+        db_connection.set_db_path(path)
+        create_db()
+
+        full_bytes = 0
+        started = time.perf_counter()
+        for i in range(args.users):
+            roadmap = canned_roadmap()
+            for _ in range(args.regenerations):
+                roadmap = regenerate(rng, roadmap, args.churn)
+                full_bytes += len(json.dumps(roadmap))
+                save_user_roadmap(f"user{i}", roadmap)
+        save_ms = (time.perf_counter() - started) / (args.users * args.regenerations) * 1000
+
+        delta_bytes, rows = stored_bytes()
+        delta_file = file_size(path)
+
+        started = time.perf_counter()
+        report = compact_roadmaps(args.keep)
+        compact_seconds = time.perf_counter() - started
+        compacted_bytes, compacted_rows = stored_bytes()
+        compacted_file = file_size(path)
+
+        latest = args.regenerations
+        oldest = max(1, args.regenerations - args.keep + 1)
+        read_latest_ms = timed(lambda: get_roadmap_version('user7', latest), args.repeat)
+        read_oldest_ms = timed(lambda: get_roadmap_version('user7', oldest), args.repeat)
+        diff_ms = timed(lambda: diff_roadmap_versions('user7', oldest, latest), args.repeat)
+
+        db_connection.close_all()
+
+    print(f"users={args.users} regenerations={args.regenerations} churn={args.churn} keep={args.keep}")
+    print(f"{'storage':<22} {'rows':>8} {'roadmap bytes':>14} {'vs full':>8}")
+    print(f"{'full JSON rows':<22} {rows:>8} {full_bytes:>14} {100.0:>7.1f}%")
+    print(f"{'delta-encoded':<22} {rows:>8} {delta_bytes:>14} {100.0 * delta_bytes / full_bytes:>7.1f}%")
+    print(f"{'after compaction':<22} {compacted_rows:>8} {compacted_bytes:>14} {100.0 * compacted_bytes / full_bytes:>7.1f}%")
+    print(f"database file: {delta_file / 1e6:.1f} MB delta-encoded, {compacted_file / 1e6:.1f} MB after compaction")
+    print(f"compaction: {compact_seconds:.2f}s, {report}")
+    print(f"save {save_ms:.2f} ms/version, read latest {read_latest_ms:.2f} ms, "
+          f"read oldest kept {read_oldest_ms:.2f} ms, diff {diff_ms:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Model router across several fake Ollama servers: balancing, limits and failover.
+
+Starts --servers fake Ollama servers (the last one --slow-factor times
+slower) and sends --requests quiz generations from --threads threads, first
+to one endpoint and then through a router over all of them, each endpoint
+limited to --per-endpoint requests in flight. In the pooled run the first
+server goes down halfway through; its requests must fail over without errors.
+
+    python -m benchmarks.bench_router --servers 3 --requests 60 --threads 12
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_ollama import DEFAULT_LATENCY, DEFAULT_TOKENS_PER_SEC, start_fake_ollama
+from models.model_router import Endpoint, ModelRouter
+
+
+def run(router, requests, threads, on_halfway=None):
+    done = []
+    errors = []
+    lock = threading.Lock()
+
+    def one(i):
+        try:
+            router.generate('quiz', prompt=f"Generate a quiz for Phase 1: Beginner #{i}")
+        except Exception as e:
+            with lock:
+                errors.append(f"{type(e).__name__}: {e}")
+        with lock:
+            done.append(i)
+            if on_halfway is not None and len(done) == requests // 2:
+                on_halfway()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(requests)))
+    return time.perf_counter() - started, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--servers', type=int, default=3)
+    parser.add_argument('--requests', type=int, default=60)
+    parser.add_argument('--threads', type=int, default=12)
+    parser.add_argument('--per-endpoint', type=int, default=2)
+    parser.add_argument('--latency', type=float, default=DEFAULT_LATENCY)
+    parser.add_argument('--tokens-per-sec', type=float, default=4 * DEFAULT_TOKENS_PER_SEC)
+    parser.add_argument('--slow-factor', type=float, default=3.0)
+    args = parser.parse_args()
+
+    servers = [
+        start_fake_ollama(latency=args.latency, tokens_per_sec=args.tokens_per_sec)
+        for _ in range(args.servers - 1)
+    ]
+    servers.append(start_fake_ollama(
+        latency=args.latency * args.slow_factor, tokens_per_sec=args.tokens_per_sec / args.slow_factor,
+    ))
+
+    single = ModelRouter([Endpoint(servers[0].url, args.per_endpoint)])
+    single_seconds, single_errors = run(single, args.requests, args.threads)
+
+    pool = ModelRouter([Endpoint(server.url, args.per_endpoint) for server in servers])
+    pool.check_health()
+    victim = servers[0]
+
+    def take_down():
+        victim.down = True
+
+    pool_seconds, pool_errors = run(pool, args.requests, args.threads, on_halfway=take_down)
+
+    print(f"servers={args.servers} requests={args.requests} threads={args.threads} per_endpoint={args.per_endpoint}")
+    print(f"{'run':<24} {'seconds':>8} {'req/sec':>8} {'errors':>7}")
+    for label, seconds, errors in (
+        ("1 endpoint", single_seconds, single_errors),
+        (f"{args.servers} endpoints, 1 down", pool_seconds, pool_errors),
+    ):
+        print(f"{label:<24} {seconds:>8.2f} {args.requests / seconds:>8.1f} {len(errors):>7}")
+
+    print(f"{'endpoint':<28} {'requests':>8} {'failures':>8} {'healthy':>8}")
+    for stats in pool.stats()['endpoints']:
+        print(f"{stats['url']:<28} {stats['requests']:>8} {stats['failures']:>8} {str(stats['healthy']):>8}")
+
+    for server in servers:
+        server.shutdown()
+    if pool_errors:
+        print("\n".join(pool_errors[:5]))
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
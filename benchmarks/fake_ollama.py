@@ -0,0 +1,236 @@
+"""Stand-in Ollama HTTP server that answers with canned roadmap, quiz and gap analysis JSON.
+
+Implements the parts of the Ollama API the app uses (/api/generate and
+/api/chat, streaming or not, /api/embeddings, /api/version and /api/tags). Each request
+takes --latency seconds plus the time to "generate" its answer at
+--tokens-per-sec, and reports total_duration, prompt_eval_count, eval_count
+and friends like the real server, so telemetry and caching behave the same.
+
+    python -m benchmarks.fake_ollama --port 11434 --latency 0.05 --tokens-per-sec 400
+"""
+import argparse
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from models.prompts import SYSTEM_PREFIX
+
+DEFAULT_LATENCY = 0.05
+DEFAULT_TOKENS_PER_SEC = 400.0
+STREAM_CHUNKS = 16
+EMBEDDING_DIMENSIONS = 256
+
+
+def canned_roadmap():
+    levels = ('Beginner', 'Intermediate', 'Advanced', 'Final')
+    return {'roadmap': {'phases': [
+        {
+            'name': f"Phase {p}: {level}",
+            'milestones': [
+                {
+                    'name': f"Milestone {p}.{m}",
+                    'description': f"Work through the {level.lower()} topics, part {m}.",
+                    'timeline': f"{p + 1} weeks",
+                    'resources': [f"Course {p}.{m}", f"Book {p}.{m}"],
+                }
+                for m in range(1, 4)
+            ],
+        }
+        for p, level in enumerate(levels, start=1)
+    ]}}
+
+
+def canned_quiz(topic):
+    questions = []
+    for i in range(1, 11):
+        if i % 3 == 1:
+            questions.append({
+                'question': f"Question {i} on {topic}: which option is correct?",
+                'options': ['Option A', 'Option B', 'Option C', 'Option D'],
+                'answer': 'Option A',
+            })
+        elif i % 3 == 2:
+            questions.append({'question': f"True or False: statement {i} on {topic}.", 'answer': 'True'})
+        else:
+            questions.append({'question': f"Explain concept {i} of {topic}.", 'answer': f"Concept {i}"})
+    return {'quiz': questions}
+
+
+def canned_gap_analysis():
+    return {'gap_analysis': {'recommendations': ['Revise the basics', 'Take an online course', 'Watch a tutorial']}}
+
+
+# Answer for a prompt built by models/prompts.py; the task name follows the shared prefix
+def canned_answer(prompt):
+    tail = prompt[len(SYSTEM_PREFIX):] if prompt.startswith(SYSTEM_PREFIX) else prompt
+    if 'TASK quiz' in tail:
+        match = re.search(r'^(?:Milestone|Phase): (.+)$', tail, re.MULTILINE)
+        return canned_quiz(match.group(1) if match else 'the topic')
+    if 'TASK gap_analysis' in tail:
+        return canned_gap_analysis()
+    if 'TASK grading' in tail:
+        answers = len(re.findall(r'^\d+\. Question:', tail, re.MULTILINE))
+        return {'grading': {'correct': [True] * answers}}
+    return canned_roadmap()
+
+
+def count_tokens(text):
+    return max(1, len(text) // 4)
+
+
+# Hashed bag of character trigrams: texts worded alike get nearby vectors
+def fake_embedding(text):
+    text = f" {' '.join(re.findall(r'[a-z0-9]+', text.lower()))} "
+    vector = [0.0] * EMBEDDING_DIMENSIONS
+    for i in range(len(text) - 2):
+        digest = hashlib.md5(text[i:i + 3].encode()).digest()
+        vector[int.from_bytes(digest[:4], 'little') % EMBEDDING_DIMENSIONS] += 1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    # A server marked down hangs up on every request, like a crashed host
+    def handle_one_request(self):
+        if self.server.down:
+            self.close_connection = True
+            return
+        super().handle_one_request()
+
+    def do_GET(self):
+        if self.path == '/api/version':
+            self._send_json({'version': '0.0.0-fake'})
+        elif self.path == '/api/tags':
+            self._send_json({'models': [{'name': 'llama3.1:latest', 'model': 'llama3.1:latest'}]})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        request = json.loads(self.rfile.read(length) or b'{}')
+        self.server.requests += 1
+
+        if self.path == '/api/embeddings':
+            time.sleep(self.server.latency)
+            self._send_json({'embedding': fake_embedding(request.get('prompt', ''))})
+            return
+
+        if self.path == '/api/generate':
+            prompt = request.get('prompt', '')
+            chat = False
+        elif self.path == '/api/chat':
+            # A continuation: the real model would pick up where the assistant
+            # message stopped, so answer with nothing more to add
+            prompt = ''.join(m.get('content', '') for m in request.get('messages', []))
+            chat = True
+        else:
+            self.send_error(404)
+            return
+
+        started = time.perf_counter_ns()
+        text = '' if chat else json.dumps(canned_answer(prompt))
+        prompt_tokens = count_tokens(prompt)
+        eval_tokens = count_tokens(text) if text else 0
+        eval_seconds = eval_tokens / self.server.tokens_per_sec
+        time.sleep(self.server.latency)
+
+        def final_fields():
+            return {
+                'done': True,
+                'done_reason': 'stop',
+                'total_duration': time.perf_counter_ns() - started,
+                'load_duration': 0,
+                'prompt_eval_count': prompt_tokens,
+                'prompt_eval_duration': int(self.server.latency * 1e9),
+                'eval_count': eval_tokens,
+                'eval_duration': int(eval_seconds * 1e9),
+            }
+
+        def body(fragment):
+            base = {'model': request.get('model'), 'created_at': datetime.now(timezone.utc).isoformat()}
+            if chat:
+                base['message'] = {'role': 'assistant', 'content': fragment}
+            else:
+                base['response'] = fragment
+            return base
+
+        if request.get('stream', True):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            size = max(1, -(-len(text) // STREAM_CHUNKS))
+            for i in range(0, len(text), size):
+                time.sleep(eval_seconds / STREAM_CHUNKS)
+                self._write_chunk(dict(body(text[i:i + size]), done=False))
+            self._write_chunk(dict(body(''), **final_fields()))
+            self.wfile.write(b'0\r\n\r\n')
+        else:
+            time.sleep(eval_seconds)
+            self._send_json(dict(body(text), **final_fields()))
+
+    def _write_chunk(self, data):
+        line = json.dumps(data).encode() + b'\n'
+        self.wfile.write(f"{len(line):x}\r\n".encode() + line + b'\r\n')
+        self.wfile.flush()
+
+    def _send_json(self, data):
+        payload = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=DEFAULT_LATENCY, tokens_per_sec=DEFAULT_TOKENS_PER_SEC):
+        super().__init__(address, FakeOllamaHandler)
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+        self.requests = 0
+        self.down = False
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+# Start a fake server on a background thread; port 0 picks a free port
+def start_fake_ollama(port=0, host='127.0.0.1', latency=DEFAULT_LATENCY, tokens_per_sec=DEFAULT_TOKENS_PER_SEC):
+    server = FakeOllamaServer((host, port), latency, tokens_per_sec)
+    threading.Thread(target=server.serve_forever, name='fake-ollama', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--latency', type=float, default=DEFAULT_LATENCY)
+    parser.add_argument('--tokens-per-sec', type=float, default=DEFAULT_TOKENS_PER_SEC)
+    args = parser.parse_args()
+
+    server = FakeOllamaServer((args.host, args.port), args.latency, args.tokens_per_sec)
+    print(f"Fake Ollama listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+import asyncio
+import time
+
+from models.llama_model import LlamaRoadmapManager, known_roadmap
+from models.model_router import get_router, router_from_env
+from models.prompts import KEEP_ALIVE
+from models.telemetry import track_llm_call
+from models.response_cache import get_response_cache
+from models.roadmap_index import index_roadmap
+from models.structured_output import (
+    Roadmap, Quiz, GapAnalysis, StructuredOutputError, first_pass, after_continuation, continuation_messages,
+)
+from services.database_service import save_user_roadmap
+
+# Asyncio front end to Ollama for batch work (admin regeneration, prefetching).
+#
+# A semaphore bounds how many requests this client has in flight; requests go
+# through the model router (models/model_router.py), which also enforces each
+# endpoint's own limit. Each request has a timeout, and cancelling a batch
+# cancels every outstanding request in it. host= sends everything to that one
+# endpoint instead of the configured pool.
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_TIMEOUT = 300.0
+
+
+class AsyncLlamaClient:
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT, host=None, cache=None):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.host = host
+        self.cache = cache if cache is not None else get_response_cache()
+        self.router = router_from_env(host) if host else get_router()
+        self._semaphore = None
+        self._loop = None
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+
+    # The semaphore is bound to the running event loop, so create it lazily
+    # and again whenever the client is used from a new loop
+    def _ensure_loop_state(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def generate(self, prompt, kind, use_cache=True, schema=None):
+        self._ensure_loop_state()
+        model = self.router.model_for(kind)
+        options = {'format': schema} if schema else None
+        with track_llm_call(kind) as call:
+            if use_cache:
+                cached = await asyncio.to_thread(self.cache.get, model, prompt, options)
+                if cached is not None:
+                    call.cache_hit = True
+                    self.completed += 1
+                    return cached, True
+
+            call.response = await self._call(lambda: self.router.agenerate(
+                kind, prompt=prompt, format=schema, keep_alive=KEEP_ALIVE,
+            ))
+        self.completed += 1
+        return call.response['response'], False
+
+    # Start one Ollama request inside the concurrency limit and await it with the timeout
+    async def _call(self, start_request):
+        async with self._semaphore:
+            try:
+                return await asyncio.wait_for(start_request(), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                self.failed += 1
+                raise
+            except Exception:
+                self.failed += 1
+                raise
+
+    # Async counterpart of LlamaRoadmapManager._structured
+    async def generate_structured(self, prompt, kind, result_model, use_cache=True, text=None, cached=True):
+        schema = result_model.model_json_schema()
+        model = self.router.model_for(kind)
+        options = {'format': schema}
+        if text is None:
+            text, cached = await self.generate(prompt, kind, use_cache, schema)
+
+        try:
+            result = first_pass(text, result_model)
+            if result is None:
+                with track_llm_call(f'{kind}_continuation') as call:
+                    call.response = await self._call(lambda: self.router.achat(
+                        f'{kind}_continuation', messages=continuation_messages(prompt, text), keep_alive=KEEP_ALIVE,
+                    ))
+                text += call.response['message']['content']
+                result = after_continuation(text, result_model)
+                cached = False
+        except StructuredOutputError:
+            if cached:
+                await asyncio.to_thread(self.cache.delete, model, prompt, options)
+            raise
+
+        if not cached:
+            await asyncio.to_thread(self.cache.put, model, prompt, text, options)
+        return result
+
+    # Like LlamaRoadmapManager.generate_and_save_roadmap: cached or similar-profile
+    # roadmaps are served without a generation, generated ones are indexed
+    async def generate_roadmap(self, manager, use_cache=True, save=True):
+        prompt = manager._roadmap_prompt()
+        profile = manager.get_user_profile()
+        text = vector = None
+        if use_cache:
+            text, vector = await asyncio.to_thread(
+                known_roadmap, self.cache, self.router.model_for('roadmap'), prompt, profile,
+            )
+        roadmap = await self.generate_structured(prompt, 'roadmap', Roadmap, use_cache=False, text=text)
+        if text is None:
+            await asyncio.to_thread(index_roadmap, profile, roadmap, vector)
+        if save:
+            await asyncio.to_thread(save_user_roadmap, manager.username, roadmap)
+        return roadmap
+
+    async def generate_quiz(self, manager, phase, milestone=None, use_cache=True):
+        return await self.generate_structured(manager._quiz_prompt(phase, milestone), 'quiz', Quiz, use_cache)
+
+    async def generate_gap_analysis(self, manager, wrong_answers, use_cache=True):
+        return await self.generate_structured(
+            manager._gap_analysis_prompt(wrong_answers), 'gap_analysis', GapAnalysis, use_cache,
+        )
+
+    # Generate and save roadmaps for many users at once.
+    # profiles are dicts with username, role, current_stage, field_of_study and end_goal.
+    # Results come back in input order; a failed profile yields its exception.
+    async def generate_roadmaps(self, profiles, use_cache=True, save=True):
+        managers = [_manager(profile) for profile in profiles]
+        return await asyncio.gather(
+            *(self.generate_roadmap(m, use_cache, save) for m in managers),
+            return_exceptions=True,
+        )
+
+    # Generate quizzes for several phases (or (phase, milestone) pairs) of one profile
+    async def generate_quizzes(self, manager, phases, use_cache=True):
+        targets = [p if isinstance(p, tuple) else (p, None) for p in phases]
+        return await asyncio.gather(
+            *(self.generate_quiz(manager, phase, milestone, use_cache) for phase, milestone in targets),
+            return_exceptions=True,
+        )
+
+    def stats(self):
+        return {
+            'concurrency': self.concurrency,
+            'completed': self.completed,
+            'failed': self.failed,
+            'timeouts': self.timeouts,
+        }
+
+
+def _manager(profile):
+    if isinstance(profile, LlamaRoadmapManager):
+        return profile
+    return LlamaRoadmapManager(
+        profile['username'], profile['role'], profile['current_stage'],
+        profile['field_of_study'], profile['end_goal'],
+    )
+
+
+# Run a batch coroutine to completion and time it; returns (results, throughput report)
+def run_batch(coro_factory, batch_size):
+    async def timed():
+        started = time.perf_counter()
+        results = await coro_factory()
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(timed())
+    failures = sum(1 for r in results if isinstance(r, BaseException))
+    return results, {
+        'batch_size': batch_size,
+        'seconds': elapsed,
+        'requests_per_sec': batch_size / elapsed if elapsed else 0.0,
+        'failures': failures,
+    }
@@ -0,0 +1,249 @@
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+
+from models.async_llama import DEFAULT_CONCURRENCY, AsyncLlamaClient
+from models.llama_model import LlamaRoadmapManager
+from services.database_service import create_db, hash_password, save_user_roadmap
+from services.db_connection import db_cursor, transaction
+from services.events import publish
+
+# Bulk onboarding of a whole class from a CSV or JSONL file of profiles.
+#
+#     python -m models.bulk_onboarding students.csv --workers 4
+#
+# Columns: username, password, role, current_stage, role_specific_field (or
+# field_of_study) and end_goal. Users are inserted INSERT_BATCH_ROWS at a time,
+# one transaction per batch; usernames that already exist are left untouched.
+# Roadmaps are then generated through AsyncLlamaClient, once per distinct
+# profile, and saved for every user sharing it.
+#
+# Progress is checkpointed next to the input file (rows inserted so far), and
+# a user who already has a roadmap is never generated again, so re-running an
+# interrupted import resumes where it stopped.
+
+INSERT_BATCH_ROWS = 500
+PROGRESS_INTERVAL = 0.5
+REQUIRED_FIELDS = ('username', 'password', 'role', 'role_specific_field', 'end_goal')
+
+
+def _normalize(row):
+    row = {key.strip(): (value.strip() if isinstance(value, str) else value)
+           for key, value in row.items() if key}
+    if not row.get('role_specific_field') and row.get('field_of_study'):
+        row['role_specific_field'] = row['field_of_study']
+    row.setdefault('current_stage', '')
+    return row
+
+
+# Profiles in file order as dicts; .jsonl / .ndjson files hold one JSON object per line
+def read_profiles(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith(('.jsonl', '.ndjson')):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    return [_normalize(row) for row in rows]
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Checkpoint:
+    def __init__(self, path, source_digest):
+        self.path = path
+        self.state = {'source': source_digest, 'rows_done': 0, 'inserted': 0, 'existing': 0, 'invalid': []}
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        # A checkpoint of a different (edited) input file does not apply
+        if saved.get('source') == source_digest:
+            self.state.update(saved)
+
+    def __getitem__(self, key):
+        return self.state[key]
+
+    def __setitem__(self, key, value):
+        self.state[key] = value
+
+    # Write to a temporary file and rename, so an interrupt never leaves half a checkpoint
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
+
+
+# One-line progress with rate and ETA, redrawn at most every PROGRESS_INTERVAL seconds
+class Progress:
+    def __init__(self, label, total, done=0, stream=None):
+        self.label = label
+        self.total = total
+        self.done = self.resumed_at = done
+        self.stream = stream or sys.stderr
+        self.started = time.perf_counter()
+        self._drawn = 0.0
+
+    def advance(self, n=1):
+        self.done += n
+        now = time.perf_counter()
+        if now - self._drawn >= PROGRESS_INTERVAL or self.done >= self.total:
+            self._drawn = now
+            self._draw(now - self.started)
+
+    def _draw(self, elapsed):
+        rate = (self.done - self.resumed_at) / elapsed if elapsed else 0.0
+        remaining = (self.total - self.done) / rate if rate else 0.0
+        percent = 100.0 * self.done / self.total if self.total else 100.0
+        eta = time.strftime('%H:%M:%S', time.gmtime(remaining))
+        self.stream.write(f"\r{self.label}: {self.done}/{self.total} ({percent:.0f}%) {rate:.1f}/s ETA {eta}")
+        if self.done >= self.total:
+            self.stream.write("\n")
+        self.stream.flush()
+
+
+# Insert one batch of rows in a single transaction; returns the usernames inserted
+def _insert_batch(rows):
+    usernames = [row['username'] for row in rows]
+    with transaction(immediate=True) as cursor:
+        placeholders = ", ".join("?" * len(usernames))
+        cursor.execute(f"SELECT username FROM users WHERE username IN ({placeholders})", usernames)
+        existing = {row[0] for row in cursor.fetchall()}
+
+        new_rows = []
+        for row in rows:
+            if row['username'] not in existing:
+                existing.add(row['username'])
+                new_rows.append(row)
+
+        cursor.executemany('''
+        INSERT INTO users (username, password, role, current_stage, role_specific_field, end_goal)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ''', [
+            (row['username'], hash_password(row['password']), row['role'], row['current_stage'],
+             row['role_specific_field'], row['end_goal'])
+            for row in new_rows
+        ])
+
+    return [row['username'] for row in new_rows]
+
+
+def import_users(profiles, checkpoint, batch_rows=INSERT_BATCH_ROWS):
+    progress = Progress("users", len(profiles), checkpoint['rows_done'])
+
+    for start in range(checkpoint['rows_done'], len(profiles), batch_rows):
+        batch = profiles[start:start + batch_rows]
+        valid = []
+        for line, row in enumerate(batch, start + 1):
+            missing = [field for field in REQUIRED_FIELDS if not row.get(field)]
+            if missing:
+                checkpoint['invalid'].append({'row': line, 'missing': missing})
+            else:
+                valid.append(row)
+
+        inserted = _insert_batch(valid) if valid else []
+        for username in inserted:
+            publish('profile_updated', username=username)
+
+        checkpoint['inserted'] += len(inserted)
+        checkpoint['existing'] += len(valid) - len(inserted)
+        checkpoint['rows_done'] = start + len(batch)
+        checkpoint.save()
+        progress.advance(len(batch))
+
+
+# Stored profiles of the given users that have no roadmap yet, grouped by
+# identical profile: {(role, current_stage, role_specific_field, end_goal): [usernames]}
+def pending_roadmaps(usernames):
+    groups = {}
+    usernames = list(dict.fromkeys(usernames))
+    with db_cursor() as cursor:
+        for start in range(0, len(usernames), INSERT_BATCH_ROWS):
+            batch = usernames[start:start + INSERT_BATCH_ROWS]
+            placeholders = ", ".join("?" * len(batch))
+            cursor.execute(f'''
+            SELECT u.username, u.role, COALESCE(u.current_stage, ''), u.role_specific_field, u.end_goal
+            FROM users u
+            WHERE u.username IN ({placeholders})
+            AND NOT EXISTS (SELECT 1 FROM roadmaps r WHERE r.username = u.username)
+            ''', batch)
+            for username, *profile in cursor.fetchall():
+                groups.setdefault(tuple(profile), []).append(username)
+    return groups
+
+
+async def generate_roadmaps(groups, workers=DEFAULT_CONCURRENCY, use_cache=True, host=None):
+    client = AsyncLlamaClient(concurrency=workers, host=host)
+    progress = Progress("roadmaps", sum(len(users) for users in groups.values()))
+
+    async def one(profile, usernames):
+        role, current_stage, field, end_goal = profile
+        manager = LlamaRoadmapManager(usernames[0], role, current_stage, field, end_goal, cache=client.cache)
+        roadmap = await client.generate_roadmap(manager, use_cache, save=False)
+        for username in usernames:
+            await asyncio.to_thread(save_user_roadmap, username, roadmap)
+            progress.advance()
+
+    results = await asyncio.gather(
+        *(one(profile, usernames) for profile, usernames in groups.items()),
+        return_exceptions=True,
+    )
+    errors = [
+        {'users': usernames, 'error': f"{type(result).__name__}: {result}"}
+        for usernames, result in zip(groups.values(), results)
+        if isinstance(result, BaseException)
+    ]
+    return {'profiles': len(groups), 'errors': errors, **client.stats()}
+
+
+# Import the users in path and generate their roadmaps; returns a report
+def bulk_onboard(path, workers=DEFAULT_CONCURRENCY, checkpoint_path=None, roadmaps=True, use_cache=True, host=None):
+    profiles = read_profiles(path)
+    checkpoint = Checkpoint(checkpoint_path or f"{path}.checkpoint.json", _file_digest(path))
+    import_users(profiles, checkpoint)
+
+    report = {
+        'rows': len(profiles),
+        'inserted': checkpoint['inserted'],
+        'existing': checkpoint['existing'],
+        'invalid': checkpoint['invalid'],
+    }
+    if roadmaps:
+        groups = pending_roadmaps(row['username'] for row in profiles if row.get('username'))
+        report['roadmaps'] = asyncio.run(generate_roadmaps(groups, workers, use_cache, host))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Onboard users in bulk from a CSV or JSONL file of profiles.")
+    parser.add_argument('path', help="CSV with a header row, or .jsonl with one profile per line")
+    parser.add_argument('--workers', type=int, default=DEFAULT_CONCURRENCY,
+                        help="roadmap generations in flight (match OLLAMA_NUM_PARALLEL)")
+    parser.add_argument('--checkpoint', help="checkpoint file (default: <path>.checkpoint.json)")
+    parser.add_argument('--host', default=None, help="Ollama host")
+    parser.add_argument('--no-roadmaps', action='store_true', help="only import the users")
+    parser.add_argument('--no-cache', action='store_true', help="bypass the response cache")
+    args = parser.parse_args()
+
+    create_db()
+    report = bulk_onboard(
+        args.path, args.workers, args.checkpoint,
+        roadmaps=not args.no_roadmaps, use_cache=not args.no_cache, host=args.host,
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import threading
+
+from models.llama_model import LlamaRoadmapManager
+from services.events import subscribe
+from services.job_queue import get_job_queue
+from services.quiz_bank import BANK_TARGET_QUESTIONS, bank_size, draw_quiz
+from services.user_cache import cached_profile, cached_roadmap
+
+# LLM generations submitted to the background job queue.
+# The UI submits a job, keeps its id in session state and polls it on each rerun.
+
+_registered = False
+_registered_lock = threading.Lock()
+
+
+def _profile(manager):
+    return {
+        'username': manager.username,
+        'role': manager.role,
+        'current_stage': manager.current_stage,
+        'field_of_study': manager.field_of_study,
+        'end_goal': manager.end_goal,
+    }
+
+
+def _manager(payload):
+    profile = payload['profile']
+    return LlamaRoadmapManager(
+        profile['username'], profile['role'], profile['current_stage'],
+        profile['field_of_study'], profile['end_goal'],
+    )
+
+
+def _dedupe_key(kind, *parts):
+    raw = json.dumps([kind, *parts], sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+# Streams the roadmap, publishing the phases finished so far as job progress
+def _run_roadmap(payload, report_progress):
+    phases = []
+    for event in _manager(payload).stream_roadmap(use_cache=payload['use_cache']):
+        if event['type'] == 'phase':
+            phases.append(event['phase'])
+            report_progress({'phases': phases})
+        elif event['type'] == 'done':
+            return {
+                'roadmap': event['roadmap'],
+                'time_to_first_phase': event['time_to_first_phase'],
+                'total_latency': event['total_latency'],
+            }
+
+
+def _run_quiz(payload, report_progress):
+    return _manager(payload).get_quiz(payload['phase'], payload['milestone'])
+
+
+def _run_quiz_prefetch(payload, report_progress):
+    return _manager(payload).prefetch_quiz(payload['phase'], payload['milestone'])
+
+
+def _run_quiz_refill(payload, report_progress):
+    return _manager(payload).refill_quiz_bank(payload['phase'], payload['milestone'])
+
+
+def _run_gap_analysis(payload, report_progress):
+    return _manager(payload).generate_gap_analysis(payload['wrong_answers'], use_cache=payload['use_cache'])
+
+
+# Job queue with the generation handlers registered and stale jobs recovered
+def get_generation_queue():
+    global _registered
+    queue = get_job_queue()
+    if not _registered:
+        with _registered_lock:
+            if not _registered:
+                queue.register('roadmap', _run_roadmap)
+                queue.register('quiz', _run_quiz)
+                queue.register('quiz_prefetch', _run_quiz_prefetch)
+                queue.register('quiz_refill', _run_quiz_refill)
+                queue.register('gap_analysis', _run_gap_analysis)
+                queue.recover()
+                queue.prune()
+                _registered = True
+    return queue
+
+
+# The roadmap is saved per user, so only the same user's requests coalesce
+def submit_roadmap(manager, use_cache=True):
+    profile = _profile(manager)
+    return get_generation_queue().submit(
+        'roadmap',
+        {'profile': profile, 'use_cache': use_cache},
+        dedupe_key=_dedupe_key('roadmap', profile['username']),
+    )
+
+
+# Quizzes come from the per-profile question bank, so "Take Quiz" clicks of
+# learners with the same profile and milestone share one generation
+def submit_quiz(manager, phase, milestone=None):
+    return get_generation_queue().submit(
+        'quiz',
+        {'profile': _profile(manager), 'phase': phase, 'milestone': milestone},
+        dedupe_key=_dedupe_key('quiz', manager.profile_fingerprint(), phase, milestone),
+    )
+
+
+# Fill a cold bank ahead of a "Take Quiz" click; never draws from the bank,
+# so prefetching does not use up questions nobody has seen
+def submit_quiz_prefetch(manager, phase, milestone=None):
+    return get_generation_queue().submit(
+        'quiz_prefetch',
+        {'profile': _profile(manager), 'phase': phase, 'milestone': milestone},
+        dedupe_key=_dedupe_key('quiz_prefetch', manager.profile_fingerprint(), phase, milestone),
+    )
+
+
+# Top the bank up with fresh (uncached) questions in the background
+def submit_quiz_refill(manager, phase, milestone=None):
+    return get_generation_queue().submit(
+        'quiz_refill',
+        {'profile': _profile(manager), 'phase': phase, 'milestone': milestone},
+        dedupe_key=_dedupe_key('quiz_refill', manager.profile_fingerprint(), phase, milestone),
+    )
+
+
+# Draw a quiz straight from the bank without touching the LLM.
+# Returns None on a miss; the caller then submits a quiz job.
+def quiz_from_bank(manager, phase, milestone=None):
+    fingerprint = manager.profile_fingerprint()
+    questions = draw_quiz(fingerprint, phase, milestone)
+    if questions is None:
+        return None
+
+    # Grow a small bank one quiz at a time so rotation has fresh questions
+    if bank_size(fingerprint, phase, milestone) < BANK_TARGET_QUESTIONS:
+        submit_quiz_refill(manager, phase, milestone)
+    return {'quiz': questions}
+
+
+# Gap analyses depend only on the profile, so identical profiles share one
+# in-flight generation
+def submit_gap_analysis(manager, wrong_answers, use_cache=True):
+    profile = _profile(manager)
+    shared = {k: v for k, v in profile.items() if k != 'username'}
+    return get_generation_queue().submit(
+        'gap_analysis',
+        {'profile': profile, 'wrong_answers': wrong_answers, 'use_cache': use_cache},
+        dedupe_key=_dedupe_key('gap_analysis', shared, wrong_answers),
+    )
+
+
+# The (phase name, milestone name) after the given one in a saved roadmap
+def _next_milestone(roadmap, phase, milestone):
+    order = [
+        (p['name'], m['name'])
+        for p in roadmap['roadmap']['phases']
+        for m in p.get('milestones', [])
+    ]
+    if (phase, milestone) in order:
+        index = order.index((phase, milestone)) + 1
+        if index < len(order):
+            return order[index]
+    return None
+
+
+# When a milestone is completed, make sure the next one's quiz is in the bank
+def _prefetch_next_quiz(username, phase, milestone):
+    roadmap = cached_roadmap(username)
+    profile = cached_profile(username)
+    if not roadmap or not profile:
+        return
+
+    upcoming = _next_milestone(roadmap, phase, milestone)
+    if upcoming is None:
+        return
+
+    manager = LlamaRoadmapManager(
+        username, profile['role'], profile['current_stage'],
+        profile['role_specific_field'], profile['end_goal'],
+    )
+    submit_quiz_prefetch(manager, *upcoming)
+
+
+subscribe('progress_recorded', _prefetch_next_quiz)
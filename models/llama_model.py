@@ -1,87 +1,199 @@
-import ollama
-import re
+import json
+import logging
+import threading
+import time
+from models.prompts import KEEP_ALIVE, SYSTEM_PREFIX, roadmap_prompt, quiz_prompt, gap_analysis_prompt, grading_prompt
+from models.quiz_grading import grade_submission
+from models.response_cache import get_response_cache
+from models.roadmap_index import find_reusable_roadmap, index_roadmap
+from models.stream_parser import IncrementalRoadmapParser
+from models.model_router import get_router
+from models.telemetry import track_llm_call
+from models.structured_output import (
+    Roadmap, Quiz, GapAnalysis, Grading, StructuredOutputError, extract_json_text, first_pass, after_continuation,
+    continuation_messages,
+)
 from services.database_service import save_user_roadmap, get_user_roadmap, save_quiz_results
+from services.quiz_bank import QUIZ_LENGTH, profile_fingerprint, add_questions, bank_size, draw_quiz
+from services.user_cache import (
+    user_cache, cached_profile, cached_roadmap, cached_summary,
+)
+
+_warmed_up = False
+_warm_up_lock = threading.Lock()
+
+# Load every routed model and prefill the shared prompt prefix on every
+# endpoint once per process, in the background, so the first user request
+# does not pay for either
+def warm_up_model():
+    global _warmed_up
+    with _warm_up_lock:
+        if _warmed_up:
+            return
+        _warmed_up = True
+
+    def run():
+        router = get_router()
+        for endpoint in router.endpoints:
+            for model in router.all_models():
+                try:
+                    with track_llm_call('warm_up') as call:
+                        call.response = endpoint.client.generate(
+                            model=model, prompt=SYSTEM_PREFIX, keep_alive=KEEP_ALIVE, options={'num_predict': 1},
+                        )
+                except Exception:
+                    logging.exception("Warm-up of %s on %s failed", model, endpoint.url)
+
+    threading.Thread(target=run, name='llama-warm-up', daemon=True).start()
+
+# Roadmap text for prompt from the exact response cache, else the roadmap of a
+# similar profile from the semantic index (then cached under this prompt).
+# Returns (text or None, the profile's vector for indexing what gets generated).
+def known_roadmap(cache, model, prompt, profile):
+    options = {'format': Roadmap.model_json_schema()}
+    text = cache.get(model, prompt, options)
+    if text is None:
+        roadmap, vector = find_reusable_roadmap(profile)
+        if roadmap is None:
+            return None, vector
+        text = json.dumps(roadmap)
+        cache.put(model, prompt, text, options)
+    with track_llm_call('roadmap') as call:
+        call.cache_hit = True
+    return text, None
 
 class LlamaRoadmapManager:
-    def __init__(self, username, role, current_stage, field_of_study, end_goal):
+    def __init__(self, username, role, current_stage, field_of_study, end_goal, cache=None):
         self.username = username
         self.role = role
         self.current_stage = current_stage
         self.field_of_study = field_of_study
         self.end_goal = end_goal
+        self.cache = cache if cache is not None else get_response_cache()
+        self.router = get_router()
 
-    def generate_and_save_roadmap(self):
-        prompt = f'''
-        Create a detailed learning roadmap in JSON format for a user with the following profile:
-        - Username: {self.username}
-        - Role: {self.role} (Student/Professional)
-        - Current Stage: {self.current_stage}
-        - Field of Study/Job Role: {self.field_of_study}
-        - End Goal: {self.end_goal}
-
-        The roadmap should include 4 phases, with each phase containing milestones, descriptions, timelines, and resources. Please format the response strictly in this JSON structure:
-        {{
-            "roadmap": {{
-                "phases": [
-                    {{
-                        "name": "Phase 1: Beginner",
-                        "milestones": [
-                            {{
-                                "name": "Milestone 1.1",
-                                "description": "Learn basic concepts.",
-                                "timeline": "2 weeks",
-                                "resources": [ "Resource 1", "Resource 2" ]
-                            }}
-                        ]
-                    }},
-                    {{
-                        "name": "Phase 2: Intermediate",
-                        "milestones": [
-                            {{
-                                "name": "Milestone 2.1",
-                                "description": "Learn intermediate concepts.",
-                                "timeline": "3 weeks",
-                                "resources": [ "Resource 1", "Resource 2" ]
-                            }}
-                        ]
-                    }},
-                    {{
-                        "name": "Phase 3: Advanced",
-                        "milestones": [
-                            {{
-                                "name": "Milestone 3.1",
-                                "description": "Master advanced topics.",
-                                "timeline": "4 weeks",
-                                "resources": [ "Resource 1", "Resource 2" ]
-                            }}
-                        ]
-                    }},
-                    {{
-                        "name": "Phase 4: Final",
-                        "milestones": [
-                            {{
-                                "name": "Milestone 4.1",
-                                "description": "Apply your knowledge to a real-world project.",
-                                "timeline": "4 weeks",
-                                "resources": [ "Resource 1", "Resource 2" ]
-                            }}
-                        ]
-                    }}
-                ]
-            }}
-        }}
-        '''
-        response = ollama.generate(model="llama3.1", prompt=prompt)
-        roadmap_json = self.extract_json_from_response(response)
-        save_user_roadmap(self.username, roadmap_json)
-        return roadmap_json
+    # Run a generation, serving identical prompts from the response cache.
+    # use_cache=False skips the lookup. A schema constrains the output to that
+    # JSON structure (Ollama format=). Returns (text, whether it was cached);
+    # the caller stores fresh text once it has validated it.
+    def _generate(self, prompt, kind, use_cache=True, schema=None):
+        model = self.router.model_for(kind)
+        options = {'format': schema} if schema else None
+        with track_llm_call(kind) as call:
+            if use_cache:
+                cached = self.cache.get(model, prompt, options)
+                if cached is not None:
+                    call.cache_hit = True
+                    return cached, True
 
-    def extract_json_from_response(self, response):
-        match = re.search(r'```json(.*?)```', response, re.DOTALL)
-        if match:
-            return match.group(1).strip()
+            call.response = self.router.generate(kind, prompt=prompt, format=schema, keep_alive=KEEP_ALIVE)
+        return call.response['response'], False
+
+    # Generate and validate a typed result in one pass. Output that was cut off
+    # is continued from where it stopped instead of being regenerated. text is
+    # a response already at hand, cached whether it came from the response
+    # cache. Only validated text is cached, and a cached response that fails
+    # validation is dropped so it is not served again.
+    def _structured(self, prompt, kind, result_model, use_cache=True, text=None, cached=True):
+        schema = result_model.model_json_schema()
+        model = self.router.model_for(kind)
+        options = {'format': schema}
+        if text is None:
+            text, cached = self._generate(prompt, kind, use_cache, schema)
+
+        try:
+            result = first_pass(text, result_model)
+            if result is None:
+                with track_llm_call(f'{kind}_continuation') as call:
+                    call.response = self.router.chat(
+                        f'{kind}_continuation', messages=continuation_messages(prompt, text), keep_alive=KEEP_ALIVE,
+                    )
+                text += call.response['message']['content']
+                result = after_continuation(text, result_model)
+                cached = False
+        except StructuredOutputError:
+            if cached:
+                self.cache.delete(model, prompt, options)
+            raise
+
+        if not cached:
+            self.cache.put(model, prompt, text, options)
+        return result
+
+    def _roadmap_prompt(self):
+        return roadmap_prompt(self.role, self.current_stage, self.field_of_study, self.end_goal)
+
+    def _known_roadmap(self, prompt):
+        return known_roadmap(self.cache, self.router.model_for('roadmap'), prompt, self.get_user_profile())
+
+    # Served from the response cache or a similar profile's roadmap when
+    # use_cache is set; a generated roadmap is added to the semantic index
+    def generate_and_save_roadmap(self, use_cache=True):
+        prompt = self._roadmap_prompt()
+        text, vector = self._known_roadmap(prompt) if use_cache else (None, None)
+        roadmap = self._structured(prompt, 'roadmap', Roadmap, use_cache=False, text=text)
+        if text is None:
+            index_roadmap(self.get_user_profile(), roadmap, vector)
+        save_user_roadmap(self.username, roadmap)
+        return roadmap
+
+    # Streaming variant of generate_and_save_roadmap.
+    # Yields {'type': 'milestone' | 'phase', ...} events as soon as each object is
+    # closed in the model output, then a final {'type': 'done'} event carrying the
+    # saved roadmap, time_to_first_phase and total_latency (seconds).
+    def stream_roadmap(self, use_cache=True):
+        prompt = self._roadmap_prompt()
+        schema = Roadmap.model_json_schema()
+        parser = IncrementalRoadmapParser()
+        started = time.perf_counter()
+        first_phase_at = None
+
+        cached, vector = self._known_roadmap(prompt) if use_cache else (None, None)
+        if cached is not None:
+            chunks = [cached]
         else:
-            raise TypeError(f"Unexpected response format from Llama3.1: {response}")
+            chunks = self._stream_chunks(prompt, schema)
+
+        text = []
+        for chunk in chunks:
+            text.append(chunk)
+            for event in parser.feed(chunk):
+                if event['type'] == 'phase' and first_phase_at is None:
+                    first_phase_at = time.perf_counter() - started
+                yield event
+
+        response = ''.join(text)
+        roadmap = self._structured(prompt, 'roadmap', Roadmap, text=response, cached=cached is not None)
+        if cached is None:
+            index_roadmap(self.get_user_profile(), roadmap, vector)
+        save_user_roadmap(self.username, roadmap)
+
+        total_latency = time.perf_counter() - started
+        logging.info(
+            "Streamed roadmap for %s: first phase %.2fs, total %.2fs (cached=%s)",
+            self.username, first_phase_at or total_latency, total_latency, cached is not None,
+        )
+        yield {
+            'type': 'done',
+            'roadmap': roadmap,
+            'time_to_first_phase': first_phase_at,
+            'total_latency': total_latency,
+        }
+
+    def _stream_chunks(self, prompt, schema):
+        with track_llm_call('roadmap') as call:
+            stream = self.router.stream('roadmap', prompt=prompt, format=schema, keep_alive=KEEP_ALIVE)
+            for part in stream:
+                # The final chunk carries the timing and token counters
+                if part.get('done'):
+                    call.response = part
+                yield part['response']
+
+    # Parse the JSON in a raw response (text or an ollama.generate result) without schema checks
+    def extract_json_from_response(self, response):
+        if not isinstance(response, str):
+            response = response['response']
+        return json.loads(extract_json_text(response))
 
     def get_or_generate_roadmap(self):
         roadmap = get_user_roadmap(self.username)
@@ -89,56 +201,81 @@ class LlamaRoadmapManager:
             return self.generate_and_save_roadmap()
         return roadmap
 
-    def generate_quiz(self, phase):
-        prompt = f'''
-        Generate a 10-question quiz in JSON format for the phase: {phase} of the following user:
-        - Username: {self.username}
-        - Role: {self.role} (Student/Professional)
-        - Current Stage: {self.current_stage}
-        - Field of Study/Job Role: {self.field_of_study}
-        - End Goal: {self.end_goal}
-
-        Please include multiple-choice, true/false, and short-answer questions. Format the response strictly in this JSON structure:
-        {{
-            "quiz": [
-                {{
-                    "question": "What is ...?",
-                    "options": ["Option 1", "Option 2", "Option 3", "Option 4"],
-                    "answer": "Option 1"
-                }},
-                {{
-                    "question": "True or False: ...?",
-                    "answer": "True"
-                }},
-                {{
-                    "question": "Explain ... in a few sentences.",
-                    "answer": "..."
-                }}
-            ]
-        }}
-        '''
-        response = ollama.generate(model="llama3.1", prompt=prompt)
-        return self.extract_json_from_response(response)
-
-    def generate_gap_analysis(self, wrong_answers):
-        prompt = f'''
-        Provide a detailed gap analysis and feedback in JSON format based on these wrong answers: {wrong_answers} for the user with the following profile:
-        - Username: {self.username}
-        - Role: {self.role} (Student/Professional)
-        - Current Stage: {self.current_stage}
-        - Field of Study/Job Role: {self.field_of_study}
-        - End Goal: {self.end_goal}
-
-        Format:
-        {{
-            "gap_analysis": {{
-                "recommendations": [
-                    "Revise concept X",
-                    "Take course Y",
-                    "Watch tutorial Z"
-                ]
-            }}
-        }}
-        '''
-        response = ollama.generate(model="llama3.1", prompt=prompt)
-        return self.extract_json_from_response(response)
\ No newline at end of file
+    # Latest saved roadmap, or None; served from the per-user cache
+    def get_roadmap(self):
+        return cached_roadmap(self.username)
+
+    def get_user_profile(self):
+        return {
+            'username': self.username,
+            'role': self.role,
+            'current_stage': self.current_stage,
+            'field_of_study': self.field_of_study,
+            'end_goal': self.end_goal,
+        }
+
+    # The user's analytics summary: streaks, completion per phase of the
+    # roadmap, rolling quiz score and the first milestone not completed yet
+    def get_user_progress(self):
+        return cached_summary(self.username)
+
+    def profile_fingerprint(self):
+        return profile_fingerprint(self.role, self.current_stage, self.field_of_study, self.end_goal)
+
+    # Serve a quiz from the question bank, generating and banking one on a miss
+    def get_quiz(self, phase, milestone=None):
+        fingerprint = self.profile_fingerprint()
+        questions = draw_quiz(fingerprint, phase, milestone)
+        if questions is None:
+            generated = self.generate_quiz(phase, milestone)['quiz']
+            add_questions(fingerprint, phase, milestone, generated)
+            questions = draw_quiz(fingerprint, phase, milestone) or generated
+        return {'quiz': questions}
+
+    # Add a freshly generated quiz to the bank so later attempts rotate through new questions
+    def refill_quiz_bank(self, phase, milestone=None):
+        generated = self.generate_quiz(phase, milestone, use_cache=False)['quiz']
+        return add_questions(self.profile_fingerprint(), phase, milestone, generated)
+
+    # Make sure the bank holds a whole quiz without drawing (serving) one;
+    # returns how many questions were added
+    def prefetch_quiz(self, phase, milestone=None):
+        fingerprint = self.profile_fingerprint()
+        if bank_size(fingerprint, phase, milestone) >= QUIZ_LENGTH:
+            return 0
+        return add_questions(fingerprint, phase, milestone, self.generate_quiz(phase, milestone)['quiz'])
+
+    def _quiz_prompt(self, phase, milestone=None):
+        return quiz_prompt(self.role, self.current_stage, self.field_of_study, self.end_goal, phase, milestone)
+
+    def generate_quiz(self, phase, milestone=None, use_cache=True):
+        return self._structured(self._quiz_prompt(phase, milestone), 'quiz', Quiz, use_cache)
+
+    def _gap_analysis_prompt(self, wrong_answers):
+        return gap_analysis_prompt(self.role, self.current_stage, self.field_of_study, self.end_goal, wrong_answers)
+
+    def generate_gap_analysis(self, wrong_answers, use_cache=True):
+        return self._structured(self._gap_analysis_prompt(wrong_answers), 'gap_analysis', GapAnalysis, use_cache)
+
+    # One LLM verdict per short answer the local grader was unsure about
+    def grade_answers(self, items):
+        return self._structured(grading_prompt(items), 'grading', Grading)['grading']['correct']
+
+    # Grade a quiz submission locally, asking the LLM only about low-confidence answers
+    def grade_quiz(self, questions, answers):
+        return grade_submission(questions, answers, fallback=self.grade_answers)
+
+
+# The manager for a logged-in user, built from their profile and reused across
+# Streamlit reruns until the profile changes. None if the user does not exist.
+def get_roadmap_manager(username):
+    def build():
+        profile = cached_profile(username)
+        if profile is None:
+            return None
+        return LlamaRoadmapManager(
+            username, profile['role'], profile['current_stage'],
+            profile['role_specific_field'], profile['end_goal'],
+        )
+
+    return user_cache.get('manager', username, build)
@@ -0,0 +1,354 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+
+import httpx
+import ollama
+
+from models.telemetry import register_collector
+
+# Routes LLM calls across a pool of Ollama endpoints, with a model per call kind.
+#
+# MAYOGA_OLLAMA_HOSTS lists the endpoints, comma separated, each optionally
+# with its concurrency limit: "http://gpu1:11434=4,http://gpu2:11434=2".
+# Without it the single OLLAMA_HOST (or Ollama's default host) is used.
+# MAYOGA_MODELS picks the model per kind, e.g. "quiz=llama3.2:3b,gap_analysis=llama3.2:3b";
+# other kinds use DEFAULT_MODEL (embeddings EMBEDDING_MODEL), and
+# "<kind>_continuation" uses the model of <kind>.
+#
+# Each call goes to the endpoint with the fewest outstanding requests relative
+# to its limit, among the healthy ones that serve the model; when all of them
+# are at their limit the call waits for a slot. A connection error or 5xx
+# response takes the endpoint out for FAILURE_BACKOFF seconds and the call is
+# retried on the next endpoint (a stream only until its first chunk). The
+# health checker lists every endpoint's models (GET /api/tags) every
+# HEALTH_INTERVAL seconds and brings endpoints back as soon as they answer.
+
+DEFAULT_MODEL = "llama3.1"
+EMBEDDING_KIND = 'embedding'
+EMBEDDING_MODEL = "nomic-embed-text"
+DEFAULT_HOST = "http://127.0.0.1:11434"
+ENDPOINT_CONCURRENCY = 4
+HEALTH_INTERVAL = 10.0
+HEALTH_TIMEOUT = 2.0
+FAILURE_BACKOFF = 30.0
+ASYNC_POLL_SECONDS = 0.01
+
+
+class NoEndpointAvailable(Exception):
+    pass
+
+
+# "llama3.1:latest" and "llama3.1" name the same model
+def _base_name(model):
+    return model[:-len(':latest')] if model.endswith(':latest') else model
+
+
+class Endpoint:
+    def __init__(self, url, max_concurrency=ENDPOINT_CONCURRENCY):
+        self.url = url
+        self.max_concurrency = max_concurrency
+        self.client = ollama.Client(host=url)
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.down_until = 0.0
+        # Models the endpoint reported at the last health check; None until then
+        self.models = None
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    @property
+    def healthy(self):
+        return time.monotonic() >= self.down_until
+
+    def serves(self, model):
+        return self.models is None or _base_name(model) in self.models
+
+    def load(self):
+        return self.outstanding / self.max_concurrency
+
+    # ollama.AsyncClient is bound to the event loop it is first used on
+    def async_client(self):
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = ollama.AsyncClient(host=self.url)
+        return client
+
+    def mark_down(self):
+        self.failures += 1
+        self.down_until = time.monotonic() + FAILURE_BACKOFF
+
+    # List the endpoint's models; marks it up or down and returns whether it answered
+    def check(self):
+        try:
+            tags = ollama.Client(host=self.url, timeout=HEALTH_TIMEOUT).list()
+        except Exception:
+            self.down_until = time.monotonic() + FAILURE_BACKOFF
+            return False
+        self.models = {_base_name(m.model) for m in tags.models if m.model}
+        self.down_until = 0.0
+        return True
+
+    def stats(self):
+        return {
+            'url': self.url,
+            'healthy': self.healthy,
+            'outstanding': self.outstanding,
+            'max_concurrency': self.max_concurrency,
+            'requests': self.requests,
+            'failures': self.failures,
+            'models': sorted(self.models) if self.models is not None else None,
+        }
+
+
+# Errors that mean the endpoint (not the request) is at fault
+def _endpoint_failure(error):
+    if isinstance(error, (ConnectionError, httpx.TransportError)):
+        return True
+    return isinstance(error, ollama.ResponseError) and error.status_code >= 500
+
+
+# Worth retrying elsewhere: endpoint failures, and a model this endpoint does not have
+def _retryable(error):
+    return _endpoint_failure(error) or (isinstance(error, ollama.ResponseError) and error.status_code == 404)
+
+
+class ModelRouter:
+    def __init__(self, endpoints, models=None, default_model=DEFAULT_MODEL):
+        if not endpoints:
+            raise ValueError("ModelRouter needs at least one endpoint")
+        self.endpoints = endpoints
+        self.models = dict(models or {})
+        self.default_model = default_model
+        self._condition = threading.Condition()
+        self._health_thread = None
+
+    def model_for(self, kind):
+        base = kind[:-len('_continuation')] if kind.endswith('_continuation') else kind
+        if kind == EMBEDDING_KIND:
+            return self.models.get(kind) or EMBEDDING_MODEL
+        return self.models.get(kind) or self.models.get(base) or self.default_model
+
+    # Every model some generation kind is routed to
+    def all_models(self):
+        return sorted({self.default_model, *(m for k, m in self.models.items() if k != EMBEDDING_KIND)})
+
+    def _candidates(self, model, tried):
+        untried = [e for e in self.endpoints if e not in tried]
+        # When every endpoint looks down, still try them rather than fail unasked
+        healthy = [e for e in untried if e.healthy] or untried
+        return [e for e in healthy if e.serves(model)] or healthy
+
+    # Reserve a slot on the least loaded candidate; None while all are at their limit
+    def _try_acquire(self, model, tried):
+        with self._condition:
+            candidates = self._candidates(model, tried)
+            if not candidates:
+                raise NoEndpointAvailable(f"No Ollama endpoint left to try for {model}")
+            free = [e for e in candidates if e.outstanding < e.max_concurrency]
+            if not free:
+                return None
+            lowest = min(e.load() for e in free)
+            endpoint = random.choice([e for e in free if e.load() == lowest])
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def _acquire(self, model, tried):
+        with self._condition:
+            while True:
+                endpoint = self._try_acquire(model, tried)
+                if endpoint is not None:
+                    return endpoint
+                self._condition.wait()
+
+    async def _acquire_async(self, model, tried):
+        while True:
+            endpoint = self._try_acquire(model, tried)
+            if endpoint is not None:
+                return endpoint
+            await asyncio.sleep(ASYNC_POLL_SECONDS)
+
+    def _release(self, endpoint, error=None):
+        with self._condition:
+            endpoint.outstanding -= 1
+            if error is not None and _endpoint_failure(error):
+                endpoint.mark_down()
+                logging.warning("Ollama endpoint %s failed (%s: %s)", endpoint.url, type(error).__name__, error)
+            self._condition.notify_all()
+
+    # Whether to retry a failed call on another endpoint (records the one that failed)
+    def _failover(self, error, endpoint, tried):
+        tried.append(endpoint)
+        return _retryable(error) and len(tried) < len(self.endpoints)
+
+    def _call(self, kind, request):
+        model = self.model_for(kind)
+        tried = []
+        while True:
+            endpoint = self._acquire(model, tried)
+            error = None
+            try:
+                return request(endpoint.client, model)
+            except Exception as e:
+                error = e
+                if not self._failover(e, endpoint, tried):
+                    raise
+            finally:
+                self._release(endpoint, error)
+
+    async def _call_async(self, kind, request):
+        model = self.model_for(kind)
+        tried = []
+        while True:
+            endpoint = await self._acquire_async(model, tried)
+            error = None
+            try:
+                return await request(endpoint.async_client(), model)
+            except Exception as e:
+                error = e
+                if not self._failover(e, endpoint, tried):
+                    raise
+            finally:
+                self._release(endpoint, error)
+
+    # ollama.generate / ollama.chat with the model and endpoint picked for kind
+    def generate(self, kind, **kwargs):
+        return self._call(kind, lambda client, model: client.generate(model=model, **kwargs))
+
+    def chat(self, kind, **kwargs):
+        return self._call(kind, lambda client, model: client.chat(model=model, **kwargs))
+
+    def embeddings(self, **kwargs):
+        return self._call(EMBEDDING_KIND, lambda client, model: client.embeddings(model=model, **kwargs))
+
+    async def agenerate(self, kind, **kwargs):
+        return await self._call_async(kind, lambda client, model: client.generate(model=model, **kwargs))
+
+    async def achat(self, kind, **kwargs):
+        return await self._call_async(kind, lambda client, model: client.chat(model=model, **kwargs))
+
+    # Streaming generate; the endpoint slot is held until the stream is consumed or closed
+    def stream(self, kind, **kwargs):
+        model = self.model_for(kind)
+        tried = []
+        while True:
+            endpoint = self._acquire(model, tried)
+            error = None
+            started = False
+            try:
+                for part in endpoint.client.generate(model=model, stream=True, **kwargs):
+                    started = True
+                    yield part
+                return
+            except Exception as e:
+                error = e
+                if started or not self._failover(e, endpoint, tried):
+                    raise
+            finally:
+                self._release(endpoint, error)
+
+    def check_health(self):
+        for endpoint in self.endpoints:
+            endpoint.check()
+        with self._condition:
+            self._condition.notify_all()
+
+    # Check every endpoint now and then every HEALTH_INTERVAL seconds in the background
+    def start_health_checks(self, interval=HEALTH_INTERVAL):
+        with self._condition:
+            if self._health_thread is not None:
+                return
+            self._health_thread = threading.Thread(
+                target=self._health_loop, args=(interval,), name='ollama-health', daemon=True,
+            )
+        self._health_thread.start()
+
+    def _health_loop(self, interval):
+        while True:
+            try:
+                self.check_health()
+            except Exception:
+                logging.exception("Ollama health check failed")
+            time.sleep(interval)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'models': {'default': self.default_model, EMBEDDING_KIND: self.model_for(EMBEDDING_KIND), **self.models},
+                'endpoints': [e.stats() for e in self.endpoints],
+            }
+
+
+# "http://a:11434=4,http://b:11434" -> [Endpoint]
+def parse_hosts(spec, max_concurrency=ENDPOINT_CONCURRENCY):
+    endpoints = []
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        url, _, limit = item.rpartition('=') if '=' in item else (item, '', '')
+        endpoints.append(Endpoint(url.strip(), int(limit) if limit else max_concurrency))
+    return endpoints
+
+
+# "quiz=llama3.2:3b,gap_analysis=llama3.2:3b" -> {kind: model}
+def parse_models(spec):
+    models = {}
+    for item in spec.split(','):
+        kind, _, model = item.partition('=')
+        if kind.strip() and model.strip():
+            models[kind.strip()] = model.strip()
+    return models
+
+
+# A router configured from the environment; hosts overrides MAYOGA_OLLAMA_HOSTS
+def router_from_env(hosts=None):
+    spec = hosts or os.environ.get('MAYOGA_OLLAMA_HOSTS') or os.environ.get('OLLAMA_HOST') or DEFAULT_HOST
+    return ModelRouter(
+        parse_hosts(spec),
+        parse_models(os.environ.get('MAYOGA_MODELS', '')),
+        os.environ.get('MAYOGA_DEFAULT_MODEL', DEFAULT_MODEL),
+    )
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+# Process-wide router, with health checks running in the background
+def get_router():
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                router = router_from_env()
+                router.start_health_checks()
+                _router = router
+    return _router
+
+
+def _router_metrics():
+    if _router is None:
+        return []
+    endpoints = _router.stats()['endpoints']
+    families = (
+        ('mayoga_ollama_endpoint_up', 'gauge', lambda e: int(e['healthy'])),
+        ('mayoga_ollama_endpoint_outstanding', 'gauge', lambda e: e['outstanding']),
+        ('mayoga_ollama_endpoint_requests_total', 'counter', lambda e: e['requests']),
+        ('mayoga_ollama_endpoint_failures_total', 'counter', lambda e: e['failures']),
+    )
+    lines = []
+    # Each family's TYPE line followed by all of its samples
+    for name, metric_type, value in families:
+        lines.append(f"# TYPE {name} {metric_type}")
+        lines.extend(f'{name}{{endpoint="{e["url"]}"}} {value(e)}' for e in endpoints)
+    return lines
+
+
+register_collector(_router_metrics)
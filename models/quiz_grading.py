@@ -0,0 +1,178 @@
+import logging
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+# Local grading of quiz submissions, so a quiz is graded in milliseconds
+# instead of one LLM round-trip per answer.
+#
+# Multiple-choice and true/false answers are compared exactly (after
+# normalising case, punctuation and option letters). Short answers are scored
+# against the reference answer by a blend of word TF-IDF cosine and character
+# trigram cosine (which tolerates typos and inflections), computed for the
+# whole submission in one matrix pass. Scores at or above ACCEPT_SIMILARITY
+# are correct and at or below REJECT_SIMILARITY wrong; only the answers in
+# between go to the fallback (the LLM), all in one batched call.
+
+ACCEPT_SIMILARITY = 0.7
+REJECT_SIMILARITY = 0.25
+WORD_WEIGHT = 0.6
+TRUE_WORDS = {'true', 't', 'yes', 'y'}
+FALSE_WORDS = {'false', 'f', 'no', 'n'}
+STOPWORDS = frozenset('''
+a an and are as at be by can for from has have in is it its of on or that the their this to was
+were which with what when where who why how do does did not into than then them they it's
+'''.split())
+
+EXACT = 'exact'
+LEXICAL = 'lexical'
+LLM = 'llm'
+
+
+def normalize(text):
+    return ' '.join(re.findall(r'[a-z0-9]+', str(text).lower()))
+
+
+def _stem(word):
+    for suffix in ('ing', 'ed', 'es', 's'):
+        if len(word) > len(suffix) + 2 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+def _terms(text):
+    return [_stem(word) for word in normalize(text).split() if word not in STOPWORDS]
+
+
+def _trigrams(text):
+    text = f" {normalize(text)} "
+    return [text[i:i + 3] for i in range(len(text) - 2)]
+
+
+def question_type(question):
+    if question.get('options'):
+        return 'choice'
+    if normalize(question['answer']) in ('true', 'false'):
+        return 'true_false'
+    return 'short'
+
+
+def _choice_correct(question, answer):
+    answer = normalize(answer)
+    options = question['options']
+    # "b" or "b)" picks the second option
+    if len(answer) == 1 and 'a' <= answer <= 'z' and ord(answer) - ord('a') < len(options):
+        answer = normalize(options[ord(answer) - ord('a')])
+    return answer == normalize(question['answer'])
+
+
+def _true_false_correct(question, answer):
+    answer = normalize(answer)
+    expected = normalize(question['answer']) == 'true'
+    return (answer in TRUE_WORDS) if expected else (answer in FALSE_WORDS)
+
+
+# Row-wise cosine similarity of paired documents, each a list of tokens.
+# idf=True weights terms by inverse document frequency over all documents.
+def _paired_cosine(left, right, idf=False):
+    vocabulary = {}
+    for tokens in left + right:
+        for token in tokens:
+            vocabulary.setdefault(token, len(vocabulary))
+    if not vocabulary:
+        return np.zeros(len(left))
+
+    def matrix(documents):
+        counts = np.zeros((len(documents), len(vocabulary)))
+        for row, tokens in enumerate(documents):
+            for token, n in Counter(tokens).items():
+                counts[row, vocabulary[token]] = 1 + math.log(n)
+        return counts
+
+    a, b = matrix(left), matrix(right)
+    if idf:
+        documents = np.vstack([a, b]) > 0
+        weights = np.log((1 + len(documents)) / (1 + documents.sum(axis=0))) + 1
+        a, b = a * weights, b * weights
+    norms = np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1)
+    return np.divide((a * b).sum(axis=1), norms, out=np.zeros(len(left)), where=norms > 0)
+
+
+# Similarity in [0, 1] of each answer to its reference answer
+def short_answer_similarity(answers, references):
+    words = _paired_cosine([_terms(a) for a in answers], [_terms(r) for r in references], idf=True)
+    chars = _paired_cosine([_trigrams(a) for a in answers], [_trigrams(r) for r in references])
+    return WORD_WEIGHT * words + (1 - WORD_WEIGHT) * chars
+
+
+# Grade a whole submission. answers are in question order.
+# fallback(items) -> [bool] grades the low-confidence short answers, given as
+# dicts with question, reference and answer; without one (or if it fails)
+# they are decided by which threshold they are closer to.
+def grade_submission(questions, answers, fallback=None):
+    results = []
+    uncertain = []
+    short = []
+    for i, (question, answer) in enumerate(zip(questions, answers)):
+        kind = question_type(question)
+        result = {'index': i, 'type': kind, 'method': EXACT, 'similarity': None}
+        if kind == 'choice':
+            result['correct'] = _choice_correct(question, answer)
+        elif kind == 'true_false':
+            result['correct'] = _true_false_correct(question, answer)
+        elif not normalize(answer):
+            result['correct'] = False
+        else:
+            result['method'] = LEXICAL
+            short.append(result)
+        results.append(result)
+
+    if short:
+        similarity = short_answer_similarity(
+            [answers[r['index']] for r in short], [questions[r['index']]['answer'] for r in short],
+        )
+        for result, score in zip(short, similarity):
+            result['similarity'] = round(float(score), 3)
+            if normalize(answers[result['index']]) == normalize(questions[result['index']]['answer']):
+                result['correct'] = True
+            elif score >= ACCEPT_SIMILARITY:
+                result['correct'] = True
+            elif score <= REJECT_SIMILARITY:
+                result['correct'] = False
+            else:
+                result['correct'] = score >= (ACCEPT_SIMILARITY + REJECT_SIMILARITY) / 2
+                uncertain.append(result)
+
+    llm_graded = 0
+    if uncertain and fallback is not None:
+        items = [
+            {'question': questions[r['index']]['question'], 'reference': questions[r['index']]['answer'],
+             'answer': answers[r['index']]}
+            for r in uncertain
+        ]
+        try:
+            verdicts = fallback(items)
+        except Exception:
+            logging.exception("Grading fallback failed; using the lexical scores")
+            verdicts = []
+        # A verdict list of the wrong length only decides the answers it covers
+        for result, correct in zip(uncertain, verdicts):
+            result['correct'] = bool(correct)
+            result['method'] = LLM
+            llm_graded += 1
+
+    correct = sum(1 for r in results if r['correct'])
+    return {
+        'score': 100.0 * correct / len(questions) if questions else 0.0,
+        'correct': correct,
+        'total': len(questions),
+        'results': results,
+        'llm_graded': llm_graded,
+        'wrong_answers': [
+            {'question': questions[r['index']]['question'], 'answer': answers[r['index']],
+             'expected': questions[r['index']]['answer']}
+            for r in results if not r['correct']
+        ],
+    }
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from services import db_connection
+from services.db_connection import db_cursor, transaction
+
+# Defaults for the shared LLM response cache
+CACHE_MAX_ENTRIES = 5000
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+
+# Whitespace and indentation in the f-string prompts carry no meaning for the model
+def normalize_prompt(prompt):
+    return " ".join(prompt.split())
+
+
+# Content address of a generation request
+def cache_key(model, prompt, options=None):
+    payload = json.dumps(
+        {'model': model, 'prompt': normalize_prompt(prompt), 'options': options or {}},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES,
+                 ttl_seconds=CACHE_TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._create_table()
+
+    def _create_table(self):
+        with transaction(self.path) as cursor:
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,                -- sha256 of model, normalized prompt and options
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,              -- Raw text returned by the model
+                size INTEGER NOT NULL,               -- Length of response in bytes
+                created_at REAL NOT NULL,            -- Unix time the entry was stored
+                last_used REAL NOT NULL,             -- Unix time of the last hit, for LRU eviction
+                hit_count INTEGER NOT NULL DEFAULT 0
+            )
+            ''')
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used)")
+
+    def _count(self, name, n=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    # Return the cached response text, or None on a miss or an expired entry
+    def get(self, model, prompt, options=None):
+        key = cache_key(model, prompt, options)
+        now = time.time()
+
+        with db_cursor(self.path) as cursor:
+            cursor.execute("SELECT response, created_at FROM llm_cache WHERE key = ?", (key,))
+            row = cursor.fetchone()
+
+        if row is None:
+            self._count('misses')
+            return None
+
+        response, created_at = row
+        if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+            with transaction(self.path) as cursor:
+                cursor.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._count('evictions')
+            self._count('misses')
+            return None
+
+        with transaction(self.path) as cursor:
+            cursor.execute('''
+            UPDATE llm_cache SET last_used = ?, hit_count = hit_count + 1 WHERE key = ?
+            ''', (now, key))
+        self._count('hits')
+        return response
+
+    # Store a response and evict least-recently-used entries over the limits
+    def put(self, model, prompt, response, options=None):
+        key = cache_key(model, prompt, options)
+        now = time.time()
+
+        with transaction(self.path) as cursor:
+            cursor.execute('''
+            INSERT INTO llm_cache (key, model, response, size, created_at, last_used)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET
+                response = excluded.response,
+                size = excluded.size,
+                created_at = excluded.created_at,
+                last_used = excluded.last_used
+            ''', (key, model, response, len(response.encode()), now, now))
+            self._evict(cursor, now)
+
+    # Drop an entry, e.g. a response that failed validation
+    def delete(self, model, prompt, options=None):
+        with transaction(self.path) as cursor:
+            cursor.execute("DELETE FROM llm_cache WHERE key = ?", (cache_key(model, prompt, options),))
+
+    def _evict(self, cursor, now):
+        if self.ttl_seconds is not None:
+            cursor.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._count('evictions', cursor.rowcount)
+
+        cursor.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache")
+        entries, total_bytes = cursor.fetchone()
+        if entries <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+
+        # Walk entries from least to most recently used until both limits hold
+        cursor.execute("SELECT key, size FROM llm_cache ORDER BY last_used")
+        doomed = []
+        for key, size in cursor.fetchall():
+            if entries <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            doomed.append((key,))
+            entries -= 1
+            total_bytes -= size
+        cursor.executemany("DELETE FROM llm_cache WHERE key = ?", doomed)
+        self._count('evictions', len(doomed))
+
+    def clear(self):
+        with transaction(self.path) as cursor:
+            cursor.execute("DELETE FROM llm_cache")
+
+    def stats(self):
+        with db_cursor(self.path) as cursor:
+            cursor.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache")
+            entries, total_bytes = cursor.fetchone()
+
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': entries,
+            'bytes': total_bytes,
+        }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+# Shared cache stored next to the users database
+def get_response_cache():
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                db_dir = os.path.dirname(db_connection.db_path)
+                _default_cache = ResponseCache(os.path.join(db_dir, 'llm_cache.db'))
+    return _default_cache
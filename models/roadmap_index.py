@@ -0,0 +1,273 @@
+import json
+import logging
+import os
+import re
+import threading
+
+import numpy as np
+
+from models.model_router import EMBEDDING_KIND, get_router
+from models.telemetry import register_collector, track_llm_call
+from services import db_connection
+from services.db_connection import db_cursor, transaction
+from services.quiz_bank import profile_fingerprint
+
+# Semantic index of generated roadmaps by learner profile, so profiles that
+# differ only in wording ("Computer Science" / "computer science (BSc)")
+# reuse a roadmap instead of paying for a new generation.
+#
+# The profile (role, current stage, field, end goal) is embedded through the
+# model router's embeddings call. Vectors and roadmaps are stored in the
+# profile_embeddings table; the vectors are also kept as one unit-length
+# float32 matrix in roadmap_index.*.npy next to users.db, loaded memory-mapped
+# and extended with the rows added since (by any process), so a lookup is one
+# matrix-vector product and a top-k partition.
+#
+# The best of the TOP_K matches with the same role and current stage (a PhD
+# student is never served an undergraduate's roadmap) is reused when its
+# cosine similarity clears MAYOGA_ROADMAP_REUSE_THRESHOLD, with the matched
+# profile's field and end goal replaced by the new wording. MAYOGA_ROADMAP_REUSE=0
+# turns reuse off.
+
+REUSE_ENABLED = os.environ.get('MAYOGA_ROADMAP_REUSE', '1') != '0'
+REUSE_THRESHOLD = float(os.environ.get('MAYOGA_ROADMAP_REUSE_THRESHOLD', 0.96))
+TOP_K = 5
+ADAPTED_FIELDS = ('field_of_study', 'end_goal')
+# Fields a reused roadmap's profile must match (case and spacing aside)
+MATCHED_FIELDS = ('role', 'current_stage')
+
+
+def profile_text(profile):
+    return (
+        f"Role: {profile['role']}\n"
+        f"Current stage: {profile['current_stage']}\n"
+        f"Field of study: {profile['field_of_study']}\n"
+        f"End goal: {profile['end_goal']}"
+    )
+
+
+# Rewrite every string in one pass, replacing whole words or phrases only (so
+# "Math" -> "Mathematics" leaves "Mathematics basics" alone); resources keep
+# their titles and URLs as written
+def _replace_text(value, pattern, replacements):
+    if isinstance(value, str):
+        return pattern.sub(lambda match: replacements[match.group(0)], value)
+    if isinstance(value, list):
+        return [_replace_text(item, pattern, replacements) for item in value]
+    if isinstance(value, dict):
+        return {
+            key: item if key == 'resources' else _replace_text(item, pattern, replacements)
+            for key, item in value.items()
+        }
+    return value
+
+
+def _same(value, other):
+    return ' '.join(str(value or '').lower().split()) == ' '.join(str(other or '').lower().split())
+
+
+# The roadmap of source_profile, reworded for profile where field or end goal differ
+def adapt_roadmap(roadmap, source_profile, profile):
+    replacements = {
+        source_profile[field]: profile[field]
+        for field in ADAPTED_FIELDS
+        if source_profile.get(field) and profile.get(field) and source_profile[field] != profile[field]
+    }
+    if not replacements:
+        return roadmap
+    # Longest first, so a phrase wins over a word inside it
+    alternatives = "|".join(re.escape(old) for old in sorted(replacements, key=len, reverse=True))
+    pattern = re.compile(rf"(?<!\w)(?:{alternatives})(?!\w)")
+    return _replace_text(roadmap, pattern, replacements)
+
+
+class RoadmapIndex:
+    def __init__(self, directory=None, threshold=REUSE_THRESHOLD, router=None):
+        self.directory = directory or os.path.dirname(db_connection.db_path) or '.'
+        self.threshold = threshold
+        self.router = router or get_router()
+        self.model = self.router.model_for(EMBEDDING_KIND)
+        self.lookups = 0
+        self.reused = 0
+        self._lock = threading.Lock()
+        self._reset()
+        self._load()
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"roadmap_index.{name}")
+
+    def _reset(self):
+        self.ids = np.empty(0, np.int64)
+        self.vectors = None
+
+    def _load(self):
+        try:
+            with open(self._path('json')) as f:
+                if json.load(f)['model'] != self.model:
+                    return
+            ids = np.load(self._path('ids.npy'), mmap_mode='r')
+            vectors = np.load(self._path('vectors.npy'), mmap_mode='r')
+        except (OSError, ValueError, KeyError):
+            return
+        if len(ids) == len(vectors):
+            self.ids, self.vectors = ids, vectors
+
+    def _save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        np.save(self._path('ids.npy'), self.ids)
+        np.save(self._path('vectors.npy'), self.vectors)
+        with open(self._path('json'), 'w') as f:
+            json.dump({'model': self.model}, f)
+
+    # Append the vectors added to the table since the last sync
+    def _sync(self):
+        last_id = int(self.ids[-1]) if len(self.ids) else 0
+        with db_cursor() as cursor:
+            cursor.execute("SELECT MAX(id) FROM profile_embeddings WHERE model = ?", (self.model,))
+            max_id = cursor.fetchone()[0] or 0
+            if max_id == last_id:
+                return
+            if max_id < last_id:
+                # The database was replaced; rebuild the matrix from the table
+                self._reset()
+                last_id = 0
+            cursor.execute('''
+            SELECT id, embedding FROM profile_embeddings WHERE model = ? AND id > ? ORDER BY id
+            ''', (self.model, last_id))
+            rows = cursor.fetchall()
+
+        vectors = np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+        self.ids = np.concatenate([self.ids, np.array([row[0] for row in rows], dtype=np.int64)])
+        self.vectors = vectors if self.vectors is None else np.concatenate([self.vectors, vectors])
+        self._save()
+
+    def embed(self, profile):
+        with track_llm_call(EMBEDDING_KIND) as call:
+            call.response = self.router.embeddings(prompt=profile_text(profile))
+        vector = np.asarray(call.response['embedding'], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    # [(cosine similarity, profile_embeddings.id)] of the k nearest profiles, best first
+    def search(self, vector, k=TOP_K):
+        with self._lock:
+            self._sync()
+            if not len(self.ids):
+                return []
+            scores = np.asarray(self.vectors) @ vector
+            ids = self.ids
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), int(ids[i])) for i in top]
+
+    # The most similar indexed profiles as dicts with score and profile
+    def similar_profiles(self, profile, k=TOP_K):
+        matches = self.search(self.embed(profile), k)
+        if not matches:
+            return []
+        with db_cursor() as cursor:
+            cursor.execute(f'''
+            SELECT id, profile FROM profile_embeddings WHERE id IN ({", ".join("?" * len(matches))})
+            ''', [row_id for _, row_id in matches])
+            profiles = {row_id: json.loads(text) for row_id, text in cursor.fetchall()}
+        return [{'score': score, 'profile': profiles[row_id]} for score, row_id in matches]
+
+    # (roadmap or None, vector): the adapted roadmap of the closest profile with
+    # the same role and stage above the threshold, and the profile's vector for add()
+    def lookup(self, profile):
+        vector = self.embed(profile)
+        matches = [(score, row_id) for score, row_id in self.search(vector) if score >= self.threshold]
+        with self._lock:
+            self.lookups += 1
+
+        with db_cursor() as cursor:
+            for score, row_id in matches:
+                cursor.execute("SELECT profile, roadmap FROM profile_embeddings WHERE id = ?", (row_id,))
+                source, roadmap = cursor.fetchone()
+                source = json.loads(source)
+                if all(_same(source[field], profile[field]) for field in MATCHED_FIELDS):
+                    with self._lock:
+                        self.reused += 1
+                    logging.info("Reusing the roadmap of a similar profile (similarity %.3f)", score)
+                    return adapt_roadmap(json.loads(roadmap), source, profile), vector
+        return None, vector
+
+    # Index the roadmap generated for profile; an identical profile is indexed once
+    def add(self, profile, roadmap, vector=None):
+        if vector is None:
+            vector = self.embed(profile)
+        fingerprint = profile_fingerprint(
+            profile['role'], profile['current_stage'], profile['field_of_study'], profile['end_goal'],
+        )
+        stored = {key: profile[key] for key in ('role', 'current_stage', 'field_of_study', 'end_goal')}
+        with transaction() as cursor:
+            cursor.execute('''
+            INSERT INTO profile_embeddings (fingerprint, model, profile, embedding, roadmap)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (fingerprint, model) DO NOTHING
+            ''', (fingerprint, self.model, json.dumps(stored), np.asarray(vector, np.float32).tobytes(),
+                  json.dumps(roadmap)))
+
+    def stats(self):
+        return {
+            'model': self.model,
+            'threshold': self.threshold,
+            'entries': len(self.ids),
+            'lookups': self.lookups,
+            'reused': self.reused,
+            'reuse_rate': self.reused / self.lookups if self.lookups else 0.0,
+        }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_roadmap_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = RoadmapIndex()
+    return _index
+
+
+# (roadmap or None, vector) for a profile dict with role, current_stage,
+# field_of_study and end_goal. Failures (no embedding model pulled, ...) are
+# logged and only mean the roadmap gets generated as before.
+def find_reusable_roadmap(profile):
+    if not REUSE_ENABLED:
+        return None, None
+    try:
+        return get_roadmap_index().lookup(profile)
+    except Exception:
+        logging.exception("Roadmap index lookup failed")
+        return None, None
+
+
+# Index a generated roadmap; failures are logged like in find_reusable_roadmap
+def index_roadmap(profile, roadmap, vector=None):
+    if not REUSE_ENABLED:
+        return
+    try:
+        get_roadmap_index().add(profile, roadmap, vector)
+    except Exception:
+        logging.exception("Indexing the roadmap failed")
+
+
+def _index_metrics():
+    if _index is None:
+        return []
+    stats = _index.stats()
+    return [
+        "# TYPE mayoga_roadmap_index_lookups_total counter",
+        f"mayoga_roadmap_index_lookups_total {stats['lookups']}",
+        "# TYPE mayoga_roadmap_index_reused_total counter",
+        f"mayoga_roadmap_index_reused_total {stats['reused']}",
+        "# TYPE mayoga_roadmap_index_entries gauge",
+        f"mayoga_roadmap_index_entries {stats['entries']}",
+    ]
+
+
+register_collector(_index_metrics)
@@ -0,0 +1,99 @@
+import json
+
+
+# Incremental parser for a streamed roadmap document.
+#
+# Feed it chunks of model output as they arrive; it tracks JSON nesting
+# (ignoring braces inside strings) and returns an event as soon as a
+# milestone or a phase object is syntactically closed, without waiting for
+# the rest of the document. Text before the first '{' (such as a ```json
+# fence) and after the root object closes is ignored.
+class IncrementalRoadmapParser:
+    def __init__(self):
+        self.buffer = ''
+        self._pos = 0
+        self._root_start = None
+        self._stack = []            # [(opening char, key of this value, start offset)]
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None
+        self._pending_key = None
+        self._phase_count = 0
+        self._milestone_count = 0
+        self.done = False
+
+    def feed(self, chunk):
+        events = []
+        if self.done:
+            return events
+
+        self.buffer += chunk
+        text = self.buffer
+        while self._pos < len(text):
+            i = self._pos
+            char = text[i]
+            self._pos += 1
+
+            if self._root_start is None:
+                if char == '{':
+                    self._root_start = i
+                    self._stack.append(('{', None, i))
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start + 1:i]
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char == ':':
+                self._pending_key = self._last_string
+            elif char == ',':
+                self._pending_key = None
+            elif char in '{[':
+                key = self._pending_key if self._stack[-1][0] == '{' else None
+                self._stack.append((char, key, i))
+                self._pending_key = None
+            elif char in '}]':
+                opening, key, start = self._stack.pop()
+                self._pending_key = None
+                if not self._stack:
+                    self.done = True
+                    break
+                if opening == '{':
+                    event = self._closed_object(text[start:i + 1])
+                    if event:
+                        events.append(event)
+        return events
+
+    def _closed_object(self, raw):
+        parent_key = self._stack[-1][1] if self._stack[-1][0] == '[' else None
+        if parent_key == 'milestones':
+            self._milestone_count += 1
+            return {
+                'type': 'milestone',
+                'phase_index': self._phase_count,
+                'milestone': json.loads(raw),
+            }
+        if parent_key == 'phases':
+            self._phase_count += 1
+            return {
+                'type': 'phase',
+                'index': self._phase_count - 1,
+                'phase': json.loads(raw),
+            }
+        return None
+
+    # Full root document, once it has been closed
+    def result(self):
+        if not self.done:
+            return None
+        return json.loads(self.buffer[self._root_start:self._pos])
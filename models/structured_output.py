@@ -0,0 +1,176 @@
+import json
+import re
+import threading
+from typing import List
+
+from pydantic import BaseModel, Field, ValidationError
+
+# Typed results for the three generators, plus parsing and cheap repair of model output.
+#
+# The JSON schema of each result model is passed to Ollama as format=, so the
+# model is constrained to emit exactly that structure. Output that still fails
+# validation (usually because generation was cut off) is repaired locally
+# before anyone considers paying for a full regeneration.
+
+
+class Milestone(BaseModel):
+    name: str
+    description: str = ''
+    timeline: str = ''
+    resources: List[str] = Field(default_factory=list)
+
+
+class Phase(BaseModel):
+    name: str
+    milestones: List[Milestone] = Field(default_factory=list)
+
+
+class RoadmapBody(BaseModel):
+    phases: List[Phase]
+
+
+class Roadmap(BaseModel):
+    roadmap: RoadmapBody
+
+
+class QuizQuestion(BaseModel):
+    question: str
+    options: List[str] = Field(default_factory=list)
+    answer: str
+
+
+class Quiz(BaseModel):
+    quiz: List[QuizQuestion]
+
+
+class GapAnalysisBody(BaseModel):
+    recommendations: List[str]
+
+
+class GapAnalysis(BaseModel):
+    gap_analysis: GapAnalysisBody
+
+
+class GradingBody(BaseModel):
+    correct: List[bool]
+
+
+class Grading(BaseModel):
+    grading: GradingBody
+
+
+class StructuredOutputError(ValueError):
+    def __init__(self, message, text, truncated=False):
+        super().__init__(message)
+        self.text = text
+        self.truncated = truncated
+
+
+_stats = {'valid': 0, 'repaired': 0, 'continued': 0, 'failed': 0}
+_stats_lock = threading.Lock()
+
+
+def record_outcome(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+# Parse outcomes so far; every repaired or continued result is a regeneration avoided
+def structured_output_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['regenerations_avoided'] = stats['repaired'] + stats['continued']
+    return stats
+
+
+# The JSON part of a response: a ```json fenced block if there is one, else
+# everything from the first brace on
+def extract_json_text(text):
+    match = re.search(r'```(?:json)?(.*?)```', text, re.DOTALL)
+    if match:
+        return match.group(1).strip()
+    start = text.find('{')
+    return text[start:].strip() if start != -1 else text.strip()
+
+
+# Close whatever a truncated JSON document left open and drop trailing commas.
+# Returns (repaired text, whether the document had been cut off).
+def repair_json(text):
+    stack = []
+    in_string = False
+    escape = False
+    for char in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+        elif char in '}]' and stack:
+            stack.pop()
+
+    truncated = in_string or bool(stack)
+    repaired = text
+    if in_string:
+        repaired += '"'
+    repaired = re.sub(r'[,:]\s*$', '', repaired.rstrip())
+    repaired += ''.join(reversed(stack))
+    return re.sub(r',\s*([}\]])', r'\1', repaired), truncated
+
+
+# Validate model output against result_model in one pass, falling back to a local repair.
+# Returns (validated model, 'valid' | 'repaired'). Output that was cut off is only
+# closed up and accepted with allow_truncated; otherwise it raises
+# StructuredOutputError with truncated=True so the caller can continue it instead.
+def parse_structured(text, result_model, allow_truncated=False):
+    candidate = extract_json_text(text)
+    try:
+        return result_model.model_validate_json(candidate), 'valid'
+    except ValidationError:
+        pass
+
+    repaired, truncated = repair_json(candidate)
+    if truncated and not allow_truncated:
+        raise StructuredOutputError(f"Truncated {result_model.__name__} output", candidate, truncated=True)
+    try:
+        return result_model.model_validate(json.loads(repaired)), 'repaired'
+    except ValueError as e:
+        raise StructuredOutputError(f"Invalid {result_model.__name__} output: {e}", candidate)
+
+
+# Validate a first response. Returns the result as a dict, or None when the
+# output was cut off and is worth continuing rather than regenerating.
+def first_pass(text, result_model):
+    try:
+        result, outcome = parse_structured(text, result_model)
+    except StructuredOutputError as e:
+        if e.truncated:
+            return None
+        record_outcome('failed')
+        raise
+    record_outcome(outcome)
+    return result.model_dump()
+
+
+# Validate a response after one continuation, accepting a closed-up partial as a last resort
+def after_continuation(text, result_model):
+    try:
+        result, _ = parse_structured(text, result_model, allow_truncated=True)
+    except StructuredOutputError:
+        record_outcome('failed')
+        raise
+    record_outcome('continued')
+    return result.model_dump()
+
+
+# Chat messages that make Ollama continue a partial answer instead of starting over
+def continuation_messages(prompt, partial):
+    return [
+        {'role': 'user', 'content': prompt},
+        {'role': 'assistant', 'content': partial},
+    ]
@@ -0,0 +1,300 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Telemetry for every LLM call made by LlamaRoadmapManager and AsyncLlamaClient.
+#
+# Each call is wrapped in track_llm_call(kind); the Ollama timing counters from
+# the response (total_duration, load_duration, prompt_eval_*, eval_*) are
+# aggregated per call type into histograms, exported in the Prometheus text
+# format and shown on the admin page.
+
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192)
+TOKENS_PER_SECOND_BUCKETS = (1, 2, 5, 10, 20, 35, 50, 75, 100, 200)
+# Interface the metrics server listens on; set 0.0.0.0 to expose it
+METRICS_HOST = os.environ.get('MAYOGA_METRICS_HOST', '127.0.0.1')
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)      # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    # Approximate quantile from the bucket bounds
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return float('inf')
+
+    def cumulative(self):
+        total = 0
+        for bound, n in zip(list(self.buckets) + ['+Inf'], self.counts):
+            total += n
+            yield bound, total
+
+
+class LLMCall:
+    def __init__(self, kind):
+        self.kind = kind
+        self.response = None
+        self.cache_hit = False
+        self.error = None
+        self.wall_seconds = 0.0
+
+
+class KindStats:
+    def __init__(self):
+        self.calls = 0
+        self.cache_hits = 0
+        self.errors = {}
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.prompt_eval_seconds = 0.0
+        self.request_seconds = Histogram(SECONDS_BUCKETS)
+        self.total_duration = Histogram(SECONDS_BUCKETS)
+        self.load_duration = Histogram(SECONDS_BUCKETS)
+        self.prompt_eval_count = Histogram(TOKEN_BUCKETS)
+        self.eval_count = Histogram(TOKEN_BUCKETS)
+        self.tokens_per_second = Histogram(TOKENS_PER_SECOND_BUCKETS)
+
+
+class LLMTelemetry:
+    def __init__(self):
+        self._kinds = {}
+        self._lock = threading.Lock()
+
+    def record(self, call):
+        with self._lock:
+            stats = self._kinds.setdefault(call.kind, KindStats())
+            stats.calls += 1
+            stats.request_seconds.observe(call.wall_seconds)
+
+            if call.error is not None:
+                stats.errors[call.error] = stats.errors.get(call.error, 0) + 1
+                return
+            if call.cache_hit:
+                stats.cache_hits += 1
+                return
+
+            response = call.response
+            if response is None:
+                return
+            # Ollama reports durations in nanoseconds
+            total = (response.get('total_duration') or 0) / 1e9
+            load = (response.get('load_duration') or 0) / 1e9
+            prompt_count = response.get('prompt_eval_count') or 0
+            prompt_seconds = (response.get('prompt_eval_duration') or 0) / 1e9
+            eval_count = response.get('eval_count') or 0
+            eval_seconds = (response.get('eval_duration') or 0) / 1e9
+
+            stats.total_duration.observe(total)
+            stats.load_duration.observe(load)
+            stats.prompt_eval_count.observe(prompt_count)
+            stats.eval_count.observe(eval_count)
+            stats.prompt_tokens += prompt_count
+            stats.completion_tokens += eval_count
+            stats.prompt_eval_seconds += prompt_seconds
+            if eval_seconds:
+                stats.tokens_per_second.observe(eval_count / eval_seconds)
+
+    # Per call type summary for the admin page
+    def summary(self):
+        with self._lock:
+            rows = []
+            for kind, s in sorted(self._kinds.items()):
+                generated = s.calls - s.cache_hits - sum(s.errors.values())
+                rows.append({
+                    'kind': kind,
+                    'calls': s.calls,
+                    'cache_hits': s.cache_hits,
+                    'errors': sum(s.errors.values()),
+                    'p50_seconds': s.request_seconds.quantile(0.5),
+                    'p95_seconds': s.request_seconds.quantile(0.95),
+                    'avg_prompt_tokens': s.prompt_tokens / generated if generated > 0 else 0.0,
+                    'avg_prefill_ms': s.prompt_eval_seconds * 1000 / generated if generated > 0 else 0.0,
+                    'avg_completion_tokens': s.completion_tokens / generated if generated > 0 else 0.0,
+                    'avg_tokens_per_second': (
+                        s.tokens_per_second.sum / s.tokens_per_second.count if s.tokens_per_second.count else 0.0
+                    ),
+                    'total_seconds': s.request_seconds.sum,
+                })
+            return rows
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            kinds = sorted(self._kinds.items())
+
+            lines.append("# HELP mayoga_llm_calls_total LLM calls by type and outcome.")
+            lines.append("# TYPE mayoga_llm_calls_total counter")
+            for kind, s in kinds:
+                errors = sum(s.errors.values())
+                generated = s.calls - s.cache_hits - errors
+                lines.append(f'mayoga_llm_calls_total{{kind="{kind}",outcome="generated"}} {generated}')
+                lines.append(f'mayoga_llm_calls_total{{kind="{kind}",outcome="cache_hit"}} {s.cache_hits}')
+                lines.append(f'mayoga_llm_calls_total{{kind="{kind}",outcome="error"}} {errors}')
+
+            lines.append("# HELP mayoga_llm_errors_total Failed LLM calls by exception type.")
+            lines.append("# TYPE mayoga_llm_errors_total counter")
+            for kind, s in kinds:
+                for error, n in sorted(s.errors.items()):
+                    lines.append(f'mayoga_llm_errors_total{{kind="{kind}",error="{error}"}} {n}')
+
+            lines.append("# HELP mayoga_llm_tokens_total Prompt and completion tokens evaluated.")
+            lines.append("# TYPE mayoga_llm_tokens_total counter")
+            for kind, s in kinds:
+                lines.append(f'mayoga_llm_tokens_total{{kind="{kind}",type="prompt"}} {s.prompt_tokens}')
+                lines.append(f'mayoga_llm_tokens_total{{kind="{kind}",type="completion"}} {s.completion_tokens}')
+
+            histograms = (
+                ('mayoga_llm_request_seconds', 'request_seconds', "Wall-clock time per LLM call, cache hits included."),
+                ('mayoga_llm_total_duration_seconds', 'total_duration', "Ollama total_duration per generated call."),
+                ('mayoga_llm_load_duration_seconds', 'load_duration', "Ollama model load time per generated call."),
+                ('mayoga_llm_prompt_eval_tokens', 'prompt_eval_count', "Prompt tokens evaluated per call."),
+                ('mayoga_llm_eval_tokens', 'eval_count', "Tokens generated per call."),
+                ('mayoga_llm_tokens_per_second', 'tokens_per_second', "Generation speed per call."),
+            )
+            for name, attr, help_text in histograms:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for kind, s in kinds:
+                    histogram = getattr(s, attr)
+                    for bound, total in histogram.cumulative():
+                        lines.append(f'{name}_bucket{{kind="{kind}",le="{bound}"}} {total}')
+                    lines.append(f'{name}_sum{{kind="{kind}"}} {histogram.sum}')
+                    lines.append(f'{name}_count{{kind="{kind}"}} {histogram.count}')
+
+        for collector in list(_collectors):
+            try:
+                lines.extend(collector())
+            except Exception:
+                logging.exception("Metrics collector %r failed", collector)
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._kinds.clear()
+
+
+telemetry = LLMTelemetry()
+
+# Extra functions returning Prometheus lines (cache stats, parse outcomes, ...)
+_collectors = []
+
+
+def register_collector(collector):
+    if collector not in _collectors:
+        _collectors.append(collector)
+
+
+# Wrap one LLM call. Set call.response to the Ollama response (or the final
+# stream chunk) or call.cache_hit = True; exceptions are counted and re-raised.
+@contextmanager
+def track_llm_call(kind):
+    call = LLMCall(kind)
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception as e:
+        call.error = type(e).__name__
+        raise
+    finally:
+        call.wall_seconds = time.perf_counter() - started
+        telemetry.record(call)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.rstrip('/')
+        if path == '/metrics':
+            body = telemetry.render_prometheus().encode()
+            content_type = 'text/plain; version=0.0.4'
+        elif path == '/sql.json':
+            # The query profiler summary, for dashboards reading JSON
+            from services.query_profiler import export_json
+            body = export_json().encode()
+            content_type = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+
+
+# Serve /metrics for Prometheus (and /sql.json) on a background thread (once per process)
+def start_metrics_server(port, host=None):
+    global _metrics_server
+    host = METRICS_HOST if host is None else host
+    with _metrics_server_lock:
+        if _metrics_server is None:
+            _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_metrics_server.serve_forever, name='metrics-server', daemon=True).start()
+    return _metrics_server
+
+
+def _cache_metrics():
+    from models.response_cache import get_response_cache
+    stats = get_response_cache().stats()
+    return [
+        "# TYPE mayoga_llm_cache_lookups_total counter",
+        f'mayoga_llm_cache_lookups_total{{result="hit"}} {stats["hits"]}',
+        f'mayoga_llm_cache_lookups_total{{result="miss"}} {stats["misses"]}',
+        "# TYPE mayoga_llm_cache_entries gauge",
+        f"mayoga_llm_cache_entries {stats['entries']}",
+        "# TYPE mayoga_llm_cache_bytes gauge",
+        f"mayoga_llm_cache_bytes {stats['bytes']}",
+    ]
+
+
+def _structured_output_metrics():
+    from models.structured_output import structured_output_stats
+    stats = structured_output_stats()
+    lines = ["# TYPE mayoga_llm_parse_outcomes_total counter"]
+    for outcome in ('valid', 'repaired', 'continued', 'failed'):
+        lines.append(f'mayoga_llm_parse_outcomes_total{{outcome="{outcome}"}} {stats[outcome]}')
+    return lines
+
+
+def _sql_metrics():
+    from services.query_profiler import profiler
+    sites = sorted(profiler.sites().items())
+    lines = ["# TYPE mayoga_sql_queries_total counter"]
+    lines.extend(f'mayoga_sql_queries_total{{site="{site}"}} {calls}' for site, (calls, _, _) in sites)
+    lines.append("# TYPE mayoga_sql_seconds_total counter")
+    lines.extend(f'mayoga_sql_seconds_total{{site="{site}"}} {seconds}' for site, (_, seconds, _) in sites)
+    lines.append("# TYPE mayoga_sql_slow_queries_total counter")
+    lines.extend(f'mayoga_sql_slow_queries_total{{site="{site}"}} {slow}' for site, (_, _, slow) in sites)
+    return lines
+
+
+register_collector(_cache_metrics)
+register_collector(_structured_output_metrics)
+register_collector(_sql_metrics)
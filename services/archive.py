@@ -0,0 +1,307 @@
+import argparse
+import gzip
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from services import db_connection
+from services.db_connection import db_cursor, transaction
+from services.job_queue import get_job_queue
+from services.migrations import migrate
+
+# Hot/cold archival of quiz attempts and roadmap history.
+#
+#     python -m services.archive --days 180 --vacuum
+#
+# Rows older than MAYOGA_ARCHIVE_AFTER_DAYS keep their small columns (ids,
+# username, score, phase, version, created_at...) in users.db, so every
+# existing query, index and the cohort export keep working, but their JSON
+# payloads (quiz_results.quiz_data and result, roadmaps.roadmap) move to
+# per-month gzip-compressed JSONL partitions in MAYOGA_ARCHIVE_DIR
+# (<table>-YYYY-MM.jsonl.gz, default "archive" next to users.db). The row's
+# payload columns are emptied and archive_partition / archive_offset point at
+# the gzip member holding it.
+#
+# Each batch is read, appended to its partitions (one gzip member per
+# partition) and marked archived in one write transaction; a member appended
+# by a batch that did not commit is never pointed at and is archived again by
+# the next run. A user's roadmap versions from their latest snapshot on are
+# never archived, so saving a new version never reads the archive.
+#
+# get_quiz_results and roadmap_versions.load_version read archived payloads
+# transparently; reading one decompresses only its member (at most
+# ARCHIVE_BATCH_ROWS rows), and recently read members are cached.
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get('MAYOGA_ARCHIVE_AFTER_DAYS', 180))
+ARCHIVE_DIR = os.environ.get('MAYOGA_ARCHIVE_DIR')
+ARCHIVE_BATCH_ROWS = 2000
+MEMBER_CACHE_SIZE = 16
+HOT_QUERY_SAMPLE_USERS = 50
+
+# Payload columns moved to the partitions, per table
+ARCHIVED_COLUMNS = {
+    'quiz_results': ('quiz_data', 'result'),
+    'roadmaps': ('roadmap',),
+}
+
+# Rows old enough to archive, besides created_at < cutoff
+ARCHIVABLE = {
+    'quiz_results': "1",
+    'roadmaps': '''
+    version IS NOT NULL AND version < (
+        SELECT MAX(latest.version) FROM roadmaps latest
+        WHERE latest.username = roadmaps.username AND latest.encoding = 'full'
+    )
+    ''',
+}
+
+# Reads served from users.db on every page view, timed before and after a run
+HOT_QUERIES = {
+    'recent_quiz_scores': '''
+    SELECT score, created_at FROM quiz_results WHERE username = ? ORDER BY created_at DESC, id DESC LIMIT 5
+    ''',
+    'recent_quiz_attempts': '''
+    SELECT quiz_data, result FROM quiz_results WHERE username = ? ORDER BY created_at DESC, id DESC LIMIT 5
+    ''',
+    'latest_roadmap': '''
+    SELECT roadmap FROM roadmaps WHERE username = ? ORDER BY created_at DESC, id DESC LIMIT 1
+    ''',
+}
+
+
+def archive_dir():
+    return ARCHIVE_DIR or os.path.join(os.path.dirname(db_connection.db_path) or '.', 'archive')
+
+
+def _partition_path(table, partition):
+    return os.path.join(archive_dir(), f"{table}-{partition}.jsonl.gz")
+
+
+# Append records to a partition as one gzip member and make it durable.
+# Returns the member's byte offset in the file.
+def _append(path, records):
+    with open(path, 'ab') as f:
+        offset = f.seek(0, os.SEEK_END)
+        with gzip.GzipFile(fileobj=f, mode='wb') as member:
+            for record in records:
+                member.write(json.dumps(record).encode() + b'\n')
+        f.flush()
+        os.fsync(f.fileno())
+    return offset
+
+
+_members = OrderedDict()
+_members_lock = threading.Lock()
+
+
+# {row id: record} of the gzip member at offset; members never change once written
+def _load_member(path, offset):
+    key = (path, offset)
+    with _members_lock:
+        records = _members.get(key)
+        if records is not None:
+            _members.move_to_end(key)
+            return records
+
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    data = []
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while not decompressor.eof:
+            block = f.read(1 << 16)
+            if not block:
+                raise ValueError(f"Archive member at {offset} of {path} is truncated")
+            data.append(decompressor.decompress(block))
+    records = {}
+    for line in b''.join(data).splitlines():
+        record = json.loads(line)
+        records[record['id']] = record
+
+    with _members_lock:
+        _members[key] = records
+        while len(_members) > MEMBER_CACHE_SIZE:
+            _members.popitem(last=False)
+    return records
+
+
+# The archived payload columns of one row. Raises KeyError when the archive
+# does not hold the row.
+def archived_payload(table, row_id, partition, offset):
+    try:
+        return _load_member(_partition_path(table, partition), offset)[row_id]
+    except FileNotFoundError:
+        raise KeyError(f"Archive partition {table}-{partition} is missing") from None
+
+
+# Value of a payload column, from the row or from the archive when archived
+def payload_value(table, column, row_id, partition, offset, value):
+    return value if partition is None else archived_payload(table, row_id, partition, offset)[column]
+
+
+def _archive_table(table, cutoff):
+    columns = ARCHIVED_COLUMNS[table]
+    assignments = ", ".join(f"{column} = ''" for column in columns)
+    moved = {'rows': 0, 'payload_bytes': 0, 'partitions': set()}
+    last_id = 0
+
+    while True:
+        with transaction(immediate=True) as cursor:
+            cursor.execute(f'''
+            SELECT id, strftime('%Y-%m', created_at), {", ".join(columns)} FROM {table}
+            WHERE id > ? AND archive_partition IS NULL AND created_at < ? AND {ARCHIVABLE[table]}
+            ORDER BY id
+            LIMIT ?
+            ''', (last_id, cutoff, ARCHIVE_BATCH_ROWS))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            by_partition = {}
+            for row_id, partition, *values in rows:
+                by_partition.setdefault(partition, []).append({'id': row_id, **dict(zip(columns, values))})
+                moved['payload_bytes'] += sum(len(value or '') for value in values)
+            offsets = {}
+            for partition, records in by_partition.items():
+                offsets[partition] = _append(_partition_path(table, partition), records)
+                moved['partitions'].add(partition)
+
+            cursor.executemany(
+                f"UPDATE {table} SET archive_partition = ?, archive_offset = ?, {assignments} WHERE id = ?",
+                [(partition, offsets[partition], row_id) for row_id, partition, *_ in rows],
+            )
+            moved['rows'] += len(rows)
+            last_id = rows[-1][0]
+
+    moved['partitions'] = sorted(moved['partitions'])
+    return moved
+
+
+def database_bytes():
+    path = db_connection.db_path
+    return sum(os.path.getsize(p) for p in (path, f"{path}-wal") if os.path.exists(p))
+
+
+def _vacuum():
+    with db_cursor() as cursor:
+        cursor.execute("VACUUM")
+        # In WAL mode the vacuumed pages reach the main file at the checkpoint
+        cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+# Milliseconds per HOT_QUERIES query with a warm page cache, averaged over a sample of users
+def hot_query_latency(users=HOT_QUERY_SAMPLE_USERS, repeat=5):
+    with db_cursor() as cursor:
+        cursor.execute("SELECT username FROM users ORDER BY id LIMIT ?", (users,))
+        usernames = [row[0] for row in cursor.fetchall()]
+        if not usernames:
+            return {}
+
+        latency = {}
+        for name, sql in HOT_QUERIES.items():
+            # The first pass only warms the page cache
+            for timed in (False, True):
+                started = time.perf_counter()
+                for _ in range(repeat if timed else 1):
+                    for username in usernames:
+                        cursor.execute(sql, (username,))
+                        cursor.fetchall()
+            latency[name] = (time.perf_counter() - started) / (repeat * len(usernames)) * 1000
+    return latency
+
+
+# Archive the payloads of rows older than max_age_days. vacuum=True also
+# rebuilds the database file so the space is returned (it needs the database
+# to itself for a while). Returns what moved, the database size and the hot
+# query latency before and after.
+def archive_old_rows(max_age_days=ARCHIVE_AFTER_DAYS, vacuum=False, measure=True):
+    directory = archive_dir()
+    os.makedirs(directory, exist_ok=True)
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=max_age_days)).strftime('%Y-%m-%d %H:%M:%S')
+
+    report = {'cutoff': cutoff, 'directory': directory, 'bytes_before': database_bytes()}
+    if measure:
+        report['hot_query_ms_before'] = hot_query_latency()
+
+    archive_before = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+    report['tables'] = {table: _archive_table(table, cutoff) for table in ARCHIVED_COLUMNS}
+    report['archive_bytes_written'] = (
+        sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory)) - archive_before
+    )
+
+    if vacuum:
+        _vacuum()
+    report['bytes_after'] = database_bytes()
+    if measure:
+        report['hot_query_ms_after'] = hot_query_latency()
+    return report
+
+
+# Quiz attempts of a user, newest first, with quiz_data and result decoded
+# whether they are still in users.db or archived
+def get_quiz_results(username, limit=None):
+    with db_cursor() as cursor:
+        cursor.execute('''
+        SELECT id, quiz_data, result, score, feedback, phase, milestone, created_at,
+               archive_partition, archive_offset
+        FROM quiz_results WHERE username = ?
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+        ''', (username, -1 if limit is None else limit))
+        rows = cursor.fetchall()
+
+    results = []
+    for row_id, quiz_data, result, score, feedback, phase, milestone, created_at, partition, offset in rows:
+        if partition is not None:
+            archived = archived_payload('quiz_results', row_id, partition, offset)
+            quiz_data, result = archived['quiz_data'], archived['result']
+        results.append({
+            'id': row_id,
+            'quiz_data': json.loads(quiz_data),
+            'result': json.loads(result),
+            'score': score,
+            'feedback': feedback,
+            'phase': phase,
+            'milestone': milestone,
+            'created_at': created_at,
+            'archived': partition is not None,
+        })
+    return results
+
+
+def _run_archival(payload, report_progress):
+    return archive_old_rows(payload['max_age_days'], measure=False)
+
+
+_archival_scheduled = False
+_archival_lock = threading.Lock()
+
+
+# Run archival once per process on the background job queue (without VACUUM)
+def schedule_archival(max_age_days=ARCHIVE_AFTER_DAYS):
+    global _archival_scheduled
+    with _archival_lock:
+        if _archival_scheduled:
+            return None
+        _archival_scheduled = True
+
+    queue = get_job_queue()
+    queue.register('archival', _run_archival)
+    return queue.submit('archival', {'max_age_days': max_age_days}, dedupe_key='archival')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old quiz attempts and roadmap history to compressed partitions.")
+    parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS, help="archive rows older than this")
+    parser.add_argument('--vacuum', action='store_true', help="rebuild users.db afterwards to return the space")
+    args = parser.parse_args()
+
+    migrate()
+    print(json.dumps(archive_old_rows(args.days, vacuum=args.vacuum), indent=2))
+
+
+if __name__ == '__main__':
+    main()
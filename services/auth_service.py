@@ -1,34 +1,29 @@
-from services.database_service import hash_password, db_path
-import sqlite3
+from services.database_service import hash_password
+from services.db_connection import db_cursor, transaction
+from services.events import publish
 
 def register_user(username, password, role, current_stage, role_specific_field, end_goal):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
     hashed_password = hash_password(password)
-    
+
     # Handling registration based on user role (Student/Professional)
-    cursor.execute('''
-        INSERT INTO users (username, password, role, current_stage, role_specific_field, end_goal)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (username, hashed_password, role, current_stage, role_specific_field, end_goal))
-    
-    conn.commit()
-    conn.close()
+    with transaction() as cursor:
+        cursor.execute('''
+            INSERT INTO users (username, password, role, current_stage, role_specific_field, end_goal)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (username, hashed_password, role, current_stage, role_specific_field, end_goal))
 
-def login_user(username, password):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    publish('profile_updated', username=username)
 
+def login_user(username, password):
     hashed_password = hash_password(password)
 
-    cursor.execute('''
-        SELECT * FROM users WHERE username = ? AND password = ?
-    ''', (username, hashed_password))
+    with db_cursor() as cursor:
+        cursor.execute('''
+            SELECT * FROM users WHERE username = ? AND password = ?
+        ''', (username, hashed_password))
 
-    user = cursor.fetchone()
-    conn.close()
+        user = cursor.fetchone()
 
     if user:
         return True
-    return False
\ No newline at end of file
+    return False
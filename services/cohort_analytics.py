@@ -0,0 +1,311 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from services import db_connection
+from services.db_connection import db_cursor
+from services.events import subscribe
+
+# Cohort analytics for admins: score distributions per phase, time to
+# complete each milestone, and drop-off by role / field / end goal.
+#
+# quiz_results and user_progress only ever grow, so they are exported column
+# by column to .npy files next to the database and memory-mapped; each refresh
+# appends just the rows with an id above the last exported one. Usernames,
+# phases and milestones are stored as integer codes, so every aggregate is a
+# NumPy sort, bincount or pandas groupby over plain arrays. Results are cached
+# until a write: table high-water marks are checked on every call (which also
+# sees other processes), and in-process write events mark the cache stale.
+
+EXPORT_CHUNK_ROWS = 200_000
+SCORE_BINS = np.arange(0, 101, 10)
+FUNNEL_STEPS = (1, 3, 6, 9, 12)
+ACTIVE_DAYS = 14
+COHORT_COLUMNS = ('role', 'role_specific_field', 'end_goal')
+
+
+def _export_dir():
+    return os.path.join(os.path.dirname(db_connection.db_path) or '.', 'analytics')
+
+
+# Append-only columnar copy of one table. fields are (name, dtype, kind) in the
+# order query selects them; kind 'user' maps a username to users.id (-1 if
+# unknown), 'category' codes text against a vocabulary kept with the export.
+class ColumnExport:
+    def __init__(self, directory, table, query, fields):
+        self.directory = directory
+        self.table = table
+        self.query = query
+        self.fields = fields
+        self.reset()
+        self._load()
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{self.table}.{name}.npy")
+
+    def _meta_path(self):
+        return os.path.join(self.directory, f"{self.table}.meta.json")
+
+    def reset(self):
+        self.columns = {name: np.empty(0, dtype) for name, dtype, _ in self.fields}
+        self.vocabularies = {name: [] for name, _, kind in self.fields if kind == 'category'}
+        self.last_id = 0
+
+    def _load(self):
+        try:
+            with open(self._meta_path()) as f:
+                meta = json.load(f)
+            columns = {name: np.load(self._path(name), mmap_mode='r') for name, _, _ in self.fields}
+        except (OSError, ValueError):
+            return
+        self.columns = columns
+        self.vocabularies = meta['vocabularies']
+        self.last_id = meta['last_id']
+
+    def _save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        for name, values in self.columns.items():
+            np.save(self._path(name), values)
+        with open(self._meta_path(), 'w') as f:
+            json.dump({'vocabularies': self.vocabularies, 'last_id': self.last_id}, f)
+        # Reopen memory-mapped so the arrays are not held in memory twice
+        self.columns = {name: np.load(self._path(name), mmap_mode='r') for name, _, _ in self.fields}
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    def array(self, name):
+        return np.asarray(self.columns[name])
+
+    # Append the rows added since the last export; user_ids maps username -> users.id.
+    # Returns how many rows were added.
+    def update(self, user_ids):
+        codes = {name: {value: i for i, value in enumerate(vocabulary)}
+                 for name, vocabulary in self.vocabularies.items()}
+        chunks = []
+        with db_cursor() as cursor:
+            cursor.execute(self.query, (self.last_id,))
+            while True:
+                rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+                if not rows:
+                    break
+                frame = pd.DataFrame(rows, columns=[name for name, _, _ in self.fields])
+                chunk = {}
+                for name, dtype, kind in self.fields:
+                    values = frame[name]
+                    if kind == 'user':
+                        values = values.map(user_ids).fillna(-1)
+                    elif kind == 'category':
+                        for value in values.unique():
+                            if value not in codes[name]:
+                                codes[name][value] = len(self.vocabularies[name])
+                                self.vocabularies[name].append(value)
+                        values = values.map(codes[name])
+                    else:
+                        values = values.fillna(0)
+                    chunk[name] = values.to_numpy(dtype)
+                chunks.append(chunk)
+
+        if not chunks:
+            return 0
+        self.columns = {
+            name: np.concatenate([self.array(name)] + [chunk[name] for chunk in chunks])
+            for name, _, _ in self.fields
+        }
+        self.last_id = int(self.columns['id'][-1])
+        self._save()
+        return sum(len(chunk['id']) for chunk in chunks)
+
+
+def _quiz_export(directory):
+    return ColumnExport(directory, 'quiz_results', '''
+    SELECT id, username, COALESCE(phase, ''), score, CAST(strftime('%s', created_at) AS INTEGER)
+    FROM quiz_results WHERE id > ? ORDER BY id
+    ''', [
+        ('id', np.int64, 'int'), ('user', np.int64, 'user'), ('phase', np.int32, 'category'),
+        ('score', np.float32, 'float'), ('created_at', np.int64, 'int'),
+    ])
+
+
+def _progress_export(directory):
+    return ColumnExport(directory, 'user_progress', '''
+    SELECT id, username, phase, milestone, CAST(strftime('%s', completed_at) AS INTEGER)
+    FROM user_progress WHERE id > ? ORDER BY id
+    ''', [
+        ('id', np.int64, 'int'), ('user', np.int64, 'user'), ('phase', np.int32, 'category'),
+        ('milestone', np.int32, 'category'), ('completed_at', np.int64, 'int'),
+    ])
+
+
+# Quantile q of each group in values sorted by (group, value); starts are the group offsets
+def _sorted_group_quantile(values, starts, counts, q):
+    positions = starts + (counts - 1) * q
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, starts + counts - 1)
+    weight = positions - lower
+    return values[lower] * (1 - weight) + values[upper] * weight
+
+
+class CohortAnalytics:
+    def __init__(self, export_dir=None):
+        directory = export_dir or _export_dir()
+        self.quizzes = _quiz_export(directory)
+        self.progress = _progress_export(directory)
+        self._lock = threading.Lock()
+        self._marks = None
+        self._stale = True
+        self._results = None
+        self._users = None
+
+    def mark_stale(self, **_):
+        self._stale = True
+
+    def _high_water_marks(self):
+        with db_cursor() as cursor:
+            cursor.execute('''
+            SELECT (SELECT MAX(id) FROM quiz_results), (SELECT MAX(id) FROM user_progress),
+                   (SELECT MAX(id) FROM users), (SELECT COUNT(*) FROM users)
+            ''')
+            return cursor.fetchone()
+
+    # Bring the users frame and both exports up to date; returns True if anything changed
+    def refresh(self):
+        marks = self._high_water_marks()
+        if not self._stale and marks == self._marks:
+            return False
+
+        self._stale = False
+        with db_cursor() as cursor:
+            cursor.execute("SELECT id, username, role, role_specific_field, end_goal FROM users")
+            self._users = pd.DataFrame(cursor.fetchall(), columns=['user_id', 'username', *COHORT_COLUMNS])
+        user_ids = dict(zip(self._users['username'], self._users['user_id']))
+
+        for export, mark in ((self.quizzes, marks[0]), (self.progress, marks[1])):
+            if (mark or 0) < export.last_id:
+                # The database was replaced or rows were removed; export again from scratch
+                export.reset()
+            export.update(user_ids)
+        self._marks = marks
+        self._results = None
+        return True
+
+    # All cohort tables, recomputed only after new writes
+    def summary(self):
+        with self._lock:
+            if self.refresh() or self._results is None:
+                self._results = {
+                    'score_distribution': self._score_distribution(),
+                    'time_to_complete': self._time_to_complete(),
+                    'drop_off': self._drop_off(),
+                }
+            return self._results
+
+    def score_distribution(self):
+        return self.summary()['score_distribution']
+
+    def time_to_complete(self):
+        return self.summary()['time_to_complete']
+
+    def drop_off(self):
+        return self.summary()['drop_off']
+
+    # Quiz count, mean, quartiles and a 10-point histogram of scores per phase
+    def _score_distribution(self):
+        bins = [f"{lo}-{hi}" for lo, hi in zip(SCORE_BINS[:-1], SCORE_BINS[1:])]
+        if not len(self.quizzes):
+            return pd.DataFrame(columns=['phase', 'quizzes', 'mean', 'p25', 'median', 'p75', *bins])
+
+        phases = self.quizzes.array('phase')
+        scores = self.quizzes.array('score')
+        order = np.lexsort((scores, phases))
+        phases, scores = phases[order], scores[order].astype(np.float64)
+        codes, starts, counts = np.unique(phases, return_index=True, return_counts=True)
+
+        table = pd.DataFrame({
+            'phase': [self.quizzes.vocabularies['phase'][code] or '(no phase)' for code in codes],
+            'quizzes': counts,
+            'mean': np.add.reduceat(scores, starts) / counts,
+            'p25': _sorted_group_quantile(scores, starts, counts, 0.25),
+            'median': _sorted_group_quantile(scores, starts, counts, 0.5),
+            'p75': _sorted_group_quantile(scores, starts, counts, 0.75),
+        })
+        bin_index = np.clip(np.digitize(scores, SCORE_BINS[1:-1]), 0, len(bins) - 1)
+        group = np.repeat(np.arange(len(codes)), counts)
+        histogram = np.bincount(group * len(bins) + bin_index, minlength=len(codes) * len(bins))
+        return table.join(pd.DataFrame(histogram.reshape(len(codes), len(bins)), columns=bins))
+
+    # Days between a user's previous completed milestone and this one, per milestone
+    def _time_to_complete(self):
+        columns = ['phase', 'milestone', 'completions', 'median_days', 'p90_days']
+        if not len(self.progress):
+            return pd.DataFrame(columns=columns)
+
+        users = self.progress.array('user')
+        completed_at = self.progress.array('completed_at')
+        order = np.lexsort((completed_at, users))
+        users, completed_at = users[order], completed_at[order]
+        same_user = np.r_[False, users[1:] == users[:-1]]
+        days = np.r_[0, np.diff(completed_at)] / 86400
+
+        frame = pd.DataFrame({
+            'phase': self.progress.array('phase')[order][same_user],
+            'milestone': self.progress.array('milestone')[order][same_user],
+            'days': days[same_user],
+        })
+        grouped = frame.groupby(['phase', 'milestone'])['days']
+        table = pd.DataFrame({
+            'completions': grouped.size(),
+            'median_days': grouped.median(),
+            'p90_days': grouped.quantile(0.9),
+        }).reset_index()
+        table['phase'] = np.asarray(self.progress.vocabularies['phase'], dtype=object)[table['phase']]
+        table['milestone'] = np.asarray(self.progress.vocabularies['milestone'], dtype=object)[table['milestone']]
+        return table[columns]
+
+    # Users per cohort, the share reaching each milestone count and the share active lately
+    def _drop_off(self, by=COHORT_COLUMNS):
+        users = self._users
+        if users.empty:
+            return pd.DataFrame(columns=[*by, 'users'])
+
+        size = int(users['user_id'].max()) + 1
+        progress_users = self.progress.array('user')
+        known = progress_users >= 0
+        completed = np.bincount(progress_users[known], minlength=size)
+
+        last_active = np.full(size, -1, dtype=np.int64)
+        np.maximum.at(last_active, progress_users[known], self.progress.array('completed_at')[known])
+        quiz_users = self.quizzes.array('user')
+        known = quiz_users >= 0
+        np.maximum.at(last_active, quiz_users[known], self.quizzes.array('created_at')[known])
+
+        ids = users['user_id'].to_numpy()
+        cutoff = pd.Timestamp.now(tz='UTC').timestamp() - ACTIVE_DAYS * 86400
+        frame = users[list(by)].assign(active=last_active[ids] >= cutoff)
+        for step in FUNNEL_STEPS:
+            frame[f"reached_{step}"] = completed[ids] >= step
+
+        grouped = frame.groupby(list(by))
+        table = grouped.size().to_frame('users')
+        for step in FUNNEL_STEPS:
+            table[f"reached_{step}_pct"] = grouped[f"reached_{step}"].mean() * 100
+        table[f"active_{ACTIVE_DAYS}d_pct"] = grouped['active'].mean() * 100
+        return table.reset_index().sort_values('users', ascending=False, ignore_index=True)
+
+
+_analytics = None
+_analytics_lock = threading.Lock()
+
+
+def get_cohort_analytics():
+    global _analytics
+    if _analytics is None:
+        with _analytics_lock:
+            if _analytics is None:
+                _analytics = CohortAnalytics()
+                for event in ('progress_recorded', 'quiz_results_saved', 'profile_updated'):
+                    subscribe(event, _analytics.mark_stale)
+    return _analytics
@@ -1,69 +1,25 @@
-import sqlite3
 import os
 import hashlib
 import json
-
-# Path to the SQLite database file
-db_path = os.path.join('data', 'users.db')
-
-# Function to create the database and tables
+from services import db_connection
+from services.db_connection import db_cursor, transaction
+from services.events import publish
+from services.migrations import migrate
+from services.roadmap_store import (
+    decode_roadmap, insert_roadmap_rows, relink_progress, drop_superseded_rows, latest_roadmap_id, load_roadmap,
+)
+from services.roadmap_versions import FULL, encode_version, load_version
+from services.user_summary import record_milestone, record_quiz, record_roadmap
+
+# Function to create the database and bring its schema up to date
 def create_db():
-    # Check if the database already exists
-    if not os.path.exists(db_path):
-        # Connect to the SQLite database (it will be created if it doesn't exist)
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
+    db_dir = os.path.dirname(db_connection.db_path)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
 
-        # Create a table for storing user information
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL,
-            password TEXT NOT NULL,
-            role TEXT NOT NULL,                  -- Student or Professional
-            role_specific_field TEXT NOT NULL,   -- Field for student stage or professional job details
-            end_goal TEXT NOT NULL               -- User's end goal
-        )
-        ''')
-
-        # Create a table for storing roadmaps
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS roadmaps (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL,
-            roadmap TEXT NOT NULL,               -- JSON format for storing roadmaps
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-
-        # Create a table for storing quiz results
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS quiz_results (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL,
-            quiz_data TEXT NOT NULL,             -- JSON format for storing quiz questions and answers
-            result TEXT NOT NULL,                -- User's answers in JSON format
-            score REAL NOT NULL,                 -- User's score
-            feedback TEXT                        -- Feedback for incorrect answers
-        )
-        ''')
-
-        # Create a table for storing progress tracking
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_progress (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL,
-            phase TEXT NOT NULL,                 -- Phase of the roadmap (e.g., Phase 1)
-            milestone TEXT NOT NULL,             -- Specific milestone the user completed
-            completed_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-
-        conn.commit()
-        conn.close()
-        print("Database and tables created successfully.")
-    else:
-        print("Database already exists.")
+    applied = migrate()
+    for version, description in applied:
+        print(f"Applied database migration {version}: {description}")
 
 # Hash password
 def hash_password(password):
@@ -71,150 +27,162 @@ def hash_password(password):
 
 # User Registration
 def register_user(username, password, role, role_specific_field, end_goal):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
     hashed_password = hash_password(password)
 
-    cursor.execute('''
-    INSERT INTO users (username, password, role, role_specific_field, end_goal)
-    VALUES (?, ?, ?, ?, ?)
-    ''', (username, hashed_password, role, role_specific_field, end_goal))
+    with transaction() as cursor:
+        cursor.execute('''
+        INSERT INTO users (username, password, role, role_specific_field, end_goal)
+        VALUES (?, ?, ?, ?, ?)
+        ''', (username, hashed_password, role, role_specific_field, end_goal))
 
-    conn.commit()
-    conn.close()
+    publish('profile_updated', username=username)
 
 # User Login
 def login_user(username, password):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
     hashed_password = hash_password(password)
 
-    cursor.execute('''
-    SELECT * FROM users WHERE username = ? AND password = ?
-    ''', (username, hashed_password))
+    with db_cursor() as cursor:
+        cursor.execute('''
+        SELECT * FROM users WHERE username = ? AND password = ?
+        ''', (username, hashed_password))
 
-    user = cursor.fetchone()
+        user = cursor.fetchone()
 
-    conn.close()
     return user
 
 # Get user profile
 def get_user_profile(username):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    cursor.execute('''
-    SELECT username, role, role_specific_field, end_goal FROM users WHERE username = ?
-    ''', (username,))
+    with db_cursor() as cursor:
+        cursor.execute('''
+        SELECT username, role, role_specific_field, end_goal, current_stage FROM users WHERE username = ?
+        ''', (username,))
 
-    user_profile = cursor.fetchone()
-    conn.close()
+        user_profile = cursor.fetchone()
 
     if user_profile:
         return {
             'username': user_profile[0],
             'role': user_profile[1],
             'role_specific_field': user_profile[2],
-            'end_goal': user_profile[3]
+            'end_goal': user_profile[3],
+            'current_stage': user_profile[4]
         }
     else:
         return None
 
 # Update user profile
 def update_user_profile(username, role, role_specific_field, end_goal):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    cursor.execute('''
-    UPDATE users SET role = ?, role_specific_field = ?, end_goal = ? WHERE username = ?
-    ''', (role, role_specific_field, end_goal, username))
+    with transaction() as cursor:
+        cursor.execute('''
+        UPDATE users SET role = ?, role_specific_field = ?, end_goal = ? WHERE username = ?
+        ''', (role, role_specific_field, end_goal, username))
 
-    conn.commit()
-    conn.close()
+    publish('profile_updated', username=username)
 
-# Save the user's roadmap in JSON format
+# Save the user's roadmap as a new version and as phases/milestones/resources rows.
+# Accepts the roadmap dict or an already-serialized JSON string.
 def save_user_roadmap(username, roadmap):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    roadmap_json = json.dumps(roadmap)
+    # Immediate, so two saves for one user cannot pick the same version number
+    with transaction(immediate=True) as cursor:
+        version, encoding, stored = encode_version(cursor, username, roadmap)
+        cursor.execute('''
+        INSERT INTO roadmaps (username, roadmap, version, encoding)
+        VALUES (?, ?, ?, ?)
+        ''', (username, stored, version, encoding))
+        roadmap_id = cursor.lastrowid
 
-    cursor.execute('''
-    INSERT INTO roadmaps (username, roadmap)
-    VALUES (?, ?)
-    ''', (username, roadmap_json))
+        insert_roadmap_rows(cursor, roadmap_id, roadmap)
+        # Milestones completed in the previous roadmap stay completed in this one
+        relink_progress(cursor, username, roadmap_id)
+        drop_superseded_rows(cursor, username, roadmap_id)
+        record_roadmap(cursor, username)
 
-    conn.commit()
-    conn.close()
+    publish('roadmap_saved', username=username)
 
-# Get the user's roadmap history
+# Get the user's latest roadmap, with phase and milestone ids
 def get_user_roadmap(username):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    cursor.execute('''
-    SELECT roadmap FROM roadmaps WHERE username = ? ORDER BY created_at DESC LIMIT 1
-    ''', (username,))
-
-    roadmap = cursor.fetchone()
-    conn.close()
-
-    if roadmap:
-        return json.loads(roadmap[0])
-    else:
-        return None
-
-# Save the quiz results
-def save_quiz_results(username, quiz_data, result, score, feedback):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
+    with db_cursor() as cursor:
+        roadmap_id = latest_roadmap_id(cursor, username)
+        if roadmap_id is None:
+            return None
+
+        roadmap = load_roadmap(cursor, roadmap_id)
+        if roadmap is None:
+            # Not a roadmap document, so it has no rows; return it as stored
+            cursor.execute("SELECT version, encoding, roadmap FROM roadmaps WHERE id = ?", (roadmap_id,))
+            version, encoding, stored = cursor.fetchone()
+            if version is None or encoding == FULL:
+                roadmap = decode_roadmap(stored)
+            else:
+                roadmap = load_version(cursor, username, version)
+
+    return roadmap
+
+# Save the quiz results, with the roadmap phase and milestone the quiz was for
+def save_quiz_results(username, quiz_data, result, score, feedback, phase=None, milestone=None):
     quiz_data_json = json.dumps(quiz_data)
     result_json = json.dumps(result)
 
-    cursor.execute('''
-    INSERT INTO quiz_results (username, quiz_data, result, score, feedback)
-    VALUES (?, ?, ?, ?, ?)
-    ''', (username, quiz_data_json, result_json, score, feedback))
+    with transaction() as cursor:
+        cursor.execute('''
+        INSERT INTO quiz_results (username, quiz_data, result, score, feedback, phase, milestone, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', (username, quiz_data_json, result_json, score, feedback, phase, milestone))
+        record_quiz(cursor, username, score)
 
-    conn.commit()
-    conn.close()
+    publish('quiz_results_saved', username=username)
 
-# Track user progress for milestones
+# Track user progress for milestones.
+# Returns True when the milestone was newly recorded as complete.
 def track_user_progress(username, phase, milestone):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    # Check if this milestone is already marked as complete
-    cursor.execute('''
-    SELECT * FROM user_progress WHERE username = ? AND phase = ? AND milestone = ?
-    ''', (username, phase, milestone))
-
-    if not cursor.fetchone():
-        # Insert the new completed milestone into the progress table
+    # A milestone already marked as complete is left untouched
+    with transaction() as cursor:
+        cursor.execute('''
+        INSERT INTO user_progress (username, phase, milestone, milestone_id)
+        VALUES (?, ?, ?, (
+            SELECT m.id FROM milestones m JOIN phases p ON p.id = m.phase_id
+            WHERE m.roadmap_id = (
+                SELECT id FROM roadmaps WHERE username = ? ORDER BY created_at DESC, id DESC LIMIT 1
+            )
+            AND p.name = ? AND m.name = ?
+            ORDER BY m.id LIMIT 1
+        ))
+        ON CONFLICT (username, phase, milestone) DO NOTHING
+        ''', (username, phase, milestone, username, phase, milestone))
+        recorded = cursor.rowcount == 1
+        if recorded:
+            record_milestone(cursor, username)
+
+    if recorded:
+        publish('progress_recorded', username=username, phase=phase, milestone=milestone)
+    return recorded
+
+# Mark a milestone of the user's roadmap complete by its id.
+# Returns True when it was newly recorded, None if the milestone is not the user's.
+def complete_milestone(username, milestone_id):
+    with db_cursor() as cursor:
         cursor.execute('''
-        INSERT INTO user_progress (username, phase, milestone)
-        VALUES (?, ?, ?)
-        ''', (username, phase, milestone))
+        SELECT p.name, m.name FROM milestones m
+        JOIN phases p ON p.id = m.phase_id
+        JOIN roadmaps r ON r.id = m.roadmap_id
+        WHERE m.id = ? AND r.username = ?
+        ''', (milestone_id, username))
 
-        conn.commit()
+        row = cursor.fetchone()
 
-    conn.close()
+    if row is None:
+        return None
+    return track_user_progress(username, row[0], row[1])
 
 # Get the user's progress
 def get_user_progress(username):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
     # Fetch all completed milestones for the user
-    cursor.execute('''
-    SELECT phase, milestone FROM user_progress WHERE username = ?
-    ''', (username,))
+    with db_cursor() as cursor:
+        cursor.execute('''
+        SELECT phase, milestone FROM user_progress WHERE username = ?
+        ''', (username,))
 
-    rows = cursor.fetchall()
-    conn.close()
+        rows = cursor.fetchall()
 
     progress = {}
     for phase, milestone in rows:
@@ -222,4 +190,5 @@ def get_user_progress(username):
             progress[phase] = []
         progress[phase].append(milestone)
 
-    return progress
\ No newline at end of file
+    return progress
+
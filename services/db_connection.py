@@ -0,0 +1,189 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from services.query_profiler import cursor_factory, profile_statement
+
+# Path to the SQLite database file
+db_path = os.path.join('data', 'users.db')
+
+# Pragmas applied to every pooled connection.
+# WAL lets readers keep going while a writer commits, and NORMAL sync is safe under WAL.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",        # ~16 MB page cache per connection
+    "PRAGMA mmap_size = 268435456",      # 256 MB memory-mapped I/O
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA foreign_keys = ON",
+)
+
+# Number of compiled statements sqlite3 keeps per connection, so repeated
+# queries on a pooled connection skip re-preparing their SQL.
+STATEMENT_CACHE_SIZE = 256
+
+POOL_SIZE = 8
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+# Open a new connection with the tuned pragmas
+def open_connection(path):
+    conn = sqlite3.connect(
+        path,
+        timeout=5.0,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class ConnectionPool:
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._held = threading.local()
+        self._closed = False
+
+    def _acquire(self, timeout):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                try:
+                    return open_connection(self.path)
+                except Exception:
+                    self._opened -= 1
+                    raise
+
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No database connection available for {self.path}")
+
+    def _release(self, conn):
+        if self._closed:
+            conn.close()
+            return
+        # Never hand a connection with an open transaction to the next caller
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put_nowait(conn)
+
+    # Borrow a connection for the duration of the block.
+    # Nested use on the same thread reuses the connection already held.
+    @contextmanager
+    def connection(self, timeout=10.0):
+        held = getattr(self._held, 'conn', None)
+        if held is not None:
+            self._held.depth += 1
+            try:
+                yield held
+            finally:
+                self._held.depth -= 1
+            return
+
+        conn = self._acquire(timeout)
+        self._held.conn = conn
+        self._held.depth = 1
+        try:
+            yield conn
+        finally:
+            self._held.conn = None
+            self._held.depth = 0
+            self._release(conn)
+
+    # Track transaction nesting on this thread; returns True for the outermost block
+    def enter_transaction(self):
+        depth = getattr(self._held, 'tx_depth', 0)
+        self._held.tx_depth = depth + 1
+        return depth == 0
+
+    def exit_transaction(self):
+        self._held.tx_depth -= 1
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+
+
+# Get (or lazily create) the pool for a database path
+def get_pool(path=None):
+    path = path or db_path
+    pool = _pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(path)
+            if pool is None:
+                pool = ConnectionPool(path)
+                _pools[path] = pool
+    return pool
+
+
+# Point the service at a different database file (benchmarks, scripts)
+def set_db_path(path):
+    global db_path
+    db_path = path
+
+
+# Close every pooled connection
+def close_all():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+# Cursor for read-only work on a pooled connection
+@contextmanager
+def db_cursor(path=None):
+    pool = get_pool(path)
+    with pool.connection() as conn:
+        cursor = conn.cursor(cursor_factory())
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+
+# Cursor wrapped in a transaction: committed on success, rolled back on error.
+# Only the outermost block commits when transactions are nested.
+# immediate=True takes the write lock up front, for read-then-write blocks.
+@contextmanager
+def transaction(path=None, immediate=False):
+    pool = get_pool(path)
+    with pool.connection() as conn:
+        outermost = pool.enter_transaction()
+        cursor = conn.cursor(cursor_factory())
+        try:
+            if immediate and outermost and not conn.in_transaction:
+                cursor.execute("BEGIN IMMEDIATE")
+            yield cursor
+            if outermost:
+                with profile_statement("COMMIT"):
+                    conn.commit()
+        except BaseException:
+            if outermost:
+                conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            pool.exit_transaction()
@@ -0,0 +1,27 @@
+import logging
+from collections import defaultdict
+
+# Minimal in-process publish/subscribe for database writes.
+# Services publish after their transaction commits; subscribers (prefetchers,
+# caches) react without the service layer having to import them.
+
+_subscribers = defaultdict(list)
+
+
+def subscribe(event, callback):
+    if callback not in _subscribers[event]:
+        _subscribers[event].append(callback)
+
+
+def unsubscribe(event, callback):
+    if callback in _subscribers[event]:
+        _subscribers[event].remove(callback)
+
+
+# A failing subscriber is logged and never breaks the write that triggered it
+def publish(event, **data):
+    for callback in list(_subscribers[event]):
+        try:
+            callback(**data)
+        except Exception:
+            logging.exception("Subscriber %r failed for event %s", callback, event)
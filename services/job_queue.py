@@ -0,0 +1,159 @@
+import json
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from services.db_connection import db_cursor, transaction
+
+# Background job queue backed by the jobs table.
+#
+# Handlers are registered by kind and run on a small worker pool, so slow LLM
+# generations never run on a Streamlit script thread. Jobs submitted with the
+# same dedupe_key while one is still queued or running share that job.
+
+MAX_WORKERS = 2
+FINISHED_JOB_RETENTION = '-1 day'
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobFailed(Exception):
+    pass
+
+
+class JobQueue:
+    def __init__(self, max_workers=MAX_WORKERS, path=None):
+        self.path = path
+        self._handlers = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job-worker')
+
+    # handler(payload, report_progress) -> JSON-serializable result
+    def register(self, kind, handler):
+        self._handlers[kind] = handler
+
+    # Queue a job and return its id, or the id of the identical job already in flight
+    def submit(self, kind, payload, dedupe_key=None):
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+
+        with transaction(self.path, immediate=True) as cursor:
+            if dedupe_key is not None:
+                cursor.execute('''
+                SELECT id FROM jobs WHERE dedupe_key = ? AND status IN (?, ?)
+                ''', (dedupe_key, QUEUED, RUNNING))
+                row = cursor.fetchone()
+                if row:
+                    return row[0]
+
+            job_id = uuid.uuid4().hex
+            cursor.execute('''
+            INSERT INTO jobs (id, kind, dedupe_key, status, payload)
+            VALUES (?, ?, ?, ?, ?)
+            ''', (job_id, kind, dedupe_key, QUEUED, json.dumps(payload)))
+
+        self._executor.submit(self._run, job_id, kind, payload)
+        return job_id
+
+    # Every step, the status transitions included, is inside the try so that a
+    # write failing (e.g. "database is locked") ends the job as failed instead
+    # of leaving it queued or running, where its dedupe key blocks resubmission
+    def _run(self, job_id, kind, payload):
+        def report_progress(progress):
+            with transaction(self.path) as cursor:
+                cursor.execute("UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(progress), job_id))
+
+        try:
+            with transaction(self.path) as cursor:
+                cursor.execute('''
+                UPDATE jobs SET status = ?, started_at = CURRENT_TIMESTAMP WHERE id = ?
+                ''', (RUNNING, job_id))
+
+            result = self._handlers[kind](payload, report_progress)
+
+            with transaction(self.path) as cursor:
+                cursor.execute('''
+                UPDATE jobs SET status = ?, result = ?, finished_at = CURRENT_TIMESTAMP WHERE id = ?
+                ''', (DONE, json.dumps(result), job_id))
+        except Exception as e:
+            logging.exception("Job %s (%s) failed", job_id, kind)
+            with transaction(self.path) as cursor:
+                cursor.execute('''
+                UPDATE jobs SET status = ?, error = ?, finished_at = CURRENT_TIMESTAMP WHERE id = ?
+                ''', (FAILED, f"{type(e).__name__}: {e}", job_id))
+
+    # Current state of a job: status, progress and (when finished) result or error
+    def poll(self, job_id):
+        with db_cursor(self.path) as cursor:
+            cursor.execute('''
+            SELECT kind, status, progress, result, error FROM jobs WHERE id = ?
+            ''', (job_id,))
+            row = cursor.fetchone()
+
+        if row is None:
+            return None
+
+        kind, status, progress, result, error = row
+        return {
+            'id': job_id,
+            'kind': kind,
+            'status': status,
+            'progress': json.loads(progress) if progress else None,
+            'result': json.loads(result) if result else None,
+            'error': error,
+        }
+
+    # Result of a finished job; None while it is still queued or running
+    def result(self, job_id):
+        job = self.poll(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        if job['status'] == FAILED:
+            raise JobFailed(job['error'])
+        if job['status'] != DONE:
+            return None
+        return job['result']
+
+    # Re-run jobs left queued or running by a previous process
+    def recover(self):
+        with transaction(self.path) as cursor:
+            cursor.execute('''
+            SELECT id, kind, payload FROM jobs WHERE status IN (?, ?)
+            ''', (QUEUED, RUNNING))
+            stale = cursor.fetchall()
+            cursor.execute('''
+            UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?
+            ''', (QUEUED, RUNNING))
+
+        for job_id, kind, payload in stale:
+            if kind in self._handlers:
+                self._executor.submit(self._run, job_id, kind, json.loads(payload))
+        return len(stale)
+
+    # Delete finished jobs older than the retention window
+    def prune(self, older_than=FINISHED_JOB_RETENTION):
+        with transaction(self.path) as cursor:
+            cursor.execute('''
+            DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < datetime('now', ?)
+            ''', (DONE, FAILED, older_than))
+            return cursor.rowcount
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+# Process-wide queue shared by every Streamlit session
+def get_job_queue():
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = JobQueue()
+    return _job_queue
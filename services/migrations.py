@@ -0,0 +1,511 @@
+import json
+import logging
+import re
+import sqlite3
+
+from services.db_connection import db_cursor, transaction
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version.
+# Each entry is (version, description, function taking a cursor). Append new
+# migrations at the end; never edit one that has already shipped.
+
+
+def _columns(cursor, table):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cursor.fetchall()}
+
+
+def _add_column_if_missing(cursor, table, column, definition):
+    if column not in _columns(cursor, table):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+# Keep the oldest row for every duplicate key so a UNIQUE index can be built.
+# With a backup_table the others are copied there first and each one is
+# logged; otherwise only their number is. Returns how many rows were dropped.
+def _drop_duplicates(cursor, table, key_columns, backup_table=None):
+    keys = ", ".join(key_columns)
+    duplicates = f"id NOT IN (SELECT MIN(id) FROM {table} GROUP BY {keys})"
+    cursor.execute(f"SELECT id, {keys} FROM {table} WHERE {duplicates} ORDER BY id")
+    rows = cursor.fetchall()
+    if not rows:
+        return 0
+
+    if backup_table:
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {backup_table} AS SELECT * FROM {table} WHERE 0")
+        cursor.execute(f"INSERT INTO {backup_table} SELECT * FROM {table} WHERE {duplicates}")
+        for row_id, *key in rows:
+            logging.warning("Moving duplicate %s row %s %s to %s",
+                            table, row_id, dict(zip(key_columns, key)), backup_table)
+    cursor.execute(f"DELETE FROM {table} WHERE {duplicates}")
+    logging.warning("Dropped %d duplicate %s rows", len(rows), table)
+    return len(rows)
+
+
+# Version 1: the original tables
+def _base_schema(cursor):
+    # Create a table for storing user information
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        password TEXT NOT NULL,
+        role TEXT NOT NULL,                  -- Student or Professional
+        role_specific_field TEXT NOT NULL,   -- Field for student stage or professional job details
+        end_goal TEXT NOT NULL               -- User's end goal
+    )
+    ''')
+
+    # Create a table for storing roadmaps
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS roadmaps (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        roadmap TEXT NOT NULL,               -- JSON format for storing roadmaps
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    # Create a table for storing quiz results
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS quiz_results (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        quiz_data TEXT NOT NULL,             -- JSON format for storing quiz questions and answers
+        result TEXT NOT NULL,                -- User's answers in JSON format
+        score REAL NOT NULL,                 -- User's score
+        feedback TEXT                        -- Feedback for incorrect answers
+    )
+    ''')
+
+    # Create a table for storing progress tracking
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS user_progress (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        phase TEXT NOT NULL,                 -- Phase of the roadmap (e.g., Phase 1)
+        milestone TEXT NOT NULL,             -- Specific milestone the user completed
+        completed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+
+# Version 2: columns the code already writes but the original schema lacked.
+# auth_service.register_user stores current_stage, and quiz attempts need a
+# timestamp to be ordered per user.
+def _missing_columns(cursor):
+    _add_column_if_missing(cursor, 'users', 'current_stage', 'TEXT')
+    _add_column_if_missing(cursor, 'quiz_results', 'created_at', 'DATETIME')
+    cursor.execute("UPDATE quiz_results SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
+
+
+# Version 3: unique usernames and per-user indexes
+def _username_indexes(cursor):
+    # Later accounts with a taken username keep their password hash and profile
+    # in users_duplicates, so they can be restored under another name
+    _drop_duplicates(cursor, 'users', ['username'], backup_table='users_duplicates')
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username ON users (username)")
+
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_roadmaps_username_created
+    ON roadmaps (username, created_at)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_quiz_results_username_created
+    ON quiz_results (username, created_at)
+    ''')
+
+    # One row per completed milestone; track_user_progress upserts against this
+    _drop_duplicates(cursor, 'user_progress', ['username', 'phase', 'milestone'])
+    cursor.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_user_progress_unique
+    ON user_progress (username, phase, milestone)
+    ''')
+
+
+
+# Version 4: background generation jobs (see services/job_queue.py)
+def _jobs_table(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,                  -- Handler name, e.g. roadmap or quiz
+        dedupe_key TEXT,                     -- Identical in-flight requests share this key
+        status TEXT NOT NULL,                -- queued, running, done or failed
+        payload TEXT NOT NULL,               -- JSON arguments for the handler
+        progress TEXT,                       -- JSON partial output reported while running
+        result TEXT,                         -- JSON handler return value
+        error TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        started_at DATETIME,
+        finished_at DATETIME
+    )
+    ''')
+    # At most one queued or running job per dedupe key
+    cursor.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_inflight
+    ON jobs (dedupe_key) WHERE status IN ('queued', 'running')
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_finished ON jobs (status, finished_at)")
+
+
+
+# Version 5: quiz question bank (see services/quiz_bank.py)
+def _quiz_bank_table(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS quiz_bank (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fingerprint TEXT NOT NULL,           -- Hash of role, stage, field of study and end goal
+        phase TEXT NOT NULL,
+        milestone TEXT NOT NULL,             -- Empty string for phase-level quizzes
+        question_hash TEXT NOT NULL,
+        question TEXT NOT NULL,              -- JSON question, options and answer
+        served_count INTEGER NOT NULL DEFAULT 0,
+        last_served_at DATETIME,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (fingerprint, phase, milestone, question_hash)
+    )
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_quiz_bank_rotation
+    ON quiz_bank (fingerprint, phase, milestone, served_count, last_served_at)
+    ''')
+
+
+# Version 6: normalized roadmap rows (see services/roadmap_store.py), with
+# every stored roadmap split up and progress linked to the latest one
+def _normalized_roadmaps(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS phases (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        roadmap_id INTEGER NOT NULL REFERENCES roadmaps (id) ON DELETE CASCADE,
+        position INTEGER NOT NULL,           -- Order within the roadmap, from 0
+        name TEXT NOT NULL,
+        UNIQUE (roadmap_id, position)
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS milestones (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        phase_id INTEGER NOT NULL REFERENCES phases (id) ON DELETE CASCADE,
+        roadmap_id INTEGER NOT NULL REFERENCES roadmaps (id) ON DELETE CASCADE,
+        position INTEGER NOT NULL,           -- Order within the phase, from 0
+        name TEXT NOT NULL,
+        description TEXT NOT NULL DEFAULT '',
+        timeline TEXT NOT NULL DEFAULT '',
+        UNIQUE (phase_id, position)
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_milestones_roadmap ON milestones (roadmap_id)")
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS resources (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        milestone_id INTEGER NOT NULL REFERENCES milestones (id) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        resource TEXT NOT NULL,
+        UNIQUE (milestone_id, position)
+    )
+    ''')
+
+    _add_column_if_missing(
+        cursor, 'user_progress', 'milestone_id', 'INTEGER REFERENCES milestones (id) ON DELETE SET NULL',
+    )
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_user_progress_milestone
+    ON user_progress (username, milestone_id)
+    ''')
+
+    cursor.execute("SELECT id, roadmap FROM roadmaps ORDER BY id")
+    for roadmap_id, document in cursor.fetchall():
+        try:
+            roadmap = json.loads(document)
+            if isinstance(roadmap, str):
+                roadmap = json.loads(roadmap)
+            phases = roadmap['roadmap']['phases']
+        except (ValueError, TypeError, KeyError):
+            continue
+
+        for phase_position, phase in enumerate(phases):
+            cursor.execute(
+                "INSERT INTO phases (roadmap_id, position, name) VALUES (?, ?, ?)",
+                (roadmap_id, phase_position, phase.get('name', '')),
+            )
+            phase_id = cursor.lastrowid
+            for position, milestone in enumerate(phase.get('milestones') or []):
+                cursor.execute('''
+                INSERT INTO milestones (phase_id, roadmap_id, position, name, description, timeline)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ''', (phase_id, roadmap_id, position, milestone.get('name', ''),
+                      milestone.get('description', ''), milestone.get('timeline', '')))
+                milestone_id = cursor.lastrowid
+                cursor.executemany(
+                    "INSERT INTO resources (milestone_id, position, resource) VALUES (?, ?, ?)",
+                    [(milestone_id, i, str(r)) for i, r in enumerate(milestone.get('resources') or [])],
+                )
+
+    cursor.execute('''
+    UPDATE user_progress SET milestone_id = (
+        SELECT m.id FROM milestones m JOIN phases p ON p.id = m.phase_id
+        WHERE m.roadmap_id = (
+            SELECT id FROM roadmaps WHERE username = user_progress.username
+            ORDER BY created_at DESC, id DESC LIMIT 1
+        )
+        AND p.name = user_progress.phase AND m.name = user_progress.milestone
+        ORDER BY m.id LIMIT 1
+    )
+    ''')
+
+
+# Version 7: numbered roadmap versions (see services/roadmap_versions.py).
+# Existing rows stay full documents until compact_roadmaps() re-encodes them.
+def _roadmap_versions(cursor):
+    _add_column_if_missing(cursor, 'roadmaps', 'version', 'INTEGER')
+    _add_column_if_missing(cursor, 'roadmaps', 'encoding', "TEXT NOT NULL DEFAULT 'full'")
+
+    cursor.execute("SELECT id, username FROM roadmaps ORDER BY username, created_at, id")
+    versions = {}
+    numbered = []
+    for roadmap_id, username in cursor.fetchall():
+        versions[username] = versions.get(username, 0) + 1
+        numbered.append((versions[username], roadmap_id))
+    cursor.executemany("UPDATE roadmaps SET version = ? WHERE id = ?", numbered)
+
+    cursor.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_roadmaps_username_version
+    ON roadmaps (username, version)
+    ''')
+
+
+# Version 8: per-user analytics summary (see services/user_summary.py).
+# Rows are built from history the first time each user is read or written.
+def _user_summary_table(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS user_summary (
+        username TEXT PRIMARY KEY,
+        current_streak INTEGER NOT NULL DEFAULT 0,    -- Days in a row ending at last_active_date
+        longest_streak INTEGER NOT NULL DEFAULT 0,
+        last_active_date TEXT,                        -- UTC date of the latest milestone or quiz
+        milestones_completed INTEGER NOT NULL DEFAULT 0,
+        phase_progress TEXT NOT NULL DEFAULT '[]',    -- JSON completion per phase of the latest roadmap
+        quiz_count INTEGER NOT NULL DEFAULT 0,
+        recent_scores TEXT NOT NULL DEFAULT '[]',     -- JSON latest quiz scores, oldest first
+        avg_score REAL,                               -- Average of recent_scores
+        current_phase TEXT,
+        current_milestone TEXT,                       -- First milestone of the latest roadmap not completed
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+
+# Version 9: the roadmap phase and milestone a quiz was taken for, for cohort analytics
+def _quiz_results_phase(cursor):
+    _add_column_if_missing(cursor, 'quiz_results', 'phase', 'TEXT')
+    _add_column_if_missing(cursor, 'quiz_results', 'milestone', 'TEXT')
+
+
+# Version 10: profile embeddings of generated roadmaps, for reuse by similar
+# profiles (see models/roadmap_index.py)
+def _profile_embeddings_table(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS profile_embeddings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fingerprint TEXT NOT NULL,           -- quiz_bank.profile_fingerprint of the profile
+        model TEXT NOT NULL,                 -- Embedding model that produced the vector
+        profile TEXT NOT NULL,               -- JSON role, current_stage, field_of_study, end_goal
+        embedding BLOB NOT NULL,             -- Unit-length float32 vector
+        roadmap TEXT NOT NULL,               -- JSON roadmap generated for the profile
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (fingerprint, model)
+    )
+    ''')
+
+
+# Version 11 keys resources as resource_catalog.parse_resource did when it
+# shipped; a frozen copy, so later changes to the parser do not change what
+# the migration does
+_V11_URL = re.compile(
+    r'(?:https?://|www\.)[^\s<>()\[\]"\']+'
+    r'|\b(?:[a-z0-9-]+\.)+(?:com|org|net|edu|io|dev|ai|co)\b(?:/[^\s<>()\[\]"\']*)?',
+    re.IGNORECASE,
+)
+_V11_SEPARATORS = re.compile(r'\s+[-–—|]\s+')
+_V11_PARENTHESIZED = re.compile(r'^(.+?)\s*\(([^()]+)\)$')
+
+
+def _v11_normalize_url(url):
+    url = re.sub(r'^(?:https?://)?(?:www\.)?', '', url.strip().rstrip('.,;'), flags=re.IGNORECASE)
+    url = url.split('#', 1)[0].rstrip('/')
+    host, _, path = url.partition('/')
+    return host.lower() + (f"/{path}" if path else '')
+
+
+def _v11_parse_resource(text):
+    text = ' '.join(str(text).split())
+    match = _V11_URL.search(text)
+    url = match.group(0).rstrip('.,;') if match else None
+    page = url is not None and '/' in _v11_normalize_url(url)
+    rest = ' '.join((text[:match.start()] + text[match.end():]).split()).strip(' -:|()[]') if page else text
+
+    parts = _V11_SEPARATORS.split(rest, maxsplit=1)
+    title = parts[0].strip(' "\'') or url or text
+    description = parts[1].strip() if len(parts) > 1 else ''
+    match = _V11_PARENTHESIZED.match(title)
+    if match and not description:
+        title, description = match.group(1), match.group(2)
+    if page:
+        key = 'url:' + _v11_normalize_url(url)
+    else:
+        normalized = ' '.join(re.findall(r'[a-z0-9+#]+', re.sub(r'https?://|www\.', '', title.lower())))
+        key = 'title:' + (normalized or text.lower())
+    return key, title, description, url
+
+
+# Version 11: catalog of distinct learning resources with reference counts and
+# a full-text index (see services/resource_catalog.py)
+def _resource_catalog(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS resource_catalog (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        key TEXT NOT NULL UNIQUE,            -- Normalized URL or title
+        title TEXT NOT NULL,
+        description TEXT NOT NULL DEFAULT '',
+        url TEXT,
+        ref_count INTEGER NOT NULL DEFAULT 0, -- resources rows pointing at the entry
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_resource_catalog_refs ON resource_catalog (ref_count)")
+    _add_column_if_missing(
+        cursor, 'resources', 'catalog_id', 'INTEGER REFERENCES resource_catalog (id) ON DELETE SET NULL',
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_resources_catalog ON resources (catalog_id)")
+
+    # Deletes cascaded from superseded roadmaps fire these too
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS resources_catalog_insert AFTER INSERT ON resources
+    WHEN NEW.catalog_id IS NOT NULL BEGIN
+        UPDATE resource_catalog SET ref_count = ref_count + 1 WHERE id = NEW.catalog_id;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS resources_catalog_delete AFTER DELETE ON resources
+    WHEN OLD.catalog_id IS NOT NULL BEGIN
+        UPDATE resource_catalog SET ref_count = ref_count - 1 WHERE id = OLD.catalog_id;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS resources_catalog_update AFTER UPDATE OF catalog_id ON resources BEGIN
+        UPDATE resource_catalog SET ref_count = ref_count - 1 WHERE id = OLD.catalog_id;
+        UPDATE resource_catalog SET ref_count = ref_count + 1 WHERE id = NEW.catalog_id;
+    END
+    ''')
+
+    try:
+        cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS resource_search USING fts5 (
+            title, description, content='resource_catalog', content_rowid='id', tokenize='porter unicode61'
+        )
+        ''')
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5; search_resources falls back to LIKE
+        pass
+    else:
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS resource_catalog_search_insert AFTER INSERT ON resource_catalog BEGIN
+            INSERT INTO resource_search (rowid, title, description) VALUES (NEW.id, NEW.title, NEW.description);
+        END
+        ''')
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS resource_catalog_search_delete AFTER DELETE ON resource_catalog BEGIN
+            INSERT INTO resource_search (resource_search, rowid, title, description)
+            VALUES ('delete', OLD.id, OLD.title, OLD.description);
+        END
+        ''')
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS resource_catalog_search_update AFTER UPDATE OF title, description
+        ON resource_catalog BEGIN
+            INSERT INTO resource_search (resource_search, rowid, title, description)
+            VALUES ('delete', OLD.id, OLD.title, OLD.description);
+            INSERT INTO resource_search (rowid, title, description) VALUES (NEW.id, NEW.title, NEW.description);
+        END
+        ''')
+
+    cursor.execute("SELECT key, id FROM resource_catalog")
+    ids = dict(cursor.fetchall())
+    cursor.execute("SELECT id, resource FROM resources WHERE catalog_id IS NULL ORDER BY id")
+    updates = []
+    for row_id, resource in cursor.fetchall():
+        key, title, description, url = _v11_parse_resource(resource)
+        if key not in ids:
+            cursor.execute('''
+            INSERT INTO resource_catalog (key, title, description, url) VALUES (?, ?, ?, ?)
+            ''', (key, title, description, url))
+            ids[key] = cursor.lastrowid
+        updates.append((ids[key], row_id))
+    cursor.executemany("UPDATE resources SET catalog_id = ? WHERE id = ?", updates)
+
+
+# Version 12: where in the archive the payload of an old quiz attempt or
+# roadmap version is (see services/archive.py)
+def _archive_partitions(cursor):
+    for table in ('quiz_results', 'roadmaps'):
+        _add_column_if_missing(cursor, table, 'archive_partition', 'TEXT')  # Month, e.g. 2025-03
+        _add_column_if_missing(cursor, table, 'archive_offset', 'INTEGER')  # Byte offset of the gzip member
+
+
+MIGRATIONS = [
+    (1, "base schema", _base_schema),
+    (2, "users.current_stage and quiz_results.created_at", _missing_columns),
+    (3, "unique usernames and username indexes", _username_indexes),
+    (4, "background generation jobs", _jobs_table),
+    (5, "quiz question bank", _quiz_bank_table),
+    (6, "normalized phases, milestones and resources", _normalized_roadmaps),
+    (7, "numbered roadmap versions", _roadmap_versions),
+    (8, "per-user analytics summary", _user_summary_table),
+    (9, "quiz_results.phase and quiz_results.milestone", _quiz_results_phase),
+    (10, "profile embeddings for roadmap reuse", _profile_embeddings_table),
+    (11, "resource catalog and full-text search", _resource_catalog),
+    (12, "archive partitions of quiz attempts and roadmap versions", _archive_partitions),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+# Current schema version of the database
+def get_schema_version(path=None):
+    with db_cursor(path) as cursor:
+        cursor.execute("PRAGMA user_version")
+        return cursor.fetchone()[0]
+
+
+# Bring the database up to the latest schema version in place.
+# Each migration runs in its own write transaction together with the version bump,
+# so an interrupted run resumes at the first migration that did not commit.
+def migrate(path=None, target=None):
+    target = SCHEMA_VERSION if target is None else target
+    applied = []
+
+    # Reading the version needs no lock; an up-to-date database, the case on
+    # every Streamlit rerun, never waits for or takes the write lock
+    current = get_schema_version(path)
+    if current >= target:
+        return applied
+
+    for version, description, apply in MIGRATIONS:
+        if version > target:
+            break
+        if version <= current:
+            continue
+
+        # Take the write lock before reading the version so concurrent
+        # processes starting up do not apply the same migration twice
+        with transaction(path, immediate=True) as cursor:
+            cursor.execute("PRAGMA user_version")
+            if cursor.fetchone()[0] >= version:
+                continue
+
+            apply(cursor)
+            cursor.execute(f"PRAGMA user_version = {version}")
+            applied.append((version, description))
+
+    return applied
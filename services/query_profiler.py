@@ -0,0 +1,389 @@
+import atexit
+import contextlib
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Profiler for every statement run through the connection pool.
+#
+# db_cursor() and transaction() hand out ProfiledCursor, which times each
+# execute (and the fetches that follow it) and files it under its call site,
+# the first function outside the database plumbing ("services.database_service.
+# get_user_profile"), and its SQL. Work done inside query_scope(user, page),
+# which app.py opens around every Streamlit rerun, is also counted per rerun
+# and per user; statements outside any scope (background jobs, start-up)
+# are counted as background.
+#
+# Statements slower than MAYOGA_SLOW_QUERY_MS are logged with their EXPLAIN
+# QUERY PLAN to MAYOGA_SLOW_QUERY_LOG (default slow_queries.log next to
+# users.db) through a QueueHandler, so the query thread never waits on the
+# file. summary() feeds the admin page; export_json(), which leaves out
+# usernames, the dashboards.
+# MAYOGA_SQL_PROFILE=0 turns profiling off.
+
+PROFILE_ENABLED = os.environ.get('MAYOGA_SQL_PROFILE', '1') != '0'
+SLOW_QUERY_MS = float(os.environ.get('MAYOGA_SLOW_QUERY_MS', 100))
+SLOW_QUERY_LOG = os.environ.get('MAYOGA_SLOW_QUERY_LOG')
+RECENT_SLOW_QUERIES = 50
+TOP_USERS = 20
+PLAN_CACHE_SIZE = 256
+SQL_PREVIEW_CHARS = 300
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+# Frames in these files are plumbing, not call sites
+_PLUMBING_FILES = {
+    os.path.abspath(__file__),
+    os.path.abspath(os.path.join(os.path.dirname(__file__), 'db_connection.py')),
+    os.path.abspath(contextlib.__file__),
+}
+_plumbing = {}
+
+
+def _is_plumbing(filename):
+    plumbing = _plumbing.get(filename)
+    if plumbing is None:
+        plumbing = _plumbing[filename] = os.path.abspath(filename) in _PLUMBING_FILES
+    return plumbing
+
+
+def _call_site():
+    frame = sys._getframe(2)
+    while frame is not None:
+        if not _is_plumbing(frame.f_code.co_filename):
+            return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return '?'
+
+
+def _normalize_sql(sql):
+    return ' '.join(sql.split())
+
+
+class StatementStats:
+    def __init__(self, site, sql):
+        self.site = site
+        self.sql = sql
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.slow = 0
+
+    def row(self):
+        return {
+            'site': self.site,
+            'sql': self.sql[:SQL_PREVIEW_CHARS],
+            'calls': self.calls,
+            'total_ms': self.seconds * 1000,
+            'avg_ms': self.seconds * 1000 / self.calls if self.calls else 0.0,
+            'max_ms': self.max_seconds * 1000,
+            'slow': self.slow,
+        }
+
+
+class ScopeStats:
+    def __init__(self):
+        self.count = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.seconds = 0.0
+
+
+# The statements and time of one rerun (or any other unit of work)
+class QueryScope:
+    def __init__(self, user=None, page=None):
+        self.user = user
+        self.page = page
+        self.queries = 0
+        self.seconds = 0.0
+
+
+_scope = contextvars.ContextVar('query_scope', default=None)
+
+
+class QueryProfiler:
+    def __init__(self, slow_query_ms=SLOW_QUERY_MS):
+        self.slow_seconds = slow_query_ms / 1000
+        self._statements = {}
+        self._pages = {}
+        self._users = {}
+        self._background = 0
+        self._slow = deque(maxlen=RECENT_SLOW_QUERIES)
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+        self._logger = None
+
+    def _stats(self, site, sql):
+        key = (site, sql)
+        stats = self._statements.get(key)
+        if stats is None:
+            stats = self._statements[key] = StatementStats(site, _normalize_sql(sql))
+        return stats
+
+    # One statement finished executing; returns its stats for the fetches that follow
+    def record(self, site, sql, seconds):
+        scope = _scope.get()
+        with self._lock:
+            stats = self._stats(site, sql)
+            stats.calls += 1
+            stats.seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            if scope is None:
+                self._background += 1
+        if scope is not None:
+            scope.queries += 1
+            scope.seconds += seconds
+        return stats
+
+    # Fetching rows of a statement already recorded
+    def record_fetch(self, stats, seconds, total_seconds):
+        scope = _scope.get()
+        with self._lock:
+            stats.seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, total_seconds)
+        if scope is not None:
+            scope.seconds += seconds
+
+    def record_scope(self, scope):
+        with self._lock:
+            page = self._pages.setdefault(scope.page or '(none)', ScopeStats())
+            page.count += 1
+            page.queries += scope.queries
+            page.max_queries = max(page.max_queries, scope.queries)
+            page.seconds += scope.seconds
+            if scope.user:
+                self._users[scope.user] = self._users.get(scope.user, 0) + scope.queries
+
+    def _plan(self, connection, sql, parameters):
+        with self._lock:
+            plan = self._plans.get(sql)
+        if plan is not None:
+            return plan
+        if connection is None or not sql.lstrip().upper().startswith(EXPLAINABLE):
+            return None
+        try:
+            # A plain connection cursor, so the EXPLAIN itself is not profiled
+            rows = connection.execute("EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+        except sqlite3.Error as e:
+            return f"(no plan: {e})"
+        plan = "; ".join(row[3] for row in rows) or None
+        with self._lock:
+            self._plans[sql] = plan
+            while len(self._plans) > PLAN_CACHE_SIZE:
+                self._plans.popitem(last=False)
+        return plan
+
+    def slow_query(self, stats, connection, sql, parameters, seconds):
+        plan = self._plan(connection, sql, parameters)
+        scope = _scope.get()
+        entry = {
+            'at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'ms': seconds * 1000,
+            'site': stats.site,
+            'sql': stats.sql[:SQL_PREVIEW_CHARS],
+            'plan': plan,
+            'user': scope.user if scope is not None else None,
+        }
+        with self._lock:
+            stats.slow += 1
+            self._slow.append(entry)
+        slow_query_logger().warning(
+            "Slow query %.1f ms at %s: %s | plan: %s", entry['ms'], entry['site'], entry['sql'], plan,
+        )
+
+    # users=False leaves out usernames (per-user counts and the user of each slow query)
+    def summary(self, limit=50, users=True):
+        with self._lock:
+            statements = sorted(self._statements.values(), key=lambda s: s.seconds, reverse=True)
+            pages = sorted(self._pages.items())
+            top_users = sorted(self._users.items(), key=lambda item: item[1], reverse=True)[:TOP_USERS]
+            slow = list(self._slow)
+            rows = [s.row() for s in statements[:limit]]
+            total_calls = sum(s.calls for s in statements)
+            total_seconds = sum(s.seconds for s in statements)
+            background = self._background
+
+        return {
+            'enabled': PROFILE_ENABLED,
+            'slow_query_ms': self.slow_seconds * 1000,
+            'queries': total_calls,
+            'total_ms': total_seconds * 1000,
+            'background_queries': background,
+            'statements': rows,
+            'reruns': [
+                {
+                    'page': page,
+                    'reruns': s.count,
+                    'avg_queries': s.queries / s.count if s.count else 0.0,
+                    'max_queries': s.max_queries,
+                    'avg_ms': s.seconds * 1000 / s.count if s.count else 0.0,
+                }
+                for page, s in pages
+            ],
+            'users': [{'user': user, 'queries': n} for user, n in top_users] if users else [],
+            'slow_queries': [
+                entry if users else {k: v for k, v in entry.items() if k != 'user'} for entry in slow[::-1]
+            ],
+        }
+
+    # Calls, seconds and slow statements per call site
+    def sites(self):
+        with self._lock:
+            sites = {}
+            for stats in self._statements.values():
+                site = sites.setdefault(stats.site, [0, 0.0, 0])
+                site[0] += stats.calls
+                site[1] += stats.seconds
+                site[2] += stats.slow
+        return sites
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._pages.clear()
+            self._users.clear()
+            self._background = 0
+            self._slow.clear()
+
+
+profiler = QueryProfiler()
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    _stats = None
+    _sql = None
+    _parameters = ()
+    _seconds = 0.0
+
+    def _executed(self, sql, parameters, seconds):
+        self._stats = profiler.record(_call_site(), sql, seconds)
+        self._sql, self._parameters, self._seconds = sql, parameters, seconds
+        if seconds >= profiler.slow_seconds:
+            profiler.slow_query(self._stats, self.connection, sql, parameters, seconds)
+            self._sql = None
+
+    def _fetched(self, seconds, check_slow=False):
+        if self._stats is None:
+            return
+        before = self._seconds
+        self._seconds += seconds
+        profiler.record_fetch(self._stats, seconds, self._seconds)
+        # Log a statement once, when its execute and fetches cross the threshold
+        if check_slow and self._sql is not None and before < profiler.slow_seconds <= self._seconds:
+            profiler.slow_query(self._stats, self.connection, self._sql, self._parameters, self._seconds)
+            self._sql = None
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._executed(sql, parameters, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        first = seq_of_parameters[0] if isinstance(seq_of_parameters, (list, tuple)) and seq_of_parameters else ()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._executed(sql, first, time.perf_counter() - started)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(time.perf_counter() - started)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(time.perf_counter() - started)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(time.perf_counter() - started, check_slow=True)
+        return rows
+
+
+# Cursor class for pooled connections
+def cursor_factory():
+    return ProfiledCursor if PROFILE_ENABLED else sqlite3.Cursor
+
+
+# Time a statement run without a cursor, such as a commit
+@contextlib.contextmanager
+def profile_statement(sql):
+    if not PROFILE_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        stats = profiler.record(_call_site(), sql, seconds)
+        if seconds >= profiler.slow_seconds:
+            profiler.slow_query(stats, None, sql, (), seconds)
+
+
+# Count the statements run inside the block towards one rerun of page by user
+@contextlib.contextmanager
+def query_scope(user=None, page=None):
+    scope = QueryScope(user, page)
+    if not PROFILE_ENABLED:
+        yield scope
+        return
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+        profiler.record_scope(scope)
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+# Logger for slow queries; records go through a queue to a file handler on
+# its own thread
+def slow_query_logger():
+    global _listener
+    logger = logging.getLogger('mayoga.sql')
+    if _listener is None:
+        with _listener_lock:
+            if _listener is None:
+                from services import db_connection
+                path = SLOW_QUERY_LOG or os.path.join(
+                    os.path.dirname(db_connection.db_path) or '.', 'slow_queries.log',
+                )
+                os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                handler = logging.handlers.RotatingFileHandler(path, maxBytes=10 * 2**20, backupCount=3)
+                handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+                records = queue.SimpleQueue()
+                logger.addHandler(logging.handlers.QueueHandler(records))
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                listener = logging.handlers.QueueListener(records, handler)
+                listener.start()
+                atexit.register(listener.stop)
+                _listener = listener
+    return logger
+
+
+# The summary for dashboards, without usernames (those stay on the admin page)
+def export_json(path=None):
+    text = json.dumps(profiler.summary(users=False), indent=2)
+    if path is not None:
+        with open(path, 'w') as f:
+            f.write(text)
+    return text
@@ -0,0 +1,69 @@
+import hashlib
+import json
+import random
+
+from services.db_connection import db_cursor, transaction
+
+# Reusable bank of quiz questions per roadmap phase/milestone and learner profile.
+# Every generated quiz adds its questions here; "Take Quiz" draws the
+# least-served questions, so repeated attempts rotate through the bank.
+
+QUIZ_LENGTH = 10
+BANK_TARGET_QUESTIONS = 30
+
+
+# Learners with the same profile share a bank; the username is not part of it
+def profile_fingerprint(role, current_stage, field_of_study, end_goal):
+    raw = json.dumps([role, current_stage, field_of_study, end_goal])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _question_hash(question):
+    return hashlib.sha256(json.dumps(question, sort_keys=True).encode()).hexdigest()
+
+
+# Add questions to the bank, skipping ones it already holds; returns how many were new
+def add_questions(fingerprint, phase, milestone, questions):
+    rows = [
+        (fingerprint, phase, milestone or '', _question_hash(q), json.dumps(q))
+        for q in questions
+    ]
+    with transaction() as cursor:
+        cursor.executemany('''
+        INSERT INTO quiz_bank (fingerprint, phase, milestone, question_hash, question)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (fingerprint, phase, milestone, question_hash) DO NOTHING
+        ''', rows)
+        return cursor.rowcount
+
+
+def bank_size(fingerprint, phase, milestone):
+    with db_cursor() as cursor:
+        cursor.execute('''
+        SELECT COUNT(*) FROM quiz_bank WHERE fingerprint = ? AND phase = ? AND milestone = ?
+        ''', (fingerprint, phase, milestone or ''))
+        return cursor.fetchone()[0]
+
+
+# Draw a quiz of the least-served questions and mark them as served.
+# Returns None when the bank cannot fill a whole quiz yet.
+def draw_quiz(fingerprint, phase, milestone, count=QUIZ_LENGTH):
+    with transaction(immediate=True) as cursor:
+        cursor.execute('''
+        SELECT id, question FROM quiz_bank
+        WHERE fingerprint = ? AND phase = ? AND milestone = ?
+        ORDER BY served_count, last_served_at, RANDOM()
+        LIMIT ?
+        ''', (fingerprint, phase, milestone or '', count))
+        rows = cursor.fetchall()
+        if len(rows) < count:
+            return None
+
+        cursor.executemany('''
+        UPDATE quiz_bank SET served_count = served_count + 1, last_served_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+        ''', [(row[0],) for row in rows])
+
+    questions = [json.loads(row[1]) for row in rows]
+    random.shuffle(questions)
+    return questions
@@ -0,0 +1,183 @@
+import re
+
+from services.db_connection import db_cursor
+
+# Catalog of the learning resources named in roadmaps, one row per distinct
+# resource however it is worded.
+#
+# Every resources row (a resource of a milestone of a user's latest roadmap)
+# points at its resource_catalog entry through catalog_id. The entry's key is
+# the normalized URL when the text links a page, otherwise the normalized
+# title (the text before " - " or a trailing parenthesis), so "Machine
+# Learning by Andrew Ng (Coursera)" and "machine learning by andrew ng" are
+# one entry. Triggers keep ref_count equal to the number of resources rows
+# pointing at an entry (superseded roadmaps drop their rows) and keep the
+# resource_search FTS5 index of titles and descriptions in sync. Without
+# FTS5 in the SQLite build, search falls back to LIKE.
+
+URL_PATTERN = re.compile(
+    r'(?:https?://|www\.)[^\s<>()\[\]"\']+'
+    r'|\b(?:[a-z0-9-]+\.)+(?:com|org|net|edu|io|dev|ai|co)\b(?:/[^\s<>()\[\]"\']*)?',
+    re.IGNORECASE,
+)
+TITLE_SEPARATORS = re.compile(r'\s+[-–—|]\s+')
+PARENTHESIZED = re.compile(r'^(.+?)\s*\(([^()]+)\)$')
+SEARCH_LIMIT = 20
+KEY_BATCH = 500
+
+
+def _normalize_url(url):
+    url = re.sub(r'^(?:https?://)?(?:www\.)?', '', url.strip().rstrip('.,;'), flags=re.IGNORECASE)
+    url = url.split('#', 1)[0].rstrip('/')
+    host, _, path = url.partition('/')
+    return host.lower() + (f"/{path}" if path else '')
+
+
+def _normalize_title(title):
+    title = re.sub(r'https?://|www\.', '', title.lower())
+    return ' '.join(re.findall(r'[a-z0-9+#]+', title))
+
+
+# {'key', 'title', 'description', 'url'} for a resource as written in a roadmap
+def parse_resource(text):
+    text = ' '.join(str(text).split())
+    match = URL_PATTERN.search(text)
+    url = match.group(0).rstrip('.,;') if match else None
+    # A bare site ("coursera.org") names many resources; only a page identifies one
+    page = url is not None and '/' in _normalize_url(url)
+    rest = ' '.join((text[:match.start()] + text[match.end():]).split()).strip(' -:|()[]') if page else text
+
+    parts = TITLE_SEPARATORS.split(rest, maxsplit=1)
+    title = parts[0].strip(' "\'') or url or text
+    description = parts[1].strip() if len(parts) > 1 else ''
+    # "Title (Publisher)" reads like "Title - Publisher"
+    match = PARENTHESIZED.match(title)
+    if match and not description:
+        title, description = match.group(1), match.group(2)
+    key = 'url:' + _normalize_url(url) if page else 'title:' + (_normalize_title(title) or text.lower())
+    return {'key': key, 'title': title, 'description': description, 'url': url}
+
+
+# Catalog ids for resource texts, in order, adding entries for the ones not
+# cataloged yet. Runs in the caller's write transaction.
+def catalog_ids(cursor, texts):
+    parsed = [parse_resource(text) for text in texts]
+    keys = list(dict.fromkeys(p['key'] for p in parsed))
+    ids = {}
+    for start in range(0, len(keys), KEY_BATCH):
+        batch = keys[start:start + KEY_BATCH]
+        cursor.execute(f'''
+        SELECT key, id FROM resource_catalog WHERE key IN ({", ".join("?" * len(batch))})
+        ''', batch)
+        ids.update(cursor.fetchall())
+
+    for entry in parsed:
+        if entry['key'] not in ids:
+            cursor.execute('''
+            INSERT INTO resource_catalog (key, title, description, url) VALUES (?, ?, ?, ?)
+            ''', (entry['key'], entry['title'], entry['description'], entry['url']))
+            ids[entry['key']] = cursor.lastrowid
+    return [ids[p['key']] for p in parsed]
+
+
+def _has_fts(cursor):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'resource_search'")
+    return cursor.fetchone() is not None
+
+
+# FTS5 query matching all words of free text, the last one as a prefix
+def _match_query(query):
+    words = re.findall(r'\w+', query.lower())
+    if not words:
+        return None
+    return ' '.join(f'"{w}"' for w in words[:-1]) + (' ' if len(words) > 1 else '') + f'"{words[-1]}"*'
+
+
+def _entry(row):
+    return {
+        'id': row[0],
+        'title': row[1],
+        'description': row[2],
+        'url': row[3],
+        'references': row[4],
+    }
+
+
+# Catalog entries in use matching the words of query, best match first
+# (BM25 with titles weighted over descriptions, then most referenced)
+def search_resources(query, limit=SEARCH_LIMIT):
+    match = _match_query(query)
+    if match is None:
+        return []
+
+    with db_cursor() as cursor:
+        if _has_fts(cursor):
+            cursor.execute('''
+            SELECT c.id, c.title, c.description, c.url, c.ref_count
+            FROM resource_search s
+            JOIN resource_catalog c ON c.id = s.rowid
+            WHERE resource_search MATCH ? AND c.ref_count > 0
+            ORDER BY bm25(resource_search, 10.0, 1.0), c.ref_count DESC
+            LIMIT ?
+            ''', (match, limit))
+        else:
+            words = re.findall(r'\w+', query.lower())
+            conditions = " AND ".join("(c.title || ' ' || c.description) LIKE ?" for _ in words)
+            cursor.execute(f'''
+            SELECT c.id, c.title, c.description, c.url, c.ref_count
+            FROM resource_catalog c
+            WHERE {conditions} AND c.ref_count > 0
+            ORDER BY c.ref_count DESC
+            LIMIT ?
+            ''', [f"%{w}%" for w in words] + [limit])
+        return [_entry(row) for row in cursor.fetchall()]
+
+
+def get_resource(catalog_id):
+    with db_cursor() as cursor:
+        cursor.execute('''
+        SELECT id, title, description, url, ref_count FROM resource_catalog WHERE id = ?
+        ''', (catalog_id,))
+        row = cursor.fetchone()
+    return _entry(row) if row else None
+
+
+# The milestones of current roadmaps that use a catalog entry
+def resource_milestones(catalog_id, limit=None):
+    with db_cursor() as cursor:
+        cursor.execute('''
+        SELECT m.id, m.name, p.name, r.username
+        FROM resources res
+        JOIN milestones m ON m.id = res.milestone_id
+        JOIN phases p ON p.id = m.phase_id
+        JOIN roadmaps r ON r.id = m.roadmap_id
+        WHERE res.catalog_id = ?
+        ORDER BY m.id
+        LIMIT ?
+        ''', (catalog_id, -1 if limit is None else limit))
+        return [
+            {'milestone_id': milestone_id, 'milestone': milestone, 'phase': phase, 'username': username}
+            for milestone_id, milestone, phase, username in cursor.fetchall()
+        ]
+
+
+# The most referenced catalog entries
+def top_resources(limit=SEARCH_LIMIT):
+    with db_cursor() as cursor:
+        cursor.execute('''
+        SELECT id, title, description, url, ref_count FROM resource_catalog
+        WHERE ref_count > 0
+        ORDER BY ref_count DESC, id
+        LIMIT ?
+        ''', (limit,))
+        return [_entry(row) for row in cursor.fetchall()]
+
+
+def catalog_stats():
+    with db_cursor() as cursor:
+        cursor.execute("SELECT COUNT(*), COUNT(CASE WHEN ref_count > 0 THEN 1 END) FROM resource_catalog")
+        entries, in_use = cursor.fetchone()
+        cursor.execute("SELECT COUNT(*) FROM resources")
+        references = cursor.fetchone()[0]
+        fts = _has_fts(cursor)
+    return {'entries': entries, 'in_use': in_use, 'references': references, 'full_text_search': fts}
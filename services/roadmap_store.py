@@ -0,0 +1,253 @@
+import json
+
+from services.db_connection import db_cursor, transaction
+from services.events import publish
+from services.resource_catalog import catalog_ids
+
+# Normalized roadmap storage: every saved roadmap is split into phases,
+# milestones and resources rows with stable integer ids.
+#
+# roadmaps.roadmap keeps the version history as it was generated (see
+# services/roadmap_versions.py); these rows are the live copy of the latest
+# roadmap that get_user_roadmap reads and that single milestones are edited
+# in. user_progress.milestone_id points at the milestone of the user's latest
+# roadmap, so completion is one indexed aggregate instead of a JSON walk, and
+# every resources row points at its entry in services/resource_catalog.py.
+
+MILESTONE_FIELDS = ('name', 'description', 'timeline')
+
+
+# The roadmap as a dict, whether given as a dict, JSON text or the JSON text
+# encoded a second time (older rows)
+def decode_roadmap(roadmap):
+    while isinstance(roadmap, str):
+        roadmap = json.loads(roadmap)
+    return roadmap
+
+
+def _phases(roadmap):
+    try:
+        phases = decode_roadmap(roadmap)['roadmap']['phases']
+    except (ValueError, TypeError, KeyError):
+        return []
+    return phases if isinstance(phases, list) else []
+
+
+# Insert the rows for roadmaps.id = roadmap_id; documents without phases get none.
+# Resources are cataloged in one batch for the whole roadmap.
+def insert_roadmap_rows(cursor, roadmap_id, roadmap):
+    phases = _phases(roadmap)
+    texts = [
+        str(resource)
+        for phase in phases for milestone in phase.get('milestones') or []
+        for resource in milestone.get('resources') or []
+    ]
+    ids = iter(catalog_ids(cursor, texts))
+
+    for phase_position, phase in enumerate(phases):
+        cursor.execute('''
+        INSERT INTO phases (roadmap_id, position, name) VALUES (?, ?, ?)
+        ''', (roadmap_id, phase_position, phase.get('name', '')))
+        phase_id = cursor.lastrowid
+
+        for position, milestone in enumerate(phase.get('milestones') or []):
+            cursor.execute('''
+            INSERT INTO milestones (phase_id, roadmap_id, position, name, description, timeline)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''', (phase_id, roadmap_id, position, milestone.get('name', ''),
+                  milestone.get('description', ''), milestone.get('timeline', '')))
+            milestone_id = cursor.lastrowid
+
+            cursor.executemany('''
+            INSERT INTO resources (milestone_id, position, resource, catalog_id) VALUES (?, ?, ?, ?)
+            ''', [
+                (milestone_id, i, str(resource), next(ids))
+                for i, resource in enumerate(milestone.get('resources') or [])
+            ])
+
+
+# Point the user's progress rows at the milestones of roadmap_id with the same
+# phase and milestone names; rows with no match keep their old milestone
+def relink_progress(cursor, username, roadmap_id):
+    cursor.execute('''
+    UPDATE user_progress SET milestone_id = COALESCE((
+        SELECT m.id FROM milestones m JOIN phases p ON p.id = m.phase_id
+        WHERE m.roadmap_id = ? AND p.name = user_progress.phase AND m.name = user_progress.milestone
+        ORDER BY m.id LIMIT 1
+    ), milestone_id)
+    WHERE username = ?
+    ''', (roadmap_id, username))
+
+
+# Only the latest roadmap keeps its rows; drop the ones of the user's older versions
+def drop_superseded_rows(cursor, username, roadmap_id):
+    cursor.execute('''
+    DELETE FROM phases WHERE roadmap_id IN (
+        SELECT id FROM roadmaps WHERE username = ? AND id != ?
+    )
+    ''', (username, roadmap_id))
+
+
+def latest_roadmap_id(cursor, username):
+    cursor.execute('''
+    SELECT id FROM roadmaps WHERE username = ? ORDER BY created_at DESC, id DESC LIMIT 1
+    ''', (username,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+# Rebuild the roadmap document from its rows, with phase and milestone ids.
+# None when the roadmap has no rows.
+def load_roadmap(cursor, roadmap_id):
+    cursor.execute('''
+    SELECT p.id, p.name, m.id, m.name, m.description, m.timeline, r.resource
+    FROM phases p
+    LEFT JOIN milestones m ON m.phase_id = p.id
+    LEFT JOIN resources r ON r.milestone_id = m.id
+    WHERE p.roadmap_id = ?
+    ORDER BY p.position, m.position, r.position
+    ''', (roadmap_id,))
+
+    phases = []
+    for phase_id, phase_name, milestone_id, name, description, timeline, resource in cursor.fetchall():
+        if not phases or phases[-1]['id'] != phase_id:
+            phases.append({'id': phase_id, 'name': phase_name, 'milestones': []})
+        milestones = phases[-1]['milestones']
+        if milestone_id is None:
+            continue
+        if not milestones or milestones[-1]['id'] != milestone_id:
+            milestones.append({
+                'id': milestone_id, 'name': name, 'description': description,
+                'timeline': timeline, 'resources': [],
+            })
+        if resource is not None:
+            milestones[-1]['resources'].append(resource)
+
+    return {'roadmap': {'phases': phases}} if phases else None
+
+
+def _milestone(cursor, milestone_id):
+    cursor.execute('''
+    SELECT m.id, m.name, m.description, m.timeline, p.id, p.name, r.username
+    FROM milestones m
+    JOIN phases p ON p.id = m.phase_id
+    JOIN roadmaps r ON r.id = m.roadmap_id
+    WHERE m.id = ?
+    ''', (milestone_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+
+    cursor.execute('''
+    SELECT resource FROM resources WHERE milestone_id = ? ORDER BY position
+    ''', (milestone_id,))
+    return {
+        'id': row[0],
+        'name': row[1],
+        'description': row[2],
+        'timeline': row[3],
+        'resources': [r[0] for r in cursor.fetchall()],
+        'phase_id': row[4],
+        'phase': row[5],
+        'username': row[6],
+    }
+
+
+# One milestone with its resources, phase and owner; None if it does not exist
+def get_milestone(milestone_id):
+    with db_cursor() as cursor:
+        return _milestone(cursor, milestone_id)
+
+
+# Change the given fields of one milestone in place; resources replaces the list.
+# Returns the updated milestone, or None if it does not exist.
+def update_milestone(milestone_id, resources=None, **fields):
+    unknown = set(fields) - set(MILESTONE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown milestone fields: {', '.join(sorted(unknown))}")
+
+    with transaction() as cursor:
+        if fields:
+            assignments = ", ".join(f"{name} = ?" for name in fields)
+            cursor.execute(f"UPDATE milestones SET {assignments} WHERE id = ?", (*fields.values(), milestone_id))
+            if cursor.rowcount == 0:
+                return None
+        if resources is not None:
+            cursor.execute("DELETE FROM resources WHERE milestone_id = ?", (milestone_id,))
+            resources = [str(resource) for resource in resources]
+            cursor.executemany('''
+            INSERT INTO resources (milestone_id, position, resource, catalog_id) VALUES (?, ?, ?, ?)
+            ''', [
+                (milestone_id, i, resource, catalog_id)
+                for i, (resource, catalog_id) in enumerate(zip(resources, catalog_ids(cursor, resources)))
+            ])
+        milestone = _milestone(cursor, milestone_id)
+        if milestone is not None and 'name' in fields:
+            # Imported here because user_summary builds on this module
+            from services.user_summary import record_roadmap
+            record_roadmap(cursor, milestone['username'])
+
+    if milestone is not None:
+        publish('roadmap_saved', username=milestone['username'])
+    return milestone
+
+
+# Milestones and completed milestones per phase of the user's latest roadmap, in one aggregate
+def completion_rows(cursor, username):
+    cursor.execute('''
+    SELECT p.id, p.name, COUNT(m.id), COUNT(up.id)
+    FROM phases p
+    JOIN milestones m ON m.phase_id = p.id
+    LEFT JOIN user_progress up ON up.username = ? AND up.milestone_id = m.id
+    WHERE p.roadmap_id = (
+        SELECT id FROM roadmaps WHERE username = ? ORDER BY created_at DESC, id DESC LIMIT 1
+    )
+    GROUP BY p.id
+    ORDER BY p.position
+    ''', (username, username))
+
+    return [
+        {
+            'phase_id': phase_id,
+            'phase': name,
+            'milestones': total,
+            'completed': completed,
+            'percent': 100.0 * completed / total if total else 0.0,
+        }
+        for phase_id, name, total, completed in cursor.fetchall()
+    ]
+
+
+# First (phase, milestone) of the user's latest roadmap not completed yet, or None
+def next_milestone(cursor, username):
+    cursor.execute('''
+    SELECT p.name, m.name
+    FROM phases p
+    JOIN milestones m ON m.phase_id = p.id
+    WHERE p.roadmap_id = (
+        SELECT id FROM roadmaps WHERE username = ? ORDER BY created_at DESC, id DESC LIMIT 1
+    )
+    AND NOT EXISTS (
+        SELECT 1 FROM user_progress up WHERE up.username = ? AND up.milestone_id = m.id
+    )
+    ORDER BY p.position, m.position
+    LIMIT 1
+    ''', (username, username))
+
+    row = cursor.fetchone()
+    return (row[0], row[1]) if row else None
+
+
+# Completion of the user's latest roadmap, per phase and overall
+def get_roadmap_completion(username):
+    with db_cursor() as cursor:
+        phases = completion_rows(cursor, username)
+
+    total = sum(p['milestones'] for p in phases)
+    completed = sum(p['completed'] for p in phases)
+    return {
+        'phases': phases,
+        'milestones': total,
+        'completed': completed,
+        'percent': 100.0 * completed / total if total else 0.0,
+    }
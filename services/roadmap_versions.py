@@ -0,0 +1,292 @@
+import copy
+import json
+import threading
+
+from services.db_connection import db_cursor, transaction
+from services.archive import payload_value
+from services.job_queue import get_job_queue
+from services.roadmap_store import decode_roadmap, drop_superseded_rows
+
+# Roadmap version history, delta-encoded.
+#
+# Every save_user_roadmap adds a numbered version to the roadmaps table. A
+# version SNAPSHOT_INTERVAL versions after the last snapshot is stored in full
+# ('full'); the ones between store a JSON-patch style list of operations
+# against the previous version ('delta'), so reading any version applies
+# fewer than SNAPSHOT_INTERVAL patches to a snapshot. Snapshots are placed by
+# distance from the previous one rather than by version number, so they stay
+# evenly spaced after compaction re-encodes the kept versions. The latest
+# roadmap itself is read from the normalized rows (services/roadmap_store.py)
+# and never needs a patch.
+#
+# compact_roadmaps() keeps the newest KEEP_VERSIONS versions per user,
+# re-encodes rows written before versioning, and drops the normalized rows of
+# superseded roadmaps. Old versions may have been moved to the archive
+# (services/archive.py); both read them from there.
+
+SNAPSHOT_INTERVAL = 10
+KEEP_VERSIONS = 20
+
+FULL = 'full'
+DELTA = 'delta'
+
+
+def _pointer(path, key):
+    return f"{path}/{str(key).replace('~', '~0').replace('/', '~1')}"
+
+
+def _tokens(path):
+    return [t.replace('~1', '/').replace('~0', '~') for t in path.split('/')[1:]]
+
+
+# JSON-patch style operations (add, remove, replace) turning old into new.
+# Dicts are compared key by key and lists index by index, so a regenerated
+# roadmap only records the fields that changed.
+def json_diff(old, new, path=''):
+    if type(old) is not type(new):
+        return [{'op': 'replace', 'path': path, 'value': new}]
+
+    if isinstance(old, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({'op': 'remove', 'path': _pointer(path, key)})
+        for key, value in new.items():
+            if key not in old:
+                ops.append({'op': 'add', 'path': _pointer(path, key), 'value': value})
+            else:
+                ops.extend(json_diff(old[key], value, _pointer(path, key)))
+        return ops
+
+    if isinstance(old, list):
+        ops = []
+        for i in range(min(len(old), len(new))):
+            ops.extend(json_diff(old[i], new[i], _pointer(path, i)))
+        # Remove from the end so the indexes of the earlier removals stay valid
+        for i in range(len(old) - 1, len(new) - 1, -1):
+            ops.append({'op': 'remove', 'path': _pointer(path, i)})
+        for i in range(len(old), len(new)):
+            ops.append({'op': 'add', 'path': _pointer(path, i), 'value': new[i]})
+        return ops
+
+    return [] if old == new else [{'op': 'replace', 'path': path, 'value': new}]
+
+
+def apply_patch(document, ops):
+    document = copy.deepcopy(document)
+    for op in ops:
+        tokens = _tokens(op['path'])
+        if not tokens:
+            document = copy.deepcopy(op.get('value'))
+            continue
+
+        parent = document
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+        last = tokens[-1]
+
+        if isinstance(parent, list):
+            index = int(last)
+            if op['op'] == 'add':
+                parent.insert(index, copy.deepcopy(op['value']))
+            elif op['op'] == 'remove':
+                del parent[index]
+            else:
+                parent[index] = copy.deepcopy(op['value'])
+        elif op['op'] == 'remove':
+            del parent[last]
+        else:
+            parent[last] = copy.deepcopy(op['value'])
+    return document
+
+
+# Stored text of a full version as a document; text that is not JSON stays a string
+def _document(text):
+    try:
+        return decode_roadmap(text)
+    except ValueError:
+        return text
+
+
+def _text(document):
+    return document if isinstance(document, str) else json.dumps(document)
+
+
+# The document of one version (the latest with version=None), or None
+def load_version(cursor, username, version=None):
+    if version is None:
+        cursor.execute("SELECT MAX(version) FROM roadmaps WHERE username = ?", (username,))
+        version = cursor.fetchone()[0]
+        if version is None:
+            return None
+
+    cursor.execute('''
+    SELECT id, encoding, roadmap, archive_partition, archive_offset FROM roadmaps
+    WHERE username = ? AND version <= ? AND version >= (
+        SELECT MAX(version) FROM roadmaps WHERE username = ? AND version <= ? AND encoding = 'full'
+    )
+    ORDER BY version
+    ''', (username, version, username, version))
+
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+
+    document = None
+    for row_id, encoding, text, partition, offset in rows:
+        text = payload_value('roadmaps', 'roadmap', row_id, partition, offset, text)
+        document = _document(text) if encoding == FULL else apply_patch(document, json.loads(text))
+    return document
+
+
+# Version number, encoding and stored text for a new version of the user's roadmap.
+# Call inside the write transaction that inserts it.
+def encode_version(cursor, username, roadmap):
+    cursor.execute('''
+    SELECT MAX(version), MAX(CASE WHEN encoding = 'full' THEN version END) FROM roadmaps WHERE username = ?
+    ''', (username,))
+    previous, snapshot = cursor.fetchone()
+    version = (previous or 0) + 1
+
+    document = _document(roadmap) if isinstance(roadmap, str) else roadmap
+    full_text = _text(document)
+    if previous is None or snapshot is None or version - snapshot >= SNAPSHOT_INTERVAL:
+        return version, FULL, full_text
+
+    delta_text = json.dumps(json_diff(load_version(cursor, username, previous), document))
+    if len(delta_text) >= len(full_text):
+        return version, FULL, full_text
+    return version, DELTA, delta_text
+
+
+def list_roadmap_versions(username):
+    with db_cursor() as cursor:
+        cursor.execute('''
+        SELECT version, created_at, encoding, LENGTH(roadmap), archive_partition FROM roadmaps
+        WHERE username = ? AND version IS NOT NULL
+        ORDER BY version
+        ''', (username,))
+
+        rows = cursor.fetchall()
+
+    return [
+        {'version': version, 'created_at': created_at, 'encoding': encoding, 'bytes': size,
+         'archived': partition is not None}
+        for version, created_at, encoding, size, partition in rows
+    ]
+
+
+def get_roadmap_version(username, version=None):
+    with db_cursor() as cursor:
+        return load_version(cursor, username, version)
+
+
+# Operations turning version from_version into to_version.
+# Raises KeyError if either version does not exist (any more).
+def diff_roadmap_versions(username, from_version, to_version):
+    with db_cursor() as cursor:
+        old = load_version(cursor, username, from_version)
+        new = load_version(cursor, username, to_version)
+    if old is None or new is None:
+        missing = from_version if old is None else to_version
+        raise KeyError(f"Roadmap version {missing} of {username} does not exist")
+    return json_diff(old, new)
+
+
+def _compact_user(username, keep_versions):
+    with transaction(immediate=True) as cursor:
+        cursor.execute('''
+        SELECT id, version, encoding, roadmap, archive_partition, archive_offset FROM roadmaps
+        WHERE username = ? AND version IS NOT NULL
+        ORDER BY version
+        ''', (username,))
+
+        rows = [
+            (row_id, version, encoding, payload_value('roadmaps', 'roadmap', row_id, partition, offset, text), partition)
+            for row_id, version, encoding, text, partition, offset in cursor.fetchall()
+        ]
+        bytes_before = sum(len(text) for _, _, _, text, _ in rows)
+
+        documents = []
+        document = None
+        for _, _, encoding, text, _ in rows:
+            document = _document(text) if encoding == FULL else apply_patch(document, json.loads(text))
+            documents.append(document)
+
+        drop = rows[:-keep_versions]
+        kept = rows[-keep_versions:]
+        kept_documents = documents[-keep_versions:]
+        cursor.executemany("DELETE FROM roadmaps WHERE id = ?", [(row[0],) for row in drop])
+
+        # Re-encode what is left so it starts with a snapshot and follows the
+        # interval, counted from the previous snapshot as encode_version does
+        updates = []
+        bytes_after = 0
+        snapshot = None
+        for i, ((row_id, _, encoding, text, partition), document) in enumerate(zip(kept, kept_documents)):
+            new_encoding, new_text = FULL, _text(document)
+            if snapshot is not None and i - snapshot < SNAPSHOT_INTERVAL:
+                delta_text = json.dumps(json_diff(kept_documents[i - 1], document))
+                if len(delta_text) < len(new_text):
+                    new_encoding, new_text = DELTA, delta_text
+            if new_encoding == FULL:
+                snapshot = i
+            # A re-encoded version is stored in users.db again, even if it was archived
+            if (new_encoding, new_text) != (encoding, text):
+                updates.append((new_encoding, new_text, row_id))
+            bytes_after += len(new_text)
+        cursor.executemany('''
+        UPDATE roadmaps SET encoding = ?, roadmap = ?, archive_partition = NULL, archive_offset = NULL WHERE id = ?
+        ''', updates)
+
+        if kept:
+            drop_superseded_rows(cursor, username, kept[-1][0])
+
+    return {
+        'versions_deleted': len(drop),
+        'versions_reencoded': len(updates),
+        'bytes_before': bytes_before,
+        'bytes_after': bytes_after,
+    }
+
+
+# Retention and compaction for every user (or one); each user is compacted in
+# its own short write transaction. Returns totals for the run.
+def compact_roadmaps(keep_versions=KEEP_VERSIONS, username=None):
+    if keep_versions < 1:
+        raise ValueError("keep_versions must be at least 1")
+
+    if username is None:
+        with db_cursor() as cursor:
+            cursor.execute("SELECT DISTINCT username FROM roadmaps WHERE version IS NOT NULL")
+            usernames = [row[0] for row in cursor.fetchall()]
+    else:
+        usernames = [username]
+
+    totals = {'users': len(usernames), 'versions_deleted': 0, 'versions_reencoded': 0,
+              'bytes_before': 0, 'bytes_after': 0}
+    for name in usernames:
+        for key, value in _compact_user(name, keep_versions).items():
+            totals[key] += value
+    return totals
+
+
+def _run_compaction(payload, report_progress):
+    return compact_roadmaps(payload['keep_versions'])
+
+
+_compaction_scheduled = False
+_compaction_lock = threading.Lock()
+
+
+# Run compaction once per process on the background job queue
+def schedule_compaction(keep_versions=KEEP_VERSIONS):
+    global _compaction_scheduled
+    with _compaction_lock:
+        if _compaction_scheduled:
+            return None
+        _compaction_scheduled = True
+
+    queue = get_job_queue()
+    queue.register('roadmap_compaction', _run_compaction)
+    return queue.submit('roadmap_compaction', {'keep_versions': keep_versions}, dedupe_key='roadmap_compaction')
@@ -0,0 +1,116 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from services.database_service import get_user_profile, get_user_roadmap, get_user_progress
+from services.user_summary import get_user_summary
+from services.events import subscribe
+
+# In-process LRU of per-user objects the UI reads on every Streamlit rerun:
+# profile, latest roadmap, progress, analytics summary and the LlamaRoadmapManager.
+#
+# Entries live until a write to the data they were built from. The write
+# functions in database_service publish an event after committing, and the
+# subscribers below drop exactly the affected entries for that user. Writes
+# made by another process (e.g. a CLI) are not seen until the entry is evicted.
+# Cached values are shared between sessions, so callers must not mutate them.
+
+MAX_ENTRIES = 4096
+
+# Which cached kinds each write event makes stale
+INVALIDATES = {
+    'profile_updated': ('profile', 'manager'),
+    'roadmap_saved': ('roadmap', 'summary'),
+    'progress_recorded': ('progress', 'summary'),
+    'quiz_results_saved': ('summary',),
+}
+
+
+class UserCache:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # Cached value of kind for username, calling loader() on a miss
+    def get(self, kind, username, loader):
+        key = (kind, username)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            generation = self._generations.get(username, 0)
+
+        value = loader()
+
+        with self._lock:
+            # An invalidation while loading means the value may already be stale
+            if self._generations.get(username, 0) == generation:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, username, kinds=None):
+        with self._lock:
+            self._generations[username] = self._generations.get(username, 0) + 1
+            for key in list(self._entries):
+                if key[1] == username and (kinds is None or key[0] in kinds):
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+            }
+
+
+user_cache = UserCache()
+
+
+def _subscriber(kinds):
+    def invalidate(username, **_):
+        user_cache.invalidate(username, kinds)
+    return invalidate
+
+
+_invalidators = {event: _subscriber(kinds) for event, kinds in INVALIDATES.items()}
+for _event, _callback in _invalidators.items():
+    subscribe(_event, _callback)
+
+
+def cached_profile(username):
+    return user_cache.get('profile', username, lambda: get_user_profile(username))
+
+
+def cached_roadmap(username):
+    return user_cache.get('roadmap', username, lambda: get_user_roadmap(username))
+
+
+def cached_progress(username):
+    return user_cache.get('progress', username, lambda: get_user_progress(username))
+
+
+# The summary's streak also lapses when the day rolls over, so it is cached with its date
+def cached_summary(username):
+    today = datetime.now(timezone.utc).date()
+    day, summary = user_cache.get('summary', username, lambda: (today, get_user_summary(username)))
+    if day != today:
+        user_cache.invalidate(username, ('summary',))
+        day, summary = user_cache.get('summary', username, lambda: (today, get_user_summary(username)))
+    return summary
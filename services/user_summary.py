@@ -0,0 +1,230 @@
+import argparse
+import json
+from datetime import date, datetime, timedelta, timezone
+
+from services.db_connection import db_cursor, transaction
+from services.roadmap_store import completion_rows, next_milestone
+
+# Per-user analytics summary, kept in the user_summary table so the analytics
+# page reads one row instead of scanning user_progress and quiz_results.
+#
+# track_user_progress, save_quiz_results and save_user_roadmap update the row
+# in the same transaction as their write. A user without a row yet (history
+# from before the table existed) gets it rebuilt from history on first use;
+# rebuild_user_summaries() (python -m services.user_summary) recomputes all.
+
+ROLLING_SCORES = 10
+
+
+def _today():
+    return datetime.now(timezone.utc).date()
+
+
+def _phase_fields(cursor, username):
+    current = next_milestone(cursor, username)
+    return (
+        json.dumps(completion_rows(cursor, username)),
+        current[0] if current else None,
+        current[1] if current else None,
+    )
+
+
+# Recompute the user's row from user_progress, quiz_results and the latest roadmap
+def rebuild_summary(cursor, username):
+    cursor.execute('''
+    SELECT date(completed_at) FROM user_progress WHERE username = ?
+    UNION
+    SELECT date(created_at) FROM quiz_results WHERE username = ?
+    ORDER BY 1
+    ''', (username, username))
+    days = [date.fromisoformat(row[0]) for row in cursor.fetchall() if row[0]]
+
+    current = longest = 0
+    previous = None
+    for day in days:
+        current = current + 1 if previous is not None and day - previous == timedelta(days=1) else 1
+        longest = max(longest, current)
+        previous = day
+
+    cursor.execute("SELECT COUNT(*) FROM user_progress WHERE username = ?", (username,))
+    milestones_completed = cursor.fetchone()[0]
+
+    cursor.execute('''
+    SELECT score FROM quiz_results WHERE username = ? ORDER BY created_at DESC, id DESC LIMIT ?
+    ''', (username, ROLLING_SCORES))
+    recent_scores = [row[0] for row in reversed(cursor.fetchall())]
+    cursor.execute("SELECT COUNT(*) FROM quiz_results WHERE username = ?", (username,))
+    quiz_count = cursor.fetchone()[0]
+
+    phase_progress, current_phase, current_milestone = _phase_fields(cursor, username)
+    cursor.execute('''
+    INSERT INTO user_summary (
+        username, current_streak, longest_streak, last_active_date, milestones_completed,
+        phase_progress, quiz_count, recent_scores, avg_score, current_phase, current_milestone, updated_at
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT (username) DO UPDATE SET
+        current_streak = excluded.current_streak,
+        longest_streak = excluded.longest_streak,
+        last_active_date = excluded.last_active_date,
+        milestones_completed = excluded.milestones_completed,
+        phase_progress = excluded.phase_progress,
+        quiz_count = excluded.quiz_count,
+        recent_scores = excluded.recent_scores,
+        avg_score = excluded.avg_score,
+        current_phase = excluded.current_phase,
+        current_milestone = excluded.current_milestone,
+        updated_at = excluded.updated_at
+    ''', (
+        username, current, longest, previous.isoformat() if previous else None, milestones_completed,
+        phase_progress, quiz_count, json.dumps(recent_scores),
+        sum(recent_scores) / len(recent_scores) if recent_scores else None,
+        current_phase, current_milestone,
+    ))
+
+
+# Streak columns after activity today; returns None if the user has no row yet
+def _streak_after_activity(cursor, username):
+    cursor.execute('''
+    SELECT current_streak, longest_streak, last_active_date FROM user_summary WHERE username = ?
+    ''', (username,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+
+    current, longest, last_active = row
+    today = _today()
+    if last_active == today.isoformat():
+        pass
+    elif last_active == (today - timedelta(days=1)).isoformat():
+        current += 1
+    else:
+        current = 1
+    return current, max(longest, current), today.isoformat()
+
+
+# A milestone was newly completed (call in the transaction that recorded it)
+def record_milestone(cursor, username):
+    streak = _streak_after_activity(cursor, username)
+    if streak is None:
+        rebuild_summary(cursor, username)
+        return
+
+    cursor.execute('''
+    UPDATE user_summary SET
+        current_streak = ?, longest_streak = ?, last_active_date = ?,
+        milestones_completed = milestones_completed + 1,
+        phase_progress = ?, current_phase = ?, current_milestone = ?,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE username = ?
+    ''', (*streak, *_phase_fields(cursor, username), username))
+
+
+# A quiz result was saved (call in the transaction that saved it)
+def record_quiz(cursor, username, score):
+    streak = _streak_after_activity(cursor, username)
+    if streak is None:
+        rebuild_summary(cursor, username)
+        return
+
+    cursor.execute("SELECT recent_scores FROM user_summary WHERE username = ?", (username,))
+    recent_scores = (json.loads(cursor.fetchone()[0]) + [score])[-ROLLING_SCORES:]
+    cursor.execute('''
+    UPDATE user_summary SET
+        current_streak = ?, longest_streak = ?, last_active_date = ?,
+        quiz_count = quiz_count + 1,
+        recent_scores = ?, avg_score = ?,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE username = ?
+    ''', (*streak, json.dumps(recent_scores), sum(recent_scores) / len(recent_scores), username))
+
+
+# A new roadmap was saved, changing the phases and the current milestone
+def record_roadmap(cursor, username):
+    cursor.execute("SELECT 1 FROM user_summary WHERE username = ?", (username,))
+    if cursor.fetchone() is None:
+        rebuild_summary(cursor, username)
+        return
+
+    cursor.execute('''
+    UPDATE user_summary SET
+        phase_progress = ?, current_phase = ?, current_milestone = ?,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE username = ?
+    ''', (*_phase_fields(cursor, username), username))
+
+
+def _read(cursor, username):
+    cursor.execute('''
+    SELECT current_streak, longest_streak, last_active_date, milestones_completed, phase_progress,
+           quiz_count, recent_scores, avg_score, current_phase, current_milestone
+    FROM user_summary WHERE username = ?
+    ''', (username,))
+    return cursor.fetchone()
+
+
+# The user's summary as a dict, from one row. The streak counts consecutive
+# days with a completed milestone or a quiz, ending today or yesterday (UTC).
+def get_user_summary(username):
+    with db_cursor() as cursor:
+        row = _read(cursor, username)
+    if row is None:
+        with transaction() as cursor:
+            rebuild_summary(cursor, username)
+            row = _read(cursor, username)
+
+    (current, longest, last_active, milestones_completed, phase_progress,
+     quiz_count, recent_scores, avg_score, current_phase, current_milestone) = row
+
+    # A streak not continued yesterday or today is over
+    if last_active is None or last_active < (_today() - timedelta(days=1)).isoformat():
+        current = 0
+
+    phases = json.loads(phase_progress)
+    total = sum(p['milestones'] for p in phases)
+    completed = sum(p['completed'] for p in phases)
+    return {
+        'streak': current,
+        'longest_streak': longest,
+        'last_active_date': last_active,
+        'milestones_completed': milestones_completed,
+        'completion': {
+            'phases': phases,
+            'milestones': total,
+            'completed': completed,
+            'percent': 100.0 * completed / total if total else 0.0,
+        },
+        'quiz_count': quiz_count,
+        'recent_scores': json.loads(recent_scores),
+        'avg_score': avg_score,
+        'current_milestone': (current_phase, current_milestone) if current_milestone else None,
+    }
+
+
+# Recompute the summaries of every user (or one) from history; returns how many
+def rebuild_user_summaries(username=None):
+    if username is None:
+        with db_cursor() as cursor:
+            cursor.execute("SELECT username FROM users")
+            usernames = [row[0] for row in cursor.fetchall()]
+    else:
+        usernames = [username]
+
+    for name in usernames:
+        with transaction() as cursor:
+            rebuild_summary(cursor, name)
+    return len(usernames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the per-user analytics summaries from history.")
+    parser.add_argument('--user', help="only rebuild this user's summary")
+    args = parser.parse_args()
+
+    from services.database_service import create_db
+    create_db()
+    print(f"Rebuilt {rebuild_user_summaries(args.user)} user summaries")
+
+
+if __name__ == '__main__':
+    main()
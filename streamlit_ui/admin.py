@@ -0,0 +1,112 @@
+import streamlit as st
+from models.model_router import get_router
+from models.response_cache import get_response_cache
+from models.roadmap_index import get_roadmap_index
+from models.structured_output import structured_output_stats
+from models.telemetry import telemetry
+from services.cohort_analytics import get_cohort_analytics
+from services.query_profiler import export_json, profiler
+from services.resource_catalog import catalog_stats, resource_milestones, search_resources, top_resources
+
+def show_admin():
+    st.title("LLM Telemetry")
+
+    # Latency, tokens and cache hits per call type
+    st.subheader("Calls by Type")
+    summary = telemetry.summary()
+    if summary:
+        st.table(summary)
+    else:
+        st.info("No LLM calls recorded since the app started.")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Response Cache")
+        st.json(get_response_cache().stats())
+    with col2:
+        st.subheader("Structured Output")
+        st.json(structured_output_stats())
+
+    # Where calls are routed: model per call type and load per Ollama endpoint
+    st.subheader("Ollama Endpoints")
+    router_stats = get_router().stats()
+    st.table(router_stats['endpoints'])
+    st.json(router_stats['models'])
+
+    # Roadmaps served from a similar profile instead of generated
+    st.subheader("Roadmap Reuse")
+    st.json(get_roadmap_index().stats())
+
+    # The same text the /metrics endpoint serves
+    st.subheader("Prometheus Metrics")
+    metrics = telemetry.render_prometheus()
+    st.download_button("Download metrics", metrics, file_name="metrics.txt", mime="text/plain")
+    st.code(metrics, language="text")
+
+    if st.button("Reset telemetry"):
+        telemetry.reset()
+        st.experimental_rerun()
+
+    show_cohort_analytics()
+    show_resource_catalog()
+    show_query_profile()
+
+def show_cohort_analytics():
+    st.title("Cohort Analytics")
+    cohorts = get_cohort_analytics().summary()
+
+    st.subheader("Quiz Scores by Phase")
+    st.dataframe(cohorts['score_distribution'])
+
+    # Days since the user's previous completed milestone
+    st.subheader("Time to Complete Milestones")
+    st.dataframe(cohorts['time_to_complete'])
+
+    # Share of each cohort reaching 1, 3, 6... completed milestones
+    st.subheader("Drop-off by Role, Field and Goal")
+    st.dataframe(cohorts['drop_off'])
+
+def show_resource_catalog():
+    st.title("Learning Resources")
+    st.json(catalog_stats())
+
+    query = st.text_input("Search resources")
+    resources = search_resources(query) if query.strip() else top_resources()
+    if not resources:
+        st.info("No matching resources.")
+        return
+    st.table(resources)
+
+    # Which milestones of current roadmaps use a resource
+    choice = st.selectbox("Used in milestones", resources, format_func=lambda r: r['title'])
+    st.dataframe(resource_milestones(choice['id'], limit=200))
+
+def show_query_profile():
+    st.title("Database Queries")
+    summary = profiler.summary()
+    if not summary['enabled']:
+        st.info("Query profiling is off (MAYOGA_SQL_PROFILE=0).")
+        return
+    st.write(f"{summary['queries']} queries, {summary['total_ms']:.0f} ms in total; "
+             f"{summary['background_queries']} outside page reruns.")
+
+    # Time per statement and the function that ran it, slowest first
+    st.subheader("Statements by Call Site")
+    st.dataframe(summary['statements'])
+
+    st.subheader("Queries per Rerun")
+    st.table(summary['reruns'])
+
+    st.subheader("Queries per User")
+    st.table(summary['users'])
+
+    st.subheader(f"Slow Queries (over {summary['slow_query_ms']:.0f} ms)")
+    if summary['slow_queries']:
+        st.dataframe(summary['slow_queries'])
+    else:
+        st.info("No slow queries recorded.")
+
+    st.download_button("Download JSON", export_json(), file_name="sql_profile.json", mime="application/json")
+    if st.button("Reset query profile"):
+        profiler.reset()
+        st.experimental_rerun()
@@ -1,6 +1,8 @@
 import streamlit as st
 from models.llama_model import LlamaRoadmapManager
-from services.database_service import save_quiz_results, track_user_progress, get_user_progress
+from models.generation_jobs import submit_quiz, submit_gap_analysis, quiz_from_bank
+from services.database_service import save_quiz_results, track_user_progress
+from streamlit_ui.job_status import poll_job, rerun_later
 
 def show_analytics(roadmap_manager: LlamaRoadmapManager):
     st.title("Your Learning Analytics")
@@ -10,37 +12,112 @@ def show_analytics(roadmap_manager: LlamaRoadmapManager):
 
     # Display user streak and milestone progress
     st.subheader("Streak & Milestone Progress")
-    st.write(f"Streak: {progress_data['streak']} days")
+    st.write(f"Streak: {progress_data['streak']} days (longest: {progress_data['longest_streak']} days)")
+    if progress_data['avg_score'] is not None:
+        st.write(f"Average score of your last {len(progress_data['recent_scores'])} quizzes: "
+                 f"{progress_data['avg_score']:.0f}%")
+    completion = progress_data['completion']
+    if completion['milestones']:
+        st.write(f"Roadmap {completion['percent']:.0f}% complete")
+        st.progress(int(completion['percent']))
+        for phase in completion['phases']:
+            st.write(f"{phase['phase']}: {phase['completed']} of {phase['milestones']} milestones")
 
     # Display the current milestone and ask for quiz
     if progress_data['current_milestone']:
         current_phase, current_milestone = progress_data['current_milestone']
         st.subheader(f"Current Milestone: {current_phase} - {current_milestone}")
-        
+
         if st.button("Take Quiz"):
-            quiz = roadmap_manager.generate_quiz(current_phase, current_milestone)
-            score = show_quiz(quiz)
-            if score >= 80:
-                st.success(f"Congratulations! You've completed the milestone with a score of {score}%")
-                track_user_progress(username, current_phase, current_milestone)
+            st.session_state.pop('quiz', None)
+            st.session_state.pop('gap_feedback', None)
+            st.session_state.pop('gap_job', None)
+            st.session_state.pop('quiz_grade', None)
+            # Serve from the question bank; only a cold bank falls back to a
+            # background generation, which a double click joins
+            quiz = quiz_from_bank(roadmap_manager, current_phase, current_milestone)
+            if quiz is not None:
+                st.session_state['quiz'] = quiz
             else:
-                st.error(f"You scored {score}%. Let's review the knowledge gaps.")
-                feedback = roadmap_manager.generate_gap_analysis(quiz)
-                st.write(feedback)
+                st.session_state['quiz_job'] = submit_quiz(roadmap_manager, current_phase, current_milestone)
 
-def show_quiz(quiz):
-    score = 0
-    total_questions = len(quiz['questions'])
+        pending = False
+        job = poll_job('quiz_job')
+        if job is not None:
+            if job['status'] == 'done':
+                st.session_state['quiz'] = job['result']
+            elif job['status'] == 'failed':
+                st.error(f"Could not generate the quiz: {job['error']}")
+            else:
+                st.info("Preparing your quiz...")
+                pending = True
 
-    for question_data in quiz['questions']:
-        question = question_data['question']
-        options = question_data['options']
-        correct_answer = question_data['correct_answer']
+        if 'quiz' in st.session_state:
+            quiz = st.session_state['quiz']
+            answers = show_quiz(quiz)
+            if st.button("Submit Answers"):
+                # Graded locally; only unclear short answers go to the model, in one call
+                with st.spinner("Grading your answers..."):
+                    grade = roadmap_manager.grade_quiz(quiz['quiz'], answers)
+                st.session_state['quiz_grade'] = grade
+                st.session_state.pop('gap_feedback', None)
+                st.session_state.pop('gap_job', None)
+                save_quiz_results(username, quiz, grade['results'], grade['score'], None,
+                                  phase=current_phase, milestone=current_milestone)
+                if grade['score'] >= 80:
+                    track_user_progress(username, current_phase, current_milestone)
+
+            grade = st.session_state.get('quiz_grade')
+            if grade is not None:
+                score = grade['score']
+                if score >= 80:
+                    st.success(f"Congratulations! You've completed the milestone with a score of {score:.0f}%")
+                else:
+                    st.error(f"You scored {score:.0f}%. Let's review the knowledge gaps.")
+                    pending = show_gap_analysis(roadmap_manager, grade['wrong_answers']) or pending
+
+        if pending:
+            rerun_later()
+
+# Gap analysis is generated once per quiz attempt; returns True while it is still running
+def show_gap_analysis(roadmap_manager: LlamaRoadmapManager, wrong_answers):
+    if 'gap_feedback' in st.session_state:
+        show_recommendations(st.session_state['gap_feedback'])
+        return False
 
-        st.write(question)
-        answer = st.radio("Choose an answer", options)
+    if 'gap_job' not in st.session_state:
+        st.session_state['gap_job'] = submit_gap_analysis(roadmap_manager, wrong_answers)
+
+    job = poll_job('gap_job')
+    if job is None:
+        return False
+    if job['status'] == 'done':
+        st.session_state['gap_feedback'] = job['result']
+        show_recommendations(job['result'])
+        return False
+    if job['status'] == 'failed':
+        st.error(f"Could not generate the gap analysis: {job['error']}")
+        return False
+
+    st.info("Analysing your answers...")
+    return True
+
+def show_recommendations(gap_analysis):
+    for recommendation in gap_analysis['gap_analysis']['recommendations']:
+        st.write(f"- {recommendation}")
+
+# Render the quiz and return the answers given so far, in question order
+def show_quiz(quiz):
+    answers = []
+    for i, question_data in enumerate(quiz['quiz']):
+        options = question_data['options']
 
-        if answer == correct_answer:
-            score += 1
+        st.write(question_data['question'])
+        if not options and question_data['answer'] in ("True", "False"):
+            options = ["True", "False"]
+        if options:
+            answers.append(st.radio("Choose an answer", options, key=f"quiz_answer_{i}"))
+        else:
+            answers.append(st.text_input("Your answer", key=f"quiz_answer_{i}"))
 
-    return (score / total_questions) * 100
\ No newline at end of file
+    return answers
@@ -1,6 +1,8 @@
 import streamlit as st
 from models.llama_model import LlamaRoadmapManager
-from services.database_service import update_user_profile, get_user_profile
+from models.generation_jobs import submit_roadmap
+from services.database_service import update_user_profile
+from streamlit_ui.job_status import poll_job, rerun_later
 
 def show_dashboard(roadmap_manager: LlamaRoadmapManager):
     st.title("MaYoGa GTI Learning Platform")
@@ -18,15 +20,21 @@ def show_dashboard(roadmap_manager: LlamaRoadmapManager):
         edit_profile(roadmap_manager)
 
     st.subheader("Your Learning Roadmap")
-    roadmap = roadmap_manager.get_or_generate_roadmap(user_profile['end_goal'])
+    if st.button("Regenerate Roadmap"):
+        # Regenerating should give a fresh answer, not the cached one.
+        # A double click joins the job that is already running.
+        st.session_state['roadmap_job'] = submit_roadmap(roadmap_manager, use_cache=False)
 
-    if roadmap:
-        display_roadmap_as_table(roadmap)
+    job = poll_job('roadmap_job')
+    if job is None:
+        roadmap = roadmap_manager.get_roadmap()
+        if roadmap:
+            display_roadmap_as_table(roadmap)
+            return
+        st.session_state['roadmap_job'] = submit_roadmap(roadmap_manager)
+        job = poll_job('roadmap_job')
 
-    if st.button("Regenerate Roadmap"):
-        roadmap = roadmap_manager.generate_and_save_roadmap(user_profile['end_goal'])
-        st.success("Roadmap regenerated successfully!")
-        display_roadmap_as_table(roadmap)
+    show_roadmap_job(job)
 
 def edit_profile(roadmap_manager: LlamaRoadmapManager):
     user_profile = roadmap_manager.get_user_profile()
@@ -36,14 +44,41 @@ def edit_profile(roadmap_manager: LlamaRoadmapManager):
     new_end_goal = st.text_input("End Goal", value=user_profile['end_goal'])
 
     if st.button("Update Profile"):
-        update_user_profile(username, new_field_of_study, new_end_goal)
+        update_user_profile(username, user_profile['role'], new_field_of_study, new_end_goal)
         st.success("Profile updated successfully!")
         st.experimental_rerun()
 
 def display_roadmap_as_table(roadmap):
     # Iterate through the JSON roadmap and display it as a table
     st.write("Your Learning Roadmap in Table Format")
-    for phase, milestones in roadmap.items():
-        st.write(f"**{phase}**")
-        for milestone, details in milestones.items():
-            st.write(f"- **{milestone}**: {details}")
\ No newline at end of file
+    for phase in roadmap['roadmap']['phases']:
+        display_phase(phase)
+
+def display_phase(phase):
+    st.write(f"**{phase['name']}**")
+    for milestone in phase.get('milestones', []):
+        resources = ", ".join(milestone.get('resources', []))
+        st.write(f"- **{milestone['name']}** ({milestone.get('timeline', '')}): "
+                 f"{milestone.get('description', '')} Resources: {resources}")
+
+# Render a roadmap job: the phases finished so far while it runs, then the result
+def show_roadmap_job(job):
+    if job['status'] == 'failed':
+        st.error(f"Roadmap generation failed: {job['error']}")
+        return
+
+    if job['status'] == 'done':
+        result = job['result']
+        display_roadmap_as_table(result['roadmap'])
+        first_phase = result['time_to_first_phase'] or result['total_latency']
+        st.caption(f"First phase after {first_phase:.1f}s, "
+                   f"full roadmap after {result['total_latency']:.1f}s")
+        st.success("Roadmap generated successfully!")
+        return
+
+    st.write("Your Learning Roadmap in Table Format")
+    phases = (job['progress'] or {}).get('phases', [])
+    for phase in phases:
+        display_phase(phase)
+    st.info(f"Generating your roadmap... {len(phases)} of 4 phases ready.")
+    rerun_later()
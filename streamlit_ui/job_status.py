@@ -0,0 +1,24 @@
+import time
+import streamlit as st
+from models.generation_jobs import get_generation_queue
+
+# How long a page waits before rerunning to poll an unfinished job
+POLL_SECONDS = 1.0
+
+# Look up the job whose id is kept in st.session_state[key].
+# Finished jobs are dropped from session state so the next rerun starts clean.
+def poll_job(key):
+    job_id = st.session_state.get(key)
+    if job_id is None:
+        return None
+
+    job = get_generation_queue().poll(job_id)
+    if job is None or job['status'] in ('done', 'failed'):
+        st.session_state.pop(key, None)
+    return job
+
+# Rerun the page shortly so a pending job is polled again.
+# Only this session's script thread waits; the generation runs on a worker.
+def rerun_later():
+    time.sleep(POLL_SECONDS)
+    st.experimental_rerun()